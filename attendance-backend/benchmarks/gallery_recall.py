@@ -0,0 +1,73 @@
+"""
+Recall / memory / latency of the compressed gallery against exact search.
+
+    python benchmarks/gallery_recall.py --size 200000 --queries 500 --rerank 16 32 64
+
+Embeddings are synthetic: one random direction per identity, queries are noisy captures
+of enrolled identities (``--noise`` controls how hard the probe is).
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parents[1] / "src"))
+
+from app.services.face.gallery import GalleryIndex, QuantizedGalleryIndex  # noqa: E402
+
+
+def _synthetic(size: int, queries: int, dim: int, noise: float, seed: int):
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(size, dim)).astype(np.float32)
+    truth = rng.choice(size, queries, replace=False)
+    probes = vectors[truth] + rng.normal(scale=noise, size=(queries, dim)).astype(np.float32)
+    return np.arange(1, size + 1, dtype=np.int64), vectors, probes
+
+
+def _timed_search(index: GalleryIndex, probes: np.ndarray, k: int):
+    started = time.perf_counter()
+    results = [index.search(probe, k) for probe in probes]
+    return results, (time.perf_counter() - started) * 1000 / len(probes)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--dim", type=int, default=512)
+    parser.add_argument("--noise", type=float, default=0.8)
+    parser.add_argument("--k", type=int, default=1)
+    parser.add_argument("--rerank", type=int, nargs="+", default=[8, 32, 128])
+    parser.add_argument("--pq-subvectors", type=int, nargs="+", default=[32, 64])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    user_ids, vectors, probes = _synthetic(args.size, args.queries, args.dim, args.noise, args.seed)
+    exact = GalleryIndex(dim=args.dim)
+    exact.load_arrays(user_ids, vectors)
+    expected, exact_ms = _timed_search(exact, probes, args.k)
+    expected_ids = [{user_id for user_id, _ in hits} for hits in expected]
+    exact_bytes = exact._buffers[0].nbytes + exact._buffers[1].nbytes
+
+    print(f"{args.size} embeddings x {args.dim}d, {args.queries} queries, recall@{args.k} vs exact search")
+    print(f"{'mode':<14}{'rerank':>8}{'recall':>9}{'ms/query':>10}{'resident MB':>13}{'build s':>9}")
+    print(f"{'exact':<14}{'-':>8}{1.0:>9.4f}{exact_ms:>10.2f}{exact_bytes / 2**20:>13.1f}{'-':>9}")
+
+    modes = [("int8", {})] + [(f"pq{m}", {"pq_subvectors": m}) for m in args.pq_subvectors]
+    for name, options in modes:
+        started = time.perf_counter()
+        index = QuantizedGalleryIndex(dim=args.dim, compression="pq" if name.startswith("pq") else "int8", **options)
+        index.load_arrays(user_ids, vectors)
+        build_s = time.perf_counter() - started
+        for rerank in args.rerank:
+            index.rerank = rerank
+            found, ms = _timed_search(index, probes, args.k)
+            recall = np.mean([len(want & {user_id for user_id, _ in hits}) / len(want) for want, hits in zip(expected_ids, found)])
+            print(f"{name:<14}{rerank:>8}{recall:>9.4f}{ms:>10.2f}{index.memory_bytes() / 2**20:>13.1f}{build_s:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
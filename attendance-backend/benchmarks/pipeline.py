@@ -0,0 +1,334 @@
+"""
+End-to-end benchmark of the recognition pipeline on synthetic faces, offline and on CPU.
+
+    python benchmarks/pipeline.py --sizes 1000 10000 100000 --output results.json
+    python benchmarks/pipeline.py --sizes 1000000 --iterations 50       # ~2 GB of gallery
+    python benchmarks/pipeline.py --http --concurrency 8 --requests 200
+    python benchmarks/pipeline.py --output current.json --compare baseline.json
+
+Stages: decode, detect (MTCNN), quality, liveness, embed (InceptionResnetV1; random weights
+unless --pretrained), gallery search at each --sizes, find_match end to end, and
+AttendanceService.record + commit against SQLite (or --database-url). Every stage reports
+p50/p95/p99 latency, throughput and its tracemalloc peak (numpy/Python allocations; torch
+does its own); the run reports peak RSS. --http drives concurrent POST /attendance/mark
+requests through the FastAPI app in-process. --compare exits non-zero on p95 regressions.
+
+Random weights map every synthetic face to nearly the same embedding, so --http without
+--pretrained matches recently seen users and answers mostly 409; timings are still valid.
+"""
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable
+
+import cv2
+import numpy as np
+from PIL import Image
+
+sys.path.append(str(Path(__file__).resolve().parents[1] / "src"))
+for key, value in {
+    "FERNET_KEY": "gKm2GbnYl8aA0svBLmvBxxtBBAsoAhH2E_n0ilKAIIs=",
+    "JWT_SECRET": "benchmark",
+    "POSTGRES_USER": "bench",
+    "POSTGRES_PASSWORD": "bench",
+    "POSTGRES_DB": "bench",
+    "POSTGRES_HOST": "localhost",
+}.items():
+    os.environ.setdefault(key, value)
+
+import torch  # noqa: E402
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+from app.config import get_settings  # noqa: E402
+from app.core.security import create_access_token, hash_password  # noqa: E402
+from app.db.models import User  # noqa: E402
+from app.db.session import Base  # noqa: E402
+from app.services.attendance_service import AttendanceService  # noqa: E402
+from app.services.face.detector import FaceDetector  # noqa: E402
+from app.services.face.embedder import FaceEmbedder  # noqa: E402
+from app.services.face.frame import crop, decode_frame  # noqa: E402
+from app.services.face.gallery import GalleryIndex  # noqa: E402
+from app.services.face.liveness import LivenessService  # noqa: E402
+from app.services.face.quality import QualityScorer  # noqa: E402
+from app.services.face.recognition_service import FaceRecognitionService  # noqa: E402
+
+
+def synthetic_face(rng: np.random.Generator, size: int = 200) -> np.ndarray:
+    """
+    Cartoon face (skin ellipse, eyes, brows, nose, mouth) with sensor-like noise; MTCNN finds most.
+    """
+    face = np.full((size, size, 3), rng.integers(60, 200, size=3), dtype=np.uint8)
+    c = size // 2
+    skin = tuple(int(v) for v in rng.integers([150, 100, 80], [240, 190, 160]))
+    cv2.ellipse(face, (c, c), (int(size * 0.32), int(size * 0.42)), 0, 0, 360, skin, -1)
+    eye_y = int(size * 0.42)
+    for x in (int(size * 0.36), int(size * 0.64)):
+        cv2.ellipse(face, (x, eye_y), (int(size * 0.07), int(size * 0.035)), 0, 0, 360, (255, 255, 255), -1)
+        cv2.circle(face, (x, eye_y), int(size * 0.025), (30, 20, 20), -1)
+        brow_y = eye_y - int(size * 0.07)
+        cv2.line(face, (x - int(size * 0.08), brow_y), (x + int(size * 0.08), brow_y), (60, 40, 30), 3)
+    cv2.line(face, (c, int(size * 0.45)), (c - 6, int(size * 0.6)), (120, 80, 70), 2)
+    cv2.ellipse(face, (c, int(size * 0.72)), (int(size * 0.12), int(size * 0.04)), 0, 0, 360, (120, 40, 50), -1)
+    return np.clip(face + rng.normal(0, 8, face.shape), 0, 255).astype(np.uint8)
+
+
+def synthetic_frames(detector: FaceDetector, count: int, seed: int) -> list[bytes]:
+    # 640x480 kiosk frames, keeping only those the detector finds a face in
+    rng = np.random.default_rng(seed)
+    frames = []
+    while len(frames) < count:
+        frame = np.full((480, 640, 3), rng.integers(40, 160, size=3), dtype=np.uint8)
+        frame[140:340, 220:420] = synthetic_face(rng)
+        if len(detector.locate(frame)[0]):
+            buf = io.BytesIO()
+            Image.fromarray(frame).save(buf, format="JPEG", quality=90)
+            frames.append(buf.getvalue())
+    return frames
+
+
+def _percentiles(latencies: list[float]) -> dict:
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {"p50_ms": round(p50, 3), "p95_ms": round(p95, 3), "p99_ms": round(p99, 3), "mean_ms": round(float(np.mean(latencies)), 3)}
+
+
+def _peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def measure(name: str, fn: Callable[[int], object], iterations: int, warmup: int = 2, alloc_runs: int = 3) -> dict:
+    """
+    Time ``fn(i)`` ``iterations`` times, then re-run a few calls under tracemalloc for the allocation peak.
+    """
+    for i in range(warmup):
+        fn(i)
+    latencies = []
+    started = time.perf_counter()
+    for i in range(iterations):
+        t = time.perf_counter()
+        fn(i)
+        latencies.append((time.perf_counter() - t) * 1000)
+    elapsed = time.perf_counter() - started
+    # Tracing slows Python-heavy code down, so allocations are sampled separately from timing
+    tracemalloc.start()
+    for i in range(alloc_runs):
+        fn(i)
+    _, alloc_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    result = {
+        "stage": name,
+        "iterations": iterations,
+        **_percentiles(latencies),
+        "throughput_per_s": round(iterations / elapsed, 2),
+        "alloc_peak_kb": round(alloc_peak / 1024, 1),
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+    }
+    print(
+        f"{name:<28}{result['p50_ms']:>10.2f}{result['p95_ms']:>10.2f}{result['p99_ms']:>10.2f}"
+        f"{result['throughput_per_s']:>10.1f}{result['alloc_peak_kb']:>12.0f}{result['peak_rss_mb']:>10.0f}"
+    )
+    return result
+
+
+def _session_factory(database_url: str | None):
+    url = database_url or f"sqlite+pysqlite:///{tempfile.mkdtemp(prefix='attendance-bench-')}/bench.db"
+    engine = create_engine(url, future=True, connect_args={"check_same_thread": False} if url.startswith("sqlite") else {})
+    Base.metadata.create_all(engine)
+    return sessionmaker(bind=engine, autoflush=False, expire_on_commit=False, future=True)
+
+
+def _create_users(session_factory, count: int, prefix: str) -> list[int]:
+    password = hash_password("bench")
+    with session_factory() as db:
+        users = [User(full_name=f"Bench {i}", roll_no=f"{prefix}{i}", role="STUDENT", external_id=f"{prefix}{i}", password_hash=password) for i in range(count)]
+        db.add_all(users)
+        db.commit()
+        return [user.id for user in users]
+
+
+def run_stages(args, service: FaceRecognitionService, frames: list[bytes]) -> list[dict]:
+    n = len(frames)
+    images = [decode_frame(frame, max_side=get_settings().max_decode_side) for frame in frames]
+    boxes = [service.detector.locate(image)[0][0] for image in images]
+    faces = [crop(image, box) for image, box in zip(images, boxes)]
+    results = [
+        measure("decode", lambda i: decode_frame(frames[i % n], max_side=get_settings().max_decode_side), args.iterations),
+        measure("detect", lambda i: service.detector.detect_scored(images[i % n]), args.iterations),
+        measure("quality", lambda i: service.quality.evaluate(faces[i % n], 0.99), args.iterations),
+        measure("liveness", lambda i: service.liveness.evaluate(faces[i % n]), args.iterations),
+        measure("embed", lambda i: service.embedder.embed(faces[i % n]), args.iterations),
+        measure("embed_batch8", lambda i: service.embedder.embed_batch([faces[(i + j) % n] for j in range(8)]), max(1, args.iterations // 4)),
+    ]
+
+    rng = np.random.default_rng(args.seed)
+    query_vectors = service.embedder.embed_batch(faces)
+    for size in args.sizes:
+        vectors = rng.normal(size=(size, 512)).astype(np.float32)
+        vectors[: len(query_vectors)] = query_vectors
+        gallery = GalleryIndex(dim=512)
+        gallery.load_arrays(np.arange(1, size + 1, dtype=np.int64), vectors)
+        del vectors
+        results.append(measure(f"gallery_search_{size}", lambda i: gallery.search(query_vectors[i % n], k=1), args.iterations))
+        results.append(measure(f"find_match_{size}", lambda i: service.find_match(frames[i % n], gallery), args.iterations))
+        del gallery
+
+    session_factory = _session_factory(args.database_url)
+    user_ids = _create_users(session_factory, args.iterations + 5, prefix=f"rec{time.time_ns()}-")
+
+    # Warmup and timed calls each need a user with no mark yet today
+    fresh_users = iter(user_ids)
+
+    def record(_: int) -> None:
+        with session_factory() as db:
+            AttendanceService(db).record(user_id=next(fresh_users), match_score=0.9, liveness_score=95)
+            db.commit()
+
+    results.append(measure("attendance_record", record, args.iterations, warmup=2, alloc_runs=0))
+    return results
+
+
+def run_http(args, service: FaceRecognitionService) -> dict:
+    import httpx
+
+    from app.api.dependencies import get_db_session, get_face_service, get_gallery
+    from app.main import app
+
+    session_factory = _session_factory(args.database_url)
+    user_ids = _create_users(session_factory, args.requests + 1, prefix=f"http{time.time_ns()}-")
+    kiosk_id = user_ids.pop()
+    # One distinct enrolled person per request, so every mark is a fresh CLOCK_IN
+    frames = synthetic_frames(service.detector, args.requests, args.seed + 1)
+    gallery = GalleryIndex(dim=512)
+    gallery.load_arrays(np.asarray(user_ids, dtype=np.int64), np.stack([service.analyze(frame)[0] for frame in frames]))
+
+    def db_session():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db_session] = db_session
+    app.dependency_overrides[get_face_service] = lambda: service
+    app.dependency_overrides[get_gallery] = lambda: gallery
+    token = create_access_token({"user_id": kiosk_id, "role": "STAFF"})
+
+    async def drive() -> tuple[list[float], dict[int, int], float]:
+        latencies: list[float] = []
+        statuses: dict[int, int] = {}
+        semaphore = asyncio.Semaphore(args.concurrency)
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+
+            async def one(frame: bytes) -> None:
+                async with semaphore:
+                    started = time.perf_counter()
+                    response = await client.post(
+                        "/api/v1/attendance/mark",
+                        files={"file": ("frame.jpg", frame, "image/jpeg")},
+                        headers={"Authorization": f"Bearer {token}"},
+                    )
+                    latencies.append((time.perf_counter() - started) * 1000)
+                    statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+            started = time.perf_counter()
+            await asyncio.gather(*(one(frame) for frame in frames))
+            return latencies, statuses, time.perf_counter() - started
+
+    try:
+        latencies, statuses, elapsed = asyncio.run(drive())
+    finally:
+        app.dependency_overrides.clear()
+    result = {
+        "stage": f"http_mark_c{args.concurrency}",
+        "iterations": args.requests,
+        **_percentiles(latencies),
+        "throughput_per_s": round(args.requests / elapsed, 2),
+        "statuses": {str(code): count for code, count in sorted(statuses.items())},
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+    }
+    print(f"{result['stage']:<28}{result['p50_ms']:>10.2f}{result['p95_ms']:>10.2f}{result['p99_ms']:>10.2f}{result['throughput_per_s']:>10.1f}")
+    print(f"  responses: {result['statuses']}")
+    return result
+
+
+def compare(current: list[dict], baseline_path: str, tolerance: float) -> bool:
+    baseline = {row["stage"]: row for row in json.loads(Path(baseline_path).read_text())["stages"]}
+    regressed = False
+    print(f"\n{'stage':<28}{'base p95':>10}{'now p95':>10}{'change':>9}")
+    for row in current:
+        if row["stage"] not in baseline:
+            continue
+        before, now = baseline[row["stage"]]["p95_ms"], row["p95_ms"]
+        change = (now - before) / before if before else 0.0
+        flag = " REGRESSION" if change > tolerance else ""
+        regressed |= bool(flag)
+        print(f"{row['stage']:<28}{before:>10.2f}{now:>10.2f}{change:>+9.1%}{flag}")
+    return regressed
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--frames", type=int, default=8, help="Distinct synthetic frames to cycle through")
+    parser.add_argument("--pretrained", action="store_true", help="Use the vggface2 weights (downloads once)")
+    parser.add_argument("--database-url", default=None, help="SQLAlchemy URL; default is a temporary SQLite file")
+    parser.add_argument("--http", action="store_true", help="Also run the concurrent HTTP scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--output", default=None, help="Write results as JSON")
+    parser.add_argument("--compare", default=None, help="Baseline JSON to check p95 regressions against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="Allowed p95 slowdown before flagging")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    settings = get_settings()
+    # Marks must not be rejected for the time of day the benchmark happens to run at
+    settings.attendance_window_start, settings.attendance_window_end = "00:00", "23:59"
+    service = FaceRecognitionService(
+        detector=FaceDetector(device="cpu"),
+        embedder=FaceEmbedder(device="cpu", model_name="vggface2" if args.pretrained else None),
+        liveness=LivenessService(),
+        quality=QualityScorer(),
+    )
+    frames = synthetic_frames(service.detector, args.frames, args.seed)
+
+    print(f"{'stage':<28}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'per s':>10}{'alloc KB':>12}{'RSS MB':>10}")
+    stages = run_stages(args, service, frames)
+    if args.http:
+        stages.append(run_http(args, service))
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cores": os.cpu_count(),
+            "torch_threads": torch.get_num_threads(),
+            "backend": settings.inference_backend,
+            "args": vars(args),
+        },
+        "stages": stages,
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+    }
+    print(f"peak RSS {report['peak_rss_mb']:.0f} MB")
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+    if args.compare:
+        return 1 if compare(stages, args.compare, args.tolerance) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,100 @@
+"""
+Embedding throughput and latency for workers x threads splits of this machine's cores.
+
+    python benchmarks/threads.py --cores 8 --requests 64 [--backend onnx] [--pretrained]
+
+Each worker is a separate process (like a uvicorn worker) with ``threads`` torch threads;
+together they keep ``clients`` requests in flight and each request embeds one face crop.
+The last line names the split with the highest throughput (ties go to the lower p95). Weights
+are random unless ``--pretrained`` is given; inference cost is the same either way.
+"""
+
+import argparse
+import multiprocessing as mp
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parents[1] / "src"))
+
+
+def _worker(threads: int, backend: str, pretrained: bool, model_dir: str, jobs, results, ready) -> None:
+    import torch
+
+    torch.set_num_threads(threads)
+    torch.set_num_interop_threads(1)
+    from app.services.face.embedder import FaceEmbedder
+
+    embedder = FaceEmbedder(device="cpu", model_name="vggface2" if pretrained else None, backend=backend, model_dir=model_dir)
+    face = np.random.default_rng(0).integers(0, 256, size=(160, 160, 3), dtype=np.uint8)
+    embedder.embed(face)
+    ready.put(True)
+    while (job := jobs.get()) is not None:
+        started = time.perf_counter()
+        embedder.embed(face)
+        results.put((job, started, time.perf_counter()))
+
+
+def _run(workers: int, threads: int, args) -> dict:
+    ctx = mp.get_context("spawn")
+    jobs, results, ready = ctx.Queue(), ctx.Queue(), ctx.Queue()
+    procs = [
+        ctx.Process(target=_worker, args=(threads, args.backend, args.pretrained, args.model_dir, jobs, results, ready), daemon=True)
+        for _ in range(workers)
+    ]
+    for proc in procs:
+        proc.start()
+    for _ in procs:
+        ready.get()
+
+    # Closed loop: ``clients`` requests outstanding, a new one queued as each finishes
+    clients = args.clients or workers
+    latencies = []
+    queued = {}
+    started = time.perf_counter()
+    for job in range(min(clients, args.requests)):
+        queued[job] = time.perf_counter()
+        jobs.put(job)
+    sent = len(queued)
+    while len(latencies) < args.requests:
+        job, _, finished = results.get()
+        latencies.append((finished - queued.pop(job)) * 1000)
+        if sent < args.requests:
+            queued[sent] = time.perf_counter()
+            jobs.put(sent)
+            sent += 1
+    elapsed = time.perf_counter() - started
+    for _ in procs:
+        jobs.put(None)
+    for proc in procs:
+        proc.join()
+    p50, p95 = np.percentile(latencies, [50, 95])
+    return {"workers": workers, "threads": threads, "rps": args.requests / elapsed, "p50": p50, "p95": p95}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cores", type=int, default=mp.cpu_count())
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--clients", type=int, default=0, help="Concurrent requests (default: one per worker)")
+    parser.add_argument("--backend", default="eager", choices=["eager", "torchscript", "onnx"])
+    parser.add_argument("--model-dir", default="/tmp/attendance-exported")
+    parser.add_argument("--pretrained", action="store_true")
+    args = parser.parse_args()
+
+    splits = [(w, args.cores // w) for w in range(1, args.cores + 1) if args.cores % w == 0]
+    print(f"{args.cores} cores, {args.requests} single-face embeddings per split, backend={args.backend}")
+    print(f"{'workers':>8}{'threads':>9}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}")
+    rows = []
+    for workers, threads in splits:
+        row = _run(workers, threads, args)
+        rows.append(row)
+        print(f"{row['workers']:>8}{row['threads']:>9}{row['rps']:>9.1f}{row['p50']:>9.1f}{row['p95']:>9.1f}")
+    best = max(rows, key=lambda row: (row["rps"], -row["p95"]))
+    print(f"best: WEB_CONCURRENCY={best['workers']} INFERENCE_INTRA_OP_THREADS={best['threads']} INFERENCE_EXECUTOR_WORKERS=1")
+
+
+if __name__ == "__main__":
+    main()
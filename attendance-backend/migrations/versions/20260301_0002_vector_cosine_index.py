@@ -0,0 +1,47 @@
+"""rebuild face_embeddings vector index with vector_cosine_ops"""
+
+import math
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.config import get_settings
+
+
+# revision identifiers, used by Alembic.
+revision = "20260301_0002"
+down_revision = "20260106_0001"
+branch_labels = None
+depends_on = None
+
+
+def _ivfflat_lists(rows: int) -> int:
+    # pgvector guidance: rows / 1000 up to 1M rows, sqrt(rows) beyond
+    if rows <= 1_000_000:
+        return max(1, rows // 1000)
+    return int(math.sqrt(rows))
+
+
+def upgrade():
+    settings = get_settings()
+    op.execute("DROP INDEX IF EXISTS ix_face_embeddings_vector")
+    if settings.vector_index_type == "hnsw":
+        op.execute(
+            "CREATE INDEX ix_face_embeddings_vector ON face_embeddings "
+            f"USING hnsw (vector vector_cosine_ops) WITH (m = {int(settings.hnsw_m)}, ef_construction = {int(settings.hnsw_ef_construction)})"
+        )
+        return
+
+    lists = settings.ivfflat_lists
+    if not lists:
+        rows = op.get_bind().execute(sa.text("SELECT count(*) FROM face_embeddings")).scalar()
+        lists = _ivfflat_lists(rows)
+    op.execute(
+        "CREATE INDEX ix_face_embeddings_vector ON face_embeddings "
+        f"USING ivfflat (vector vector_cosine_ops) WITH (lists = {int(lists)})"
+    )
+
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS ix_face_embeddings_vector")
+    op.create_index("ix_face_embeddings_vector", "face_embeddings", ["vector"], postgresql_using="ivfflat")
@@ -0,0 +1,26 @@
+"""add face_embeddings.updated_at for incremental gallery loading"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "20260310_0003"
+down_revision = "20260301_0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column(
+        "face_embeddings",
+        # timestamptz like the model: the gallery snapshot high-water mark compares instants, not wall times
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    )
+    op.execute("UPDATE face_embeddings SET updated_at = created_at")
+    op.create_index("ix_face_embeddings_updated_at", "face_embeddings", ["updated_at"])
+
+
+def downgrade():
+    op.drop_index("ix_face_embeddings_updated_at", table_name="face_embeddings")
+    op.drop_column("face_embeddings", "updated_at")
@@ -0,0 +1,24 @@
+"""gallery_versions counter for LISTEN/NOTIFY gallery sync"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "20260315_0004"
+down_revision = "20260310_0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "gallery_versions",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("version", sa.BigInteger(), nullable=False, server_default="0"),
+    )
+    op.execute("INSERT INTO gallery_versions (id, version) VALUES (1, 0)")
+
+
+def downgrade():
+    op.drop_table("gallery_versions")
@@ -0,0 +1,25 @@
+"""allow several face templates per user and model"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "20260320_0005"
+down_revision = "20260315_0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column("face_embeddings", sa.Column("slot", sa.Integer(), nullable=False, server_default="0"))
+    op.drop_constraint("uq_user_model", "face_embeddings", type_="unique")
+    op.create_unique_constraint("uq_user_model_slot", "face_embeddings", ["user_id", "model_version", "slot"])
+
+
+def downgrade():
+    # Keep only each user's first template so the single-template constraint holds again
+    op.execute("DELETE FROM face_embeddings WHERE slot <> 0")
+    op.drop_constraint("uq_user_model_slot", "face_embeddings", type_="unique")
+    op.create_unique_constraint("uq_user_model", "face_embeddings", ["user_id", "model_version"])
+    op.drop_column("face_embeddings", "slot")
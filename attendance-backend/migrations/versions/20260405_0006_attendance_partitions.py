@@ -0,0 +1,124 @@
+"""partition attendance_logs by month on date; composite indexes for the mark queries
+
+Rewrites the table: run it in a maintenance window on large installations.
+"""
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "20260405_0006"
+down_revision = "20260320_0005"
+branch_labels = None
+depends_on = None
+
+# The functions resolve attendance_logs through search_path, so benchmarks can run them on a scratch schema
+CREATE_PARTITIONS_FN = """
+CREATE OR REPLACE FUNCTION attendance_logs_create_partitions(months_ahead integer DEFAULT 3, start_date date DEFAULT current_date)
+RETURNS integer LANGUAGE plpgsql AS $$
+DECLARE
+    month date := date_trunc('month', start_date)::date;
+    last_month date := (date_trunc('month', current_date) + make_interval(months => months_ahead))::date;
+    name text;
+    created integer := 0;
+BEGIN
+    -- Every worker calls this at startup
+    PERFORM pg_advisory_xact_lock(hashtext('attendance_logs_partitions'));
+    WHILE month <= last_month LOOP
+        name := format('attendance_logs_y%sm%s', to_char(month, 'YYYY'), to_char(month, 'MM'));
+        IF to_regclass(name) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF attendance_logs FOR VALUES FROM (%L) TO (%L)',
+                name, month, (month + interval '1 month')::date
+            );
+            created := created + 1;
+        END IF;
+        month := (month + interval '1 month')::date;
+    END LOOP;
+    RETURN created;
+END;
+$$
+"""
+
+ARCHIVE_PARTITIONS_FN = """
+CREATE OR REPLACE FUNCTION attendance_logs_archive_partitions(keep_months integer, archive_schema text DEFAULT 'attendance_archive')
+RETURNS SETOF text LANGUAGE plpgsql AS $$
+DECLARE
+    cutoff date := (date_trunc('month', current_date) - make_interval(months => keep_months))::date;
+    part record;
+BEGIN
+    PERFORM pg_advisory_xact_lock(hashtext('attendance_logs_partitions'));
+    EXECUTE format('CREATE SCHEMA IF NOT EXISTS %I', archive_schema);
+    FOR part IN
+        SELECT c.oid::regclass AS rel, c.relname,
+               (regexp_match(pg_get_expr(c.relpartbound, c.oid), 'TO \\(''([0-9-]+)''\\)'))[1]::date AS upper_bound
+        FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'attendance_logs'::regclass
+        ORDER BY 3
+    LOOP
+        IF part.upper_bound <= cutoff THEN
+            -- Detached months keep their data as plain tables for pg_dump / DROP by the operator
+            EXECUTE format('ALTER TABLE attendance_logs DETACH PARTITION %s', part.rel);
+            EXECUTE format('ALTER TABLE %s SET SCHEMA %I', part.rel, archive_schema);
+            RETURN NEXT part.relname::text;
+        END IF;
+    END LOOP;
+END;
+$$
+"""
+
+# Matched to AttendanceRepository: the unique key answers "clocked in today?" from the index alone,
+# (user_id, timestamp) the cooldown check and last-log lookup, (date, timestamp) the recent-logs
+# listing, which walks partitions newest first and stops at its LIMIT
+INDEXES = (
+    "ALTER TABLE attendance_logs ADD CONSTRAINT attendance_logs_pkey PRIMARY KEY (id, date)",
+    "ALTER TABLE attendance_logs ADD CONSTRAINT uq_user_date_type UNIQUE (user_id, date, type)",
+    "CREATE INDEX ix_attendance_user_timestamp ON attendance_logs (user_id, timestamp)",
+    "CREATE INDEX ix_attendance_date_timestamp ON attendance_logs (date, timestamp)",
+)
+
+
+def upgrade():
+    op.execute("ALTER TABLE attendance_logs RENAME TO attendance_logs_legacy")
+    op.execute("ALTER TABLE attendance_logs_legacy RENAME CONSTRAINT attendance_logs_pkey TO attendance_logs_legacy_pkey")
+    op.execute("ALTER TABLE attendance_logs_legacy RENAME CONSTRAINT uq_user_date_type TO uq_user_date_type_legacy")
+    op.drop_index("ix_attendance_user_id", table_name="attendance_logs_legacy")
+    op.drop_index("ix_attendance_timestamp", table_name="attendance_logs_legacy")
+
+    # Same columns, types and defaults (id keeps drawing from attendance_logs_id_seq)
+    op.execute("CREATE TABLE attendance_logs (LIKE attendance_logs_legacy INCLUDING DEFAULTS) PARTITION BY RANGE (date)")
+    for statement in INDEXES:
+        op.execute(statement)
+    op.execute(
+        "ALTER TABLE attendance_logs ADD CONSTRAINT attendance_logs_user_id_fkey "
+        "FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE"
+    )
+    op.execute(CREATE_PARTITIONS_FN)
+    op.execute(ARCHIVE_PARTITIONS_FN)
+    op.execute("SELECT attendance_logs_create_partitions(3, (SELECT coalesce(min(date), current_date) FROM attendance_logs_legacy))")
+
+    op.execute("INSERT INTO attendance_logs SELECT * FROM attendance_logs_legacy")
+    op.execute("ALTER SEQUENCE attendance_logs_id_seq OWNED BY attendance_logs.id")
+    op.execute("DROP TABLE attendance_logs_legacy")
+    op.execute("ANALYZE attendance_logs")
+
+
+def downgrade():
+    # Archived partitions are left where they are; only attached months are copied back
+    op.execute("ALTER TABLE attendance_logs RENAME TO attendance_logs_partitioned")
+    op.execute("ALTER TABLE attendance_logs_partitioned RENAME CONSTRAINT attendance_logs_pkey TO attendance_logs_partitioned_pkey")
+    op.execute("ALTER TABLE attendance_logs_partitioned RENAME CONSTRAINT uq_user_date_type TO uq_user_date_type_partitioned")
+    op.execute("CREATE TABLE attendance_logs (LIKE attendance_logs_partitioned INCLUDING DEFAULTS)")
+    op.execute("ALTER TABLE attendance_logs ADD CONSTRAINT attendance_logs_pkey PRIMARY KEY (id)")
+    op.execute("ALTER TABLE attendance_logs ADD CONSTRAINT uq_user_date_type UNIQUE (user_id, date, type)")
+    op.execute(
+        "ALTER TABLE attendance_logs ADD CONSTRAINT attendance_logs_user_id_fkey "
+        "FOREIGN KEY (user_id) REFERENCES users (id) ON DELETE CASCADE"
+    )
+    op.execute("INSERT INTO attendance_logs SELECT * FROM attendance_logs_partitioned")
+    op.execute("ALTER SEQUENCE attendance_logs_id_seq OWNED BY attendance_logs.id")
+    op.execute("DROP TABLE attendance_logs_partitioned")
+    op.create_index("ix_attendance_user_id", "attendance_logs", ["user_id"])
+    op.create_index("ix_attendance_timestamp", "attendance_logs", ["timestamp"])
+    op.execute("DROP FUNCTION IF EXISTS attendance_logs_archive_partitions(integer, text)")
+    op.execute("DROP FUNCTION IF EXISTS attendance_logs_create_partitions(integer, date)")
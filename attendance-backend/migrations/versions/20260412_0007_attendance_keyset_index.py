@@ -0,0 +1,21 @@
+"""(timestamp, id) index for keyset pagination of attendance_logs"""
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "20260412_0007"
+down_revision = "20260405_0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Listings now page on (timestamp, id) rather than reading the newest dates first
+    op.create_index("ix_attendance_timestamp_id", "attendance_logs", ["timestamp", "id"])
+    op.drop_index("ix_attendance_date_timestamp", table_name="attendance_logs")
+
+
+def downgrade():
+    op.create_index("ix_attendance_date_timestamp", "attendance_logs", ["date", "timestamp"])
+    op.drop_index("ix_attendance_timestamp_id", table_name="attendance_logs")
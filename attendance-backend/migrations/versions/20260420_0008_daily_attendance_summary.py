@@ -0,0 +1,30 @@
+"""daily_attendance_summary: per user and day first_in / last_out / duration / late"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "20260420_0008"
+down_revision = "20260412_0007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "daily_attendance_summary",
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("date", sa.Date(), primary_key=True),
+        sa.Column("first_in", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("last_out", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("duration_seconds", sa.Integer(), nullable=True),
+        sa.Column("late", sa.Boolean(), nullable=False, server_default=sa.text("false")),
+    )
+    op.create_index("ix_daily_attendance_summary_date", "daily_attendance_summary", ["date"])
+    # Existing history is summarized by `python -m app.cli.rebuild_summaries`: lateness depends on settings
+
+
+def downgrade():
+    op.drop_index("ix_daily_attendance_summary_date", table_name="daily_attendance_summary")
+    op.drop_table("daily_attendance_summary")
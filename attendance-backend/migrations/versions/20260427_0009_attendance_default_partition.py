@@ -0,0 +1,101 @@
+"""DEFAULT partition for attendance_logs; partition upkeep drains it into monthly partitions
+
+Without it an insert fails when its month has no partition yet: a missed maintenance run,
+clock skew or a backfill of old dates.
+"""
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "20260427_0009"
+down_revision = "20260420_0008"
+branch_labels = None
+depends_on = None
+
+# Same signature as in 20260405_0006. A month whose rows already sit in the DEFAULT partition
+# cannot be created with PARTITION OF (the default would violate the new bound), so each month
+# is built as a plain table, filled from the default and attached. Months that only exist in
+# the default (old backfills) get partitions too, leaving the default empty after every run.
+CREATE_PARTITIONS_FN = """
+CREATE OR REPLACE FUNCTION attendance_logs_create_partitions(months_ahead integer DEFAULT 3, start_date date DEFAULT current_date)
+RETURNS integer LANGUAGE plpgsql AS $$
+DECLARE
+    months date[] := ARRAY(
+        SELECT generate_series(
+            date_trunc('month', start_date),
+            date_trunc('month', current_date) + make_interval(months => months_ahead),
+            interval '1 month'
+        )::date
+    );
+    month date;
+    name text;
+    created integer := 0;
+BEGIN
+    -- Every worker calls this at startup
+    PERFORM pg_advisory_xact_lock(hashtext('attendance_logs_partitions'));
+    IF to_regclass('attendance_logs_default') IS NOT NULL THEN
+        months := months || ARRAY(SELECT DISTINCT date_trunc('month', date)::date FROM attendance_logs_default);
+    END IF;
+    FOR month IN SELECT DISTINCT m FROM unnest(months) AS m ORDER BY m LOOP
+        name := format('attendance_logs_y%sm%s', to_char(month, 'YYYY'), to_char(month, 'MM'));
+        IF to_regclass(name) IS NULL THEN
+            EXECUTE format('CREATE TABLE %I (LIKE attendance_logs INCLUDING DEFAULTS)', name);
+            IF to_regclass('attendance_logs_default') IS NOT NULL THEN
+                EXECUTE format(
+                    'WITH moved AS (DELETE FROM attendance_logs_default WHERE date >= %L AND date < %L RETURNING *) INSERT INTO %I SELECT * FROM moved',
+                    month, (month + interval '1 month')::date, name
+                );
+            END IF;
+            EXECUTE format(
+                'ALTER TABLE attendance_logs ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                name, month, (month + interval '1 month')::date
+            );
+            created := created + 1;
+        END IF;
+    END LOOP;
+    RETURN created;
+END;
+$$
+"""
+
+# The 20260405_0006 body, restored on downgrade: it creates months with PARTITION OF
+PREVIOUS_CREATE_PARTITIONS_FN = """
+CREATE OR REPLACE FUNCTION attendance_logs_create_partitions(months_ahead integer DEFAULT 3, start_date date DEFAULT current_date)
+RETURNS integer LANGUAGE plpgsql AS $$
+DECLARE
+    month date := date_trunc('month', start_date)::date;
+    last_month date := (date_trunc('month', current_date) + make_interval(months => months_ahead))::date;
+    name text;
+    created integer := 0;
+BEGIN
+    -- Every worker calls this at startup
+    PERFORM pg_advisory_xact_lock(hashtext('attendance_logs_partitions'));
+    WHILE month <= last_month LOOP
+        name := format('attendance_logs_y%sm%s', to_char(month, 'YYYY'), to_char(month, 'MM'));
+        IF to_regclass(name) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF attendance_logs FOR VALUES FROM (%L) TO (%L)',
+                name, month, (month + interval '1 month')::date
+            );
+            created := created + 1;
+        END IF;
+        month := (month + interval '1 month')::date;
+    END LOOP;
+    RETURN created;
+END;
+$$
+"""
+
+
+def upgrade():
+    op.execute("CREATE TABLE attendance_logs_default PARTITION OF attendance_logs DEFAULT")
+    op.execute(CREATE_PARTITIONS_FN)
+
+
+def downgrade():
+    # Drain whatever landed in the default first; the function works without the table
+    op.execute(CREATE_PARTITIONS_FN)
+    op.execute("SELECT attendance_logs_create_partitions(0)")
+    op.execute("DROP TABLE attendance_logs_default")
+    op.execute(PREVIOUS_CREATE_PARTITIONS_FN)
@@ -1,11 +1,20 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app.config import get_settings
 from app.core.security import decode_access_token
-from app.db.session import get_db
+from app.db.models import User
+from app.db.session import get_async_db, get_db
+from app.repositories.embedding_repository import EmbeddingRepository
 from app.repositories.user_repository import UserRepository
+from app.schemas.auth import TokenData
+from app.services.face.gallery import DatabaseGallery, GalleryIndex, get_gallery_index
+from app.services.face.quality import get_quality_scorer
+from app.services.face.recognition_service import MODEL_VERSION, FaceRecognitionService
+from app.services.face.registry import get_model_registry
+from app.services.face.snapshot import populate_gallery
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
 settings = get_settings()
@@ -24,8 +33,57 @@ def get_current_user(db: Session = Depends(get_db_session), token: str = Depends
     return user
 
 
+def get_token_claims(token: str = Depends(oauth2_scheme)) -> TokenData:
+    """
+    The caller's id and role from the signed token, without loading the user.
+
+    For hot paths such as kiosk marks; a deleted account keeps working until its token expires.
+    """
+    try:
+        return TokenData(**decode_access_token(token))
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token") from exc
+
+
 def require_admin(user=Depends(get_current_user)):
     if user.role != "ADMIN":
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admins only")
     return user
 
+
+def get_face_service() -> FaceRecognitionService:
+    registry = get_model_registry().load()
+    return FaceRecognitionService(
+        detector=registry.detector, embedder=registry.embedder, liveness=registry.liveness, quality=get_quality_scorer()
+    )
+
+
+def get_gallery(db: Session = Depends(get_db_session)) -> GalleryIndex | DatabaseGallery:
+    if settings.gallery_backend == "pgvector":
+        return DatabaseGallery(EmbeddingRepository(db), MODEL_VERSION)
+    gallery = get_gallery_index(MODEL_VERSION)
+    return gallery.ensure_loaded(lambda index: populate_gallery(index, EmbeddingRepository(db)))
+
+
+async def get_async_db_session():
+    async for db in get_async_db():
+        yield db
+
+
+async def get_current_user_async(db: AsyncSession = Depends(get_async_db_session), token: str = Depends(oauth2_scheme)):
+    payload = decode_access_token(token)
+    user = await db.get(User, payload["user_id"])
+    if not user:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+    return user
+
+
+async def require_admin_async(user=Depends(get_current_user_async)):
+    if user.role != "ADMIN":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admins only")
+    return user
+
+
+async def get_gallery_async(db: AsyncSession = Depends(get_async_db_session)) -> GalleryIndex | DatabaseGallery:
+    # A DatabaseGallery built here is bound to db.sync_session and must be searched via db.run_sync
+    return await db.run_sync(get_gallery)
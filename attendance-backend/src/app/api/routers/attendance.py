@@ -1,60 +1,263 @@
-from fastapi import APIRouter, Depends, File, HTTPException, UploadFile, status
+from datetime import date
+from typing import Optional
+
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Response, UploadFile, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.api.dependencies import get_current_user, get_db_session
+from app.api.dependencies import (
+    get_async_db_session,
+    get_current_user,
+    get_db_session,
+    get_face_service,
+    get_gallery,
+    get_gallery_async,
+    get_token_claims,
+    require_admin,
+)
 from app.config import get_settings
-from app.core.errors import DuplicateAttendance, FaceNotDetected, SpoofDetected, WindowViolation
-from app.db.models import AttendanceLog
-from app.repositories.attendance_repository import AttendanceRepository
-from app.repositories.embedding_repository import EmbeddingRepository
-from app.schemas.attendance import AttendanceDecision, AttendanceLogOut
+from app.core.errors import DuplicateAttendance, FaceNotDetected, LowQualityFrame, ServiceOverloaded, SpoofDetected, WindowViolation
+from app.core.metrics import metrics
+from app.core.security import decode_access_token
+from app.db.models import AttendanceLog, AttendanceTypeEnum, RoleEnum, User
+from app.db.session import AsyncSessionLocal, SessionLocal
+from app.repositories.attendance_repository import AttendanceRepository, LogFilters, decode_cursor, encode_cursor
+from app.repositories.summary_repository import SummaryRepository
+from app.schemas.attendance import (
+    AttendanceDecision,
+    AttendanceLogOut,
+    AttendanceLogPage,
+    DailySummaryOut,
+    GroupAttendanceResult,
+    GroupSkip,
+    UserSummaryOut,
+)
+from app.schemas.auth import TokenData
+from app.services.attendance_export import EXPORT_FORMATS, parquet_available, stream_export
 from app.services.attendance_service import AttendanceService
-from app.services.face.recognition_service import FaceRecognitionService
+from app.services.attendance_summary import summarize_days
+from app.services.face.executor import InferenceExecutor, get_inference_executor
+from app.services.face.gallery import DatabaseGallery, GalleryIndex
+from app.services.face.recognition_service import FaceRecognitionService, MatchResult
+from app.services.face.roster import get_recent_roster
+from app.services.stream_service import StreamSession
 
 router = APIRouter(prefix="/attendance", tags=["attendance"])
 
+MAX_BURST_FRAMES = 8
+MAX_PAGE_SIZE = 500
+MAX_SUMMARY_DAYS = 366
+
+
+def _scan_roster(kiosk_id: int, expected: list[int]) -> list[int]:
+    # Users the caller expects (a class list) plus those this kiosk matched recently
+    return list(dict.fromkeys([*expected, *get_recent_roster().users(kiosk_id)]))
+
 
 @router.post("/mark", response_model=AttendanceDecision)
 def mark_attendance(
     file: UploadFile = File(...),
+    roster: list[int] = Query(default=[]),
     db: Session = Depends(get_db_session),
-    current_user=Depends(get_current_user),
+    claims: TokenData = Depends(get_token_claims),
+    face_service: FaceRecognitionService = Depends(get_face_service),
+    gallery: GalleryIndex | DatabaseGallery = Depends(get_gallery),
 ):
-    face_service = FaceRecognitionService()
-    emb_repo = EmbeddingRepository(db)
     attendance_service = AttendanceService(db)
-    embeddings = list(emb_repo.list_embeddings())
-    if not embeddings:
+    if not len(gallery):
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No embeddings registered")
 
     file_bytes = file.file.read()
     try:
-        match = face_service.find_match(file_bytes, embeddings)
-    except (FaceNotDetected, SpoofDetected) as exc:
+        match = face_service.find_match(file_bytes, gallery, roster=_scan_roster(claims.user_id, roster))
+    except (FaceNotDetected, LowQualityFrame, SpoofDetected) as exc:
         raise exc
 
     if match.score < get_settings().similarity_threshold:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Face not recognized")
 
+    return _record_match(attendance_service, db, claims.user_id, match)
+
+
+def _record_match(attendance_service: AttendanceService, db: Session, kiosk_id: int, match: MatchResult) -> AttendanceDecision:
     try:
         log: AttendanceLog = attendance_service.record(
             user_id=match.user_id,
             match_score=match.score,
             liveness_score=match.liveness.score if match.liveness else None,
+            embedding=match.embedding,
         )
     except (DuplicateAttendance, WindowViolation) as exc:
         raise exc
 
     db.commit()
+    get_recent_roster().remember(kiosk_id, match.user_id)
     return AttendanceDecision(
         status=log.type,
         confidence=match.score,
         liveness_score=match.liveness.score if match.liveness else None,
         user_id=match.user_id,
         timestamp=log.timestamp,
+        matched_via=match.matched_via,
+        timings_ms=match.timings,
+    )
+
+
+@router.post("/mark-burst", response_model=AttendanceDecision)
+def mark_attendance_burst(
+    files: list[UploadFile] = File(...),
+    roster: list[int] = Query(default=[]),
+    db: Session = Depends(get_db_session),
+    claims: TokenData = Depends(get_token_claims),
+    face_service: FaceRecognitionService = Depends(get_face_service),
+    gallery: GalleryIndex | DatabaseGallery = Depends(get_gallery),
+):
+    """
+    A few quick captures of one person; only the best-quality face is checked and embedded.
+    """
+    if len(files) > MAX_BURST_FRAMES:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"At most {MAX_BURST_FRAMES} frames per burst")
+    if not len(gallery):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No embeddings registered")
+
+    match = face_service.find_match_burst([file.file.read() for file in files], gallery, roster=_scan_roster(claims.user_id, roster))
+    if match.score < get_settings().similarity_threshold:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Face not recognized")
+    return _record_match(AttendanceService(db), db, claims.user_id, match)
+
+
+@router.post("/mark-async", response_model=AttendanceDecision)
+async def mark_attendance_async(
+    file: UploadFile = File(...),
+    roster: list[int] = Query(default=[]),
+    db: AsyncSession = Depends(get_async_db_session),
+    claims: TokenData = Depends(get_token_claims),
+    face_service: FaceRecognitionService = Depends(get_face_service),
+    gallery: GalleryIndex | DatabaseGallery = Depends(get_gallery_async),
+    executor: InferenceExecutor = Depends(get_inference_executor),
+):
+    file_bytes = await file.read()
+    scan_roster = _scan_roster(claims.user_id, roster)
+    if isinstance(gallery, DatabaseGallery):
+        # pgvector search needs the session, so only the CPU-bound part goes to the executor
+        if not await db.run_sync(lambda _: len(gallery)):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No embeddings registered")
+        timings: dict[str, float] = {}
+        embedding, live_result = await executor.run(face_service.analyze, file_bytes, timings)
+        match = await db.run_sync(lambda _: face_service.match(embedding, live_result, gallery, roster=scan_roster, timings=timings))
+    else:
+        if not len(gallery):
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No embeddings registered")
+        match = await executor.run(face_service.find_match, file_bytes, gallery, scan_roster)
+
+    if match.score < get_settings().similarity_threshold:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Face not recognized")
+
+    liveness_score = match.liveness.score if match.liveness else None
+    log: AttendanceLog = await db.run_sync(
+        lambda session: AttendanceService(session).record(
+            user_id=match.user_id, match_score=match.score, liveness_score=liveness_score, embedding=match.embedding
+        )
+    )
+    await db.commit()
+    get_recent_roster().remember(claims.user_id, match.user_id)
+    return AttendanceDecision(
+        status=log.type,
+        confidence=match.score,
+        liveness_score=liveness_score,
+        user_id=match.user_id,
+        timestamp=log.timestamp,
+        matched_via=match.matched_via,
+        timings_ms=match.timings,
     )
 
 
+@router.websocket("/stream")
+async def stream_attendance(
+    websocket: WebSocket,
+    token: str = Query(...),
+    roster: list[int] = Query(default=[]),
+    face_service: FaceRecognitionService = Depends(get_face_service),
+    executor: InferenceExecutor = Depends(get_inference_executor),
+):
+    """
+    Continuous kiosk scanning: the client sends JPEG frames as binary messages and receives
+    "tracks", "decision" and "rejected" JSON events. Browsers cannot set headers on a
+    WebSocket, so the bearer token is passed as a query parameter.
+    """
+    try:
+        kiosk_id = decode_access_token(token)["user_id"]
+    except ValueError:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    async with AsyncSessionLocal() as db:
+        if await db.get(User, kiosk_id) is None:
+            await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+            return
+
+    await websocket.accept()
+    session = StreamSession(face_service, SessionLocal, get_gallery, kiosk_id, roster)
+    try:
+        while True:
+            frame = await websocket.receive_bytes()
+            if not session.next_frame():
+                continue
+            try:
+                events = await executor.run(session.process_frame, frame)
+            except ServiceOverloaded:
+                # Another frame follows shortly; dropping this one keeps the stream current
+                metrics.incr("stream.frames_dropped")
+                continue
+            for event in events:
+                await websocket.send_json(event)
+    except WebSocketDisconnect:
+        pass
+
+
+@router.post("/mark-group", response_model=GroupAttendanceResult)
+def mark_group_attendance(
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db_session),
+    claims: TokenData = Depends(get_token_claims),
+    face_service: FaceRecognitionService = Depends(get_face_service),
+    gallery: GalleryIndex | DatabaseGallery = Depends(get_gallery),
+):
+    attendance_service = AttendanceService(db)
+    if not len(gallery):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No embeddings registered")
+
+    result = face_service.find_matches(file.file.read(), gallery)
+    threshold = get_settings().similarity_threshold
+    skipped = [GroupSkip(user_id=None, confidence=None, reason=reason) for reason in result.rejected]
+    recognized = []
+    for match in result.matches:
+        if match.score < threshold:
+            skipped.append(GroupSkip(user_id=None, confidence=match.score, reason="Face not recognized"))
+        else:
+            recognized.append(match)
+
+    # All logs for the photo are written in one transaction
+    by_user = {match.user_id: match for match in recognized}
+    logs, rejected = attendance_service.record_many(
+        [(match.user_id, match.score, match.liveness.score if match.liveness else None) for match in recognized]
+    )
+    db.commit()
+
+    skipped.extend(GroupSkip(user_id=user_id, confidence=by_user[user_id].score, reason=reason) for user_id, reason in rejected)
+    marked = [
+        AttendanceDecision(
+            status=log.type,
+            confidence=by_user[log.user_id].score,
+            liveness_score=log.liveness_score,
+            user_id=log.user_id,
+            timestamp=log.timestamp,
+        )
+        for log in logs
+    ]
+    return GroupAttendanceResult(faces_detected=result.faces_detected, marked=marked, skipped=skipped)
+
+
 @router.post("/manual", response_model=AttendanceDecision)
 def manual_override(
     user_id: int,
@@ -68,8 +271,98 @@ def manual_override(
     return AttendanceDecision(status=log.type, confidence=1.0, liveness_score=None, user_id=user_id, timestamp=log.timestamp)
 
 
-@router.get("/logs", response_model=list[AttendanceLogOut])
-def list_logs(limit: int = 50, db: Session = Depends(get_db_session), current_user=Depends(get_current_user)):
-    repo = AttendanceRepository(db)
-    return repo.get_recent_logs(limit=limit)
+def _log_filters(
+    user_id: Optional[int] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    type: Optional[AttendanceTypeEnum] = None,
+    manual_override: Optional[bool] = None,
+) -> LogFilters:
+    return LogFilters(user_id=user_id, date_from=date_from, date_to=date_to, type=type, manual_override=manual_override)
 
+
+@router.get("/logs", response_model=AttendanceLogPage)
+def list_logs(
+    limit: int = Query(default=50, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    filters: LogFilters = Depends(_log_filters),
+    db: Session = Depends(get_db_session),
+    current_user=Depends(get_current_user),
+):
+    """
+    Newest first, ``limit`` at a time; follow ``next_cursor`` for older entries.
+    """
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc)) from exc
+    rows, has_more = AttendanceRepository(db).list_page(filters, limit, after)
+    # Rows come straight from the database, so they are serialized without re-validation
+    page = AttendanceLogPage.model_construct(
+        items=[AttendanceLogOut.model_construct(**row._mapping) for row in rows],
+        next_cursor=encode_cursor(rows[-1].timestamp, rows[-1].id) if has_more else None,
+    )
+    return Response(page.model_dump_json(), media_type="application/json")
+
+
+@router.get("/export")
+def export_logs(
+    format: str = Query(default="csv", pattern="^(csv|parquet)$"),
+    filters: LogFilters = Depends(_log_filters),
+    admin=Depends(require_admin),
+):
+    """
+    Every matching log, oldest first, streamed as CSV or Parquet in constant memory.
+    """
+    if format == "parquet" and not parquet_available():
+        raise HTTPException(status_code=status.HTTP_501_NOT_IMPLEMENTED, detail="Parquet export needs pyarrow installed")
+    span = f"{filters.date_from or 'start'}_{filters.date_to or 'now'}"
+    return StreamingResponse(
+        stream_export(SessionLocal, filters, format, get_settings().export_chunk_size),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="attendance_{span}.{format}"'},
+    )
+
+
+def _summary_range(date_from: date, date_to: date) -> tuple[date, date]:
+    if date_to < date_from:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="date_to is before date_from")
+    if (date_to - date_from).days >= MAX_SUMMARY_DAYS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Range is limited to {MAX_SUMMARY_DAYS} days")
+    return date_from, date_to
+
+
+@router.get("/summary/daily", response_model=list[DailySummaryOut])
+def daily_summary(
+    span: tuple[date, date] = Depends(_summary_range),
+    role: Optional[RoleEnum] = None,
+    user_id: list[int] = Query(default=[]),
+    db: Session = Depends(get_db_session),
+    admin=Depends(require_admin),
+):
+    """
+    Present / late / absent per day for the users in scope (a role and/or an explicit list).
+
+    Reads daily_attendance_summary and users only: one row per day and user, whatever the log volume.
+    """
+    date_from, date_to = span
+    return summarize_days(db, date_from, date_to, role.value if role else None, user_id)
+
+
+@router.get("/summary/users", response_model=list[UserSummaryOut])
+def user_summary(
+    span: tuple[date, date] = Depends(_summary_range),
+    role: Optional[RoleEnum] = None,
+    user_id: list[int] = Query(default=[]),
+    db: Session = Depends(get_db_session),
+    admin=Depends(require_admin),
+):
+    """
+    Days present, days late and time worked (CLOCK_IN to CLOCK_OUT) per user over the range.
+    """
+    date_from, date_to = span
+    rows = SummaryRepository(db).user_totals(date_from, date_to, role.value if role else None, user_id)
+    return [
+        UserSummaryOut(**row._mapping, worked_hours=round(row.worked_seconds / 3600, 2))
+        for row in rows
+    ]
@@ -1,15 +1,29 @@
 import secrets
+import zipfile
+from dataclasses import asdict
 from typing import List
 
 from fastapi import APIRouter, Depends, File, HTTPException, UploadFile, status
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.api.dependencies import get_db_session, require_admin
+from app.api.dependencies import (
+    get_async_db_session,
+    get_db_session,
+    get_face_service,
+    get_gallery,
+    get_gallery_async,
+    require_admin,
+    require_admin_async,
+)
 from app.core.security import hash_password
-from app.db.models import RoleEnum
+from app.db.models import RoleEnum, User
 from app.repositories.embedding_repository import EmbeddingRepository
 from app.repositories.user_repository import UserRepository
-from app.schemas.user import UserCreate, UserOut
+from app.schemas.user import BulkEnrollmentReport, BulkEnrollmentRowOut, UserCreate, UserOut
+from app.services.enrollment_service import BulkEnrollmentService, ImageSource, read_manifest
+from app.services.face.executor import InferenceExecutor, get_inference_executor
+from app.services.face.gallery import DatabaseGallery, GalleryIndex
 from app.services.face.recognition_service import FaceRecognitionService
 
 router = APIRouter(prefix="/users", tags=["users"])
@@ -39,16 +53,84 @@ def register_user(
     return user
 
 
+@router.post("/{user_id}/deactivate", response_model=UserOut)
+def deactivate_user(
+    user_id: int,
+    admin=Depends(require_admin),
+    db: Session = Depends(get_db_session),
+    gallery: GalleryIndex | DatabaseGallery = Depends(get_gallery),
+):
+    user_repo = UserRepository(db)
+    user = user_repo.get_by_id(user_id)
+    if not user:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    user_repo.set_active(user, False)
+    db.commit()
+    # Other workers drop the user when the change notification arrives
+    gallery.remove(user_id)
+    return user
+
+
+@router.delete("/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
+def delete_user(
+    user_id: int,
+    admin=Depends(require_admin),
+    db: Session = Depends(get_db_session),
+    gallery: GalleryIndex | DatabaseGallery = Depends(get_gallery),
+):
+    user_repo = UserRepository(db)
+    user = user_repo.get_by_id(user_id)
+    if not user:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    user_repo.delete_user(user)
+    db.commit()
+    gallery.remove(user_id)
+
+
+@router.post("/bulk-enroll", response_model=BulkEnrollmentReport)
+def bulk_enroll(
+    archive: UploadFile = File(...),
+    manifest: UploadFile = File(...),
+    admin=Depends(require_admin),
+    db: Session = Depends(get_db_session),
+    face_service: FaceRecognitionService = Depends(get_face_service),
+    gallery: GalleryIndex | DatabaseGallery = Depends(get_gallery),
+):
+    """
+    Enroll a small intake within the request. Not resumable: chunks committed before an
+    interruption stay enrolled, and re-posting the archive redoes every row. Use
+    ``python -m app.cli.bulk_enroll --report`` for large or resumable runs.
+    """
+    try:
+        rows = read_manifest(manifest.file)
+        source = ImageSource(archive.file)
+    except (ValueError, zipfile.BadZipFile) as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+    try:
+        BulkEnrollmentService(db, face_service, EmbeddingRepository(db, gallery=gallery)).run(rows, source)
+    finally:
+        source.close()
+    return BulkEnrollmentReport(
+        total=len(rows),
+        enrolled=sum(row.status == "enrolled" for row in rows),
+        failed=sum(row.status == "failed" for row in rows),
+        superseded=sum(row.status == "superseded" for row in rows),
+        rows=[BulkEnrollmentRowOut(**asdict(row)) for row in rows],
+    )
+
+
 @router.post("/{user_id}/enroll")
 def enroll_face(
     user_id: int,
     file: UploadFile = File(...),
+    replace: bool = False,
     admin=Depends(require_admin),
     db: Session = Depends(get_db_session),
+    face_service: FaceRecognitionService = Depends(get_face_service),
+    gallery: GalleryIndex | DatabaseGallery = Depends(get_gallery),
 ):
     user_repo = UserRepository(db)
-    emb_repo = EmbeddingRepository(db)
-    face_service = FaceRecognitionService()
+    emb_repo = EmbeddingRepository(db, gallery=gallery)
 
     user = user_repo.get_by_id(user_id)
     if not user:
@@ -69,20 +151,8 @@ def enroll_face(
                 detail="Uploaded file is empty"
             )
         
-        # For enrollment, completely bypass liveness check - just detect face and create embedding
-        image = face_service._load_image(image_bytes)
-        faces = face_service.detector.detect(image)
-        if not faces:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="No face detected in image. Please upload a clear image with a visible face looking at the camera."
-            )
-        
-        # Select largest face
-        face = sorted(faces, key=lambda f: f.size[0] * f.size[1], reverse=True)[0]
-        
-        # Get embedding - NO LIVENESS CHECK FOR ENROLLMENT
-        embedding = face_service.embedder.embed(face)
+        # For enrollment, completely bypass liveness check - just detect the largest face and create embedding
+        embedding = face_service.embed_largest_face(image_bytes)
         
         # Set a default liveness score (we don't check it for enrollment)
         liveness_score = 100  # Default high score since we're not checking
@@ -93,7 +163,8 @@ def enroll_face(
             model_version=face_service.model_version,
             vector=embedding,
             encrypted_blob=encrypted,
-            liveness_score=liveness_score
+            liveness_score=liveness_score,
+            replace=replace,
         )
         db.commit()
         
@@ -113,3 +184,40 @@ def enroll_face(
             detail=error_detail
         )
 
+
+
+@router.post("/{user_id}/enroll-async")
+async def enroll_face_async(
+    user_id: int,
+    file: UploadFile = File(...),
+    replace: bool = False,
+    admin=Depends(require_admin_async),
+    db: AsyncSession = Depends(get_async_db_session),
+    face_service: FaceRecognitionService = Depends(get_face_service),
+    gallery: GalleryIndex | DatabaseGallery = Depends(get_gallery_async),
+    executor: InferenceExecutor = Depends(get_inference_executor),
+):
+    if not await db.get(User, user_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    if not file.content_type or not file.content_type.startswith("image/"):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="File must be an image (JPEG, PNG, etc.)")
+    image_bytes = await file.read()
+    if len(image_bytes) == 0:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Uploaded file is empty")
+
+    # Same as enroll_face: no liveness check for enrollment
+    embedding = await executor.run(face_service.embed_largest_face, image_bytes)
+    liveness_score = 100
+    encrypted = face_service.encrypt_embedding(embedding.astype("float32"))
+    await db.run_sync(
+        lambda session: EmbeddingRepository(session, gallery=gallery).upsert_embedding(
+            user_id=user_id,
+            model_version=face_service.model_version,
+            vector=embedding,
+            encrypted_blob=encrypted,
+            liveness_score=liveness_score,
+            replace=replace,
+        )
+    )
+    await db.commit()
+    return {"status": "enrolled", "model_version": face_service.model_version, "liveness_score": liveness_score}
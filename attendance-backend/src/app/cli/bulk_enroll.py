@@ -0,0 +1,57 @@
+"""
+Offline bulk enrollment.
+
+    python -m app.cli.bulk_enroll --source ./photos --manifest manifest.csv --report report.csv
+
+The manifest has ``external_id`` and ``image`` columns, ``image`` being a path inside the
+source directory or ZIP. Re-running with the same ``--report`` resumes an interrupted run.
+"""
+
+import argparse
+import logging
+from collections import Counter
+
+from app.config import get_settings
+from app.core.logging_config import setup_logging
+from app.db.session import SessionLocal
+from app.repositories.embedding_repository import EmbeddingRepository
+from app.services.enrollment_service import BulkEnrollmentService, ImageSource, read_manifest
+from app.services.face.recognition_service import FaceRecognitionService
+from app.services.face.registry import get_model_registry
+from app.services.face.runtime import configure_runtime
+
+logger = logging.getLogger(__name__)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description="Bulk-enroll faces from a directory or ZIP archive")
+    parser.add_argument("--source", required=True, help="Directory or .zip containing the images")
+    parser.add_argument("--manifest", required=True, help="CSV with external_id,image columns")
+    parser.add_argument("--report", required=True, help="CSV report path; reused to resume")
+    parser.add_argument("--chunk-size", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=None, help="Detection threads (default: all cores)")
+    args = parser.parse_args(argv)
+
+    setup_logging(get_settings().log_level)
+    configure_runtime()
+    registry = get_model_registry().load(warmup=False)
+    face_service = FaceRecognitionService(detector=registry.detector, embedder=registry.embedder, liveness=registry.liveness)
+    rows = read_manifest(args.manifest)
+    source = ImageSource(args.source)
+    db = SessionLocal()
+    try:
+        service = BulkEnrollmentService(
+            db, face_service, EmbeddingRepository(db), chunk_size=args.chunk_size, workers=args.workers
+        )
+        service.run(rows, source, report_path=args.report, on_progress=lambda done, total: logger.info("Processed %d/%d", done, total))
+    finally:
+        db.close()
+        source.close()
+
+    counts = Counter(row.status for row in rows)
+    logger.info("Bulk enrollment finished: %s", dict(counts))
+    return 0 if not counts.get("failed") else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
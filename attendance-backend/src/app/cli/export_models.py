@@ -0,0 +1,52 @@
+"""
+Export the face models for the torchscript / onnx inference backends.
+
+    python -m app.cli.export_models --backend onnx [--quantize] [--model-dir /models/exported]
+
+Run it at image build time so workers only load the exported files. It prints the worst
+cosine similarity between the exported embedder and the eager model on random crops.
+"""
+
+import argparse
+import logging
+
+import numpy as np
+
+from app.config import get_settings
+from app.core.logging_config import setup_logging
+from app.services.face.backends import BACKENDS, model_version_for
+from app.services.face.detector import FaceDetector
+from app.services.face.embedder import FaceEmbedder
+from app.services.face.recognition_service import BASE_MODEL_VERSION
+
+logger = logging.getLogger(__name__)
+
+
+def main(argv: list[str] | None = None) -> int:
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description="Export detector and embedder for a CPU inference backend")
+    parser.add_argument("--backend", choices=[b for b in BACKENDS if b != "eager"], default=settings.inference_backend)
+    parser.add_argument("--quantize", action="store_true", default=settings.inference_quantize)
+    parser.add_argument("--model-dir", default=settings.exported_model_dir)
+    parser.add_argument("--samples", type=int, default=8, help="Random crops for the parity check")
+    args = parser.parse_args(argv)
+
+    setup_logging(settings.log_level)
+    FaceDetector(device="cpu", backend=args.backend, quantize=args.quantize, model_dir=args.model_dir)
+    exported = FaceEmbedder(device="cpu", backend=args.backend, quantize=args.quantize, model_dir=args.model_dir)
+    eager = FaceEmbedder(device="cpu", backend="eager", quantize=False)
+
+    faces = list(np.random.default_rng(0).integers(0, 256, size=(args.samples, 160, 160, 3), dtype=np.uint8))
+    a, b = eager.embed_batch(faces), exported.embed_batch(faces)
+    cosine = np.sum(a * b, axis=1) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1))
+    logger.info(
+        "Exported %s to %s; embedder parity vs eager: min cosine %.6f",
+        model_version_for(BASE_MODEL_VERSION, args.backend, args.quantize),
+        args.model_dir,
+        float(cosine.min()),
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,41 @@
+"""
+Monthly partition upkeep for attendance_logs; schedule it daily (cron, Kubernetes CronJob).
+
+    python -m app.cli.partitions [--months-ahead 3] [--archive-after 24]
+
+Creates the coming months' partitions and, with ``--archive-after N``, detaches months older
+than N full months into the ``attendance_archive`` schema for pg_dump and DROP. Rows that landed
+in the DEFAULT partition (no partition for their month yet) are moved into their month's.
+"""
+
+import argparse
+import logging
+
+from app.config import get_settings
+from app.core.logging_config import setup_logging
+from app.db.session import SessionLocal
+from app.repositories.attendance_repository import AttendanceRepository
+
+logger = logging.getLogger(__name__)
+
+
+def main(argv: list[str] | None = None) -> int:
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description="Create upcoming and archive old attendance_logs partitions")
+    parser.add_argument("--months-ahead", type=int, default=settings.attendance_partition_months_ahead)
+    parser.add_argument("--archive-after", type=int, default=settings.attendance_archive_after_months, help="0 keeps every month")
+    parser.add_argument("--archive-schema", default="attendance_archive")
+    args = parser.parse_args(argv)
+
+    setup_logging(settings.log_level)
+    with SessionLocal() as db:
+        repo = AttendanceRepository(db)
+        created = repo.ensure_partitions(args.months_ahead)
+        archived = repo.archive_partitions(args.archive_after, args.archive_schema) if args.archive_after > 0 else []
+        db.commit()
+    logger.info("Created %d attendance partitions; archived %s", created, ", ".join(archived) or "none")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,39 @@
+"""
+Backfill or repair daily_attendance_summary from attendance_logs.
+
+    python -m app.cli.rebuild_summaries [--date-from 2026-01-01] [--date-to 2026-03-31]
+
+Marks keep the table current as they are written; run this once after migrating, and again for
+any range whose logs were edited or deleted by hand. Without dates the whole table is rebuilt.
+"""
+
+import argparse
+import logging
+from datetime import date
+
+from app.config import get_settings
+from app.core.logging_config import setup_logging
+from app.db.session import SessionLocal
+from app.services.attendance_summary import rebuild_summaries
+
+logger = logging.getLogger(__name__)
+
+
+def main(argv: list[str] | None = None) -> int:
+    settings = get_settings()
+    parser = argparse.ArgumentParser(description="Rebuild daily attendance summaries from the raw logs")
+    parser.add_argument("--date-from", type=date.fromisoformat, default=None)
+    parser.add_argument("--date-to", type=date.fromisoformat, default=None)
+    parser.add_argument("--chunk-size", type=int, default=settings.export_chunk_size)
+    args = parser.parse_args(argv)
+
+    setup_logging(settings.log_level)
+    with SessionLocal() as db:
+        written = rebuild_summaries(db, args.date_from, args.date_to, args.chunk_size)
+        db.commit()
+    logger.info("Rebuilt %d daily attendance summaries (%s to %s)", written, args.date_from or "start", args.date_to or "end")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -30,10 +30,96 @@ class Settings(BaseSettings):
     embedding_dim: int = Field(default=512)
     similarity_threshold: float = Field(default=0.65)
 
+    # "memory" matches against the in-process GalleryIndex, "pgvector" pushes search into Postgres
+    gallery_backend: str = Field(default="memory")
+    vector_index_type: str = Field(default="ivfflat")
+    ivfflat_lists: int = Field(default=0)  # 0 sizes the index from the gallery at migration time
+    ivfflat_probes: int = Field(default=10)
+    hnsw_m: int = Field(default=16)
+    hnsw_ef_construction: int = Field(default=64)
+    hnsw_ef_search: int = Field(default=40)
+    # Encrypted binary snapshot of the in-memory gallery for fast worker start ("" disables)
+    gallery_snapshot_path: str = Field(default="")
+    # Compressed memory gallery for very large deployments: none | int8 | pq
+    gallery_compression: str = Field(default="none")
+    gallery_rerank_candidates: int = Field(default=32)
+    gallery_float_store_dir: str = Field(default="")
+    pq_subvectors: int = Field(default=64)
+    # Templates per user; matching scores a user by its best template (max) or their mean (centroid)
+    max_templates_per_user: int = Field(default=5)
+    template_match_mode: str = Field(default="max")
+    # Adaptive templates: fold confident scans back into templates (template) or nudge the closest one (ema)
+    template_update_enabled: bool = Field(default=False)
+    template_update_mode: str = Field(default="template")
+    template_update_margin: float = Field(default=0.1)
+    template_update_min_liveness: int = Field(default=80)
+    template_update_alpha: float = Field(default=0.1)
+    template_update_interval_seconds: float = Field(default=300.0)
+    template_update_cooldown_hours: float = Field(default=24.0)
+    template_update_max_per_flush: int = Field(default=500)
+    # LISTEN/NOTIFY keeps each worker's memory gallery current with the others' writes
+    gallery_sync_enabled: bool = Field(default=True)
+
+    # Reject blurry, tiny, badly lit or low-confidence crops before liveness and embedding
+    quality_gating_enabled: bool = Field(default=True)
+    quality_min_face_size: int = Field(default=40)
+    quality_min_sharpness: float = Field(default=20.0)
+    quality_min_brightness: float = Field(default=40.0)
+    quality_max_brightness: float = Field(default=220.0)
+    quality_min_contrast: float = Field(default=15.0)
+    quality_min_detection_probability: float = Field(default=0.9)
+
+    # CPU inference backend for detector and embedder: eager | torchscript | onnx (exports cached in exported_model_dir)
+    inference_backend: str = Field(default="eager")
+    inference_quantize: bool = Field(default=False)
+    # Per-worker thread budget for torch and ONNX Runtime (0 = library default, one per core)
+    inference_intra_op_threads: int = Field(default=0)
+    inference_inter_op_threads: int = Field(default=0)
+    opencv_threads: int = Field(default=-1)  # -1 = OpenCV default, 0 = single-threaded
+    # uvicorn worker processes (uvicorn reads the same WEB_CONCURRENCY variable)
+    web_concurrency: int = Field(default=1)
+    exported_model_dir: str = Field(default="/models/exported")
+
+    liveness_lbp_size: int = Field(default=0)
+    # Oversized JPEG uploads are decoded at a reduced scale covering this many pixels per side
+    max_decode_side: int = Field(default=1280)
+    # Run MTCNN on a copy downscaled to this longest side (0 = full frame); crops stay full resolution
+    detection_max_side: int = Field(default=0)
+    # Roster-first matching: accept a roster hit only if it clears similarity_threshold by this margin
+    roster_accept_margin: float = Field(default=0.05)
+    recent_roster_size: int = Field(default=256)
+    # WebSocket kiosk stream: detect every Nth frame, embed a track once steady and of good quality
+    stream_detect_every: int = Field(default=3)
+    stream_min_steady: int = Field(default=3)
+    stream_max_attempts: int = Field(default=3)
+
+    # Coalesce concurrent scans into shared detector/embedder forward passes
+    inference_batching_enabled: bool = Field(default=False)
+    inference_max_batch_size: int = Field(default=16)
+    inference_max_wait_ms: float = Field(default=5.0)
+
+    # Bounded executor for the async routes: workers plus queued jobs before answering 503
+    inference_executor_workers: int = Field(default=2)
+    inference_queue_size: int = Field(default=16)
+    overload_retry_after_seconds: int = Field(default=2)
+
     attendance_window_start: str = Field(default="07:00")
     attendance_window_end: str = Field(default="19:00")
     attendance_grace_minutes: int = Field(default=10)
     duplicate_cooldown_minutes: int = Field(default=5)
+    # Per-user state of today's marks, kept from this process's writes: repeats are refused
+    # without a query and first marks skip the cooldown / clock-in lookups
+    attendance_state_cache_enabled: bool = Field(default=False)
+    attendance_state_cache_size: int = Field(default=10000)
+    attendance_state_cache_ttl_seconds: float = Field(default=0.0)
+    # Several workers or replicas: use the cache only to refuse; every insert re-checks the database
+    attendance_state_cache_verify: bool = Field(default=False)
+    # Monthly attendance_logs partitions (Postgres): created ahead at startup and by app.cli.partitions,
+    # which also archives months older than attendance_archive_after_months (0 keeps everything)
+    attendance_partition_months_ahead: int = Field(default=3)
+    attendance_archive_after_months: int = Field(default=0)
+    # Rows fetched per server-side cursor round trip and written per CSV/Parquet chunk by /attendance/export
+    export_chunk_size: int = Field(default=5000)
 
     audit_log_enabled: bool = Field(default=True)
     fernet_key: str
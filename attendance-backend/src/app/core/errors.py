@@ -12,6 +12,12 @@ class SpoofDetected(HTTPException):
         super().__init__(status_code=status.HTTP_400_BAD_REQUEST, detail=message)
 
 
+class LowQualityFrame(HTTPException):
+    def __init__(self, reason: str):
+        self.reason = reason
+        super().__init__(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=f"Low quality face: {reason}")
+
+
 class UnauthorizedAction(HTTPException):
     def __init__(self, message: str = "Not authorized"):
         super().__init__(status_code=status.HTTP_403_FORBIDDEN, detail=message)
@@ -26,3 +32,11 @@ class WindowViolation(HTTPException):
     def __init__(self, message: str = "Outside attendance window"):
         super().__init__(status_code=status.HTTP_400_BAD_REQUEST, detail=message)
 
+
+class ServiceOverloaded(HTTPException):
+    def __init__(self, message: str = "Server busy, retry shortly", retry_after: int = 2):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=message,
+            headers={"Retry-After": str(retry_after)},
+        )
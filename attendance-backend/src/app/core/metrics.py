@@ -0,0 +1,68 @@
+import threading
+from collections import deque
+
+import numpy as np
+
+
+class _Summary:
+    def __init__(self, window: int):
+        self.count = 0
+        self.total = 0.0
+        self.max = float("-inf")
+        self.recent: deque[float] = deque(maxlen=window)
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+        self.recent.append(value)
+
+    def snapshot(self) -> dict:
+        recent = np.fromiter(self.recent, dtype=np.float64)
+        p50, p95, p99 = (float(v) for v in np.percentile(recent, [50, 95, 99])) if len(recent) else (None, None, None)
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else None,
+            "max": self.max if self.count else None,
+            "p50": p50,
+            "p95": p95,
+            "p99": p99,
+        }
+
+
+class Metrics:
+    """
+    Minimal in-process counters and summaries; percentiles cover the most recent observations.
+    """
+
+    def __init__(self, window: int = 1024):
+        self._lock = threading.Lock()
+        self._window = window
+        self._counters: dict[str, int] = {}
+        self._summaries: dict[str, _Summary] = {}
+
+    def incr(self, name: str, value: int = 1) -> None:
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def observe(self, name: str, value: float) -> None:
+        with self._lock:
+            summary = self._summaries.get(name)
+            if summary is None:
+                summary = self._summaries[name] = _Summary(self._window)
+            summary.observe(value)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "counters": dict(self._counters),
+                "summaries": {name: summary.snapshot() for name, summary in self._summaries.items()},
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._summaries.clear()
+
+
+metrics = Metrics()
@@ -2,7 +2,7 @@ from datetime import datetime, timezone
 from enum import Enum
 
 from pgvector.sqlalchemy import Vector
-from sqlalchemy import Boolean, Column, Date, DateTime, ForeignKey, Integer, LargeBinary, String, UniqueConstraint
+from sqlalchemy import BigInteger, Boolean, Column, Date, DateTime, ForeignKey, Index, Integer, LargeBinary, String, UniqueConstraint
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.types import JSON, TypeDecorator
 from sqlalchemy.orm import relationship
@@ -62,36 +62,71 @@ class User(Base):
 
 class FaceEmbedding(Base):
     __tablename__ = "face_embeddings"
-    __table_args__ = (UniqueConstraint("user_id", "model_version", name="uq_user_model"),)
+    __table_args__ = (UniqueConstraint("user_id", "model_version", "slot", name="uq_user_model_slot"),)
 
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
     model_version = Column(String(64), nullable=False, default="facenet_v1")
+    # Template number within (user_id, model_version), 0 .. max_templates_per_user - 1
+    slot = Column(Integer, nullable=False, default=0)
     vector = Column(EmbeddingVector(settings.embedding_dim), nullable=False)
     encrypted_blob = Column(LargeBinary, nullable=False)
     liveness_score = Column(Integer, nullable=True)
     created_at = Column(DateTime(timezone=True), nullable=False, default=lambda: datetime.now(timezone.utc))
+    updated_at = Column(DateTime(timezone=True), nullable=False, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc), index=True)
 
     user = relationship("User", back_populates="embeddings")
 
 
+class GalleryVersion(Base):
+    """
+    Single-row counter stamped on every gallery change notification.
+    """
+
+    __tablename__ = "gallery_versions"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
+
+
 class AttendanceLog(Base):
     __tablename__ = "attendance_logs"
-    __table_args__ = (UniqueConstraint("user_id", "date", "type", name="uq_user_date_type"),)
+    # On Postgres the table is range-partitioned by month on date (migration 20260405_0006)
+    __table_args__ = (
+        UniqueConstraint("user_id", "date", "type", name="uq_user_date_type"),
+        Index("ix_attendance_user_timestamp", "user_id", "timestamp"),
+        Index("ix_attendance_timestamp_id", "timestamp", "id"),
+    )
 
     id = Column(Integer, primary_key=True)
-    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     date = Column(Date, nullable=False)
     type = Column(String(16), nullable=False)
     timestamp = Column(DateTime(timezone=True), nullable=False, default=lambda: datetime.now(timezone.utc))
     confidence = Column(Integer, nullable=False)
     liveness_score = Column(Integer, nullable=True)
     manual_override = Column(Boolean, nullable=False, default=False)
-    extra_data = Column(JSONB, nullable=True)
+    extra_data = Column(JSON().with_variant(JSONB(), "postgresql"), nullable=True)
 
     user = relationship("User", back_populates="attendance_logs")
 
 
+class DailyAttendanceSummary(Base):
+    """
+    One row per user and attendance day, kept current by every mark; rebuilt with app.cli.rebuild_summaries.
+    """
+
+    __tablename__ = "daily_attendance_summary"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    date = Column(Date, primary_key=True, index=True)
+    first_in = Column(DateTime(timezone=True), nullable=True)
+    last_out = Column(DateTime(timezone=True), nullable=True)
+    duration_seconds = Column(Integer, nullable=True)
+    # first_in after attendance_window_start + attendance_grace_minutes
+    late = Column(Boolean, nullable=False, default=False)
+
+
 class AuditLog(Base):
     __tablename__ = "audit_logs"
 
@@ -100,7 +135,7 @@ class AuditLog(Base):
     action = Column(String(128), nullable=False)
     entity = Column(String(64), nullable=False)
     entity_id = Column(String(64), nullable=True)
-    details = Column(JSONB, nullable=True)
+    details = Column(JSON().with_variant(JSONB(), "postgresql"), nullable=True)
     created_at = Column(DateTime(timezone=True), nullable=False, default=lambda: datetime.now(timezone.utc))
 
 
@@ -1,4 +1,5 @@
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import declarative_base, sessionmaker
 
 from app.config import get_settings
@@ -6,6 +7,9 @@ from app.config import get_settings
 settings = get_settings()
 engine = create_engine(settings.database_url, pool_pre_ping=True, future=True)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine, expire_on_commit=False, future=True)
+# psycopg 3 serves both engines; the async one backs the non-blocking routes
+async_engine = create_async_engine(settings.database_url, pool_pre_ping=True)
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
 
 Base = declarative_base()
 
@@ -17,3 +21,8 @@ def get_db():
     finally:
         db.close()
 
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
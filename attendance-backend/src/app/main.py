@@ -5,10 +5,20 @@ from sqlalchemy import text
 from app.api.routers import attendance, auth, users
 from app.config import get_settings
 from app.core.logging_config import setup_logging
+from app.core.metrics import metrics
 from app.core.security import hash_password
 from app.db.models import RoleEnum, User
 from app.db.session import Base, SessionLocal, engine
+from app.repositories.attendance_repository import AttendanceRepository
+from app.repositories.embedding_repository import EmbeddingRepository
 from app.repositories.user_repository import UserRepository
+from app.services.face.gallery import get_gallery_index
+from app.services.face.gallery_sync import GallerySubscriber
+from app.services.face.recognition_service import MODEL_VERSION
+from app.services.face.registry import get_model_registry
+from app.services.face.runtime import configure_runtime
+from app.services.face.snapshot import populate_gallery
+from app.services.face.template_updater import get_template_updater
 
 settings = get_settings()
 setup_logging(settings.log_level)
@@ -30,6 +40,7 @@ app.include_router(attendance.router, prefix="/api/v1")
 
 @app.on_event("startup")
 def startup_event():
+    configure_runtime(settings)
     # Ensure extensions exist
     with engine.begin() as conn:
         conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
@@ -48,11 +59,44 @@ def startup_event():
             )
             db.commit()
             db.refresh(admin)
+        # Long-running deployments also need the daily app.cli.partitions job
+        AttendanceRepository(db).ensure_partitions(settings.attendance_partition_months_ahead)
+        db.commit()
+        # Build the in-memory matcher up front rather than on the first scan
+        if settings.gallery_backend == "memory":
+            get_gallery_index(MODEL_VERSION).ensure_loaded(lambda index: populate_gallery(index, EmbeddingRepository(db)))
     finally:
         db.close()
+    if settings.gallery_backend == "memory" and settings.gallery_sync_enabled and engine.dialect.name == "postgresql":
+        app.state.gallery_subscriber = GallerySubscriber.from_url(get_gallery_index(MODEL_VERSION), SessionLocal, settings.database_url)
+        app.state.gallery_subscriber.start()
+    if settings.template_update_enabled:
+        get_template_updater().start()
+    # Load and warm the face models once so no request pays for construction
+    get_model_registry().load()
+
+
+@app.on_event("shutdown")
+def shutdown_event():
+    subscriber = getattr(app.state, "gallery_subscriber", None)
+    if subscriber is not None:
+        subscriber.stop()
+    if settings.template_update_enabled:
+        # Writes whatever is still buffered
+        get_template_updater().stop()
 
 
 @app.get("/health")
 def health():
     return {"status": "ok"}
 
+
+@app.get("/health/models")
+def models_health():
+    return get_model_registry().status()
+
+
+@app.get("/metrics")
+def metrics_snapshot():
+    return metrics.snapshot()
+
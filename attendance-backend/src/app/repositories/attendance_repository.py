@@ -1,10 +1,72 @@
+import base64
+from dataclasses import dataclass
 from datetime import date, datetime, timedelta
-from typing import Optional
+from typing import Iterator, Optional
 
-from sqlalchemy import and_, select
-from sqlalchemy.orm import Session
+from sqlalchemy import Boolean, Date, DateTime, Integer, Row, String, and_, case, cast, exists, false, func, literal, select, text, true, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session, make_transient_to_detached
 
-from app.db.models import AttendanceLog, AttendanceTypeEnum
+from app.db.models import AttendanceLog, AttendanceTypeEnum, AuditLog
+from app.repositories.audit_repository import AuditRepository
+from app.repositories.summary_repository import mark_summary_statement
+
+_logs = AttendanceLog.__table__
+# What listings and exports return: everything but extra_data, as plain rows rather than ORM objects
+LOG_COLUMNS = (
+    _logs.c.id,
+    _logs.c.user_id,
+    _logs.c.date,
+    _logs.c.type,
+    _logs.c.timestamp,
+    _logs.c.confidence,
+    _logs.c.liveness_score,
+    _logs.c.manual_override,
+)
+
+
+@dataclass
+class LogFilters:
+    user_id: Optional[int] = None
+    date_from: Optional[date] = None
+    date_to: Optional[date] = None
+    type: Optional[AttendanceTypeEnum] = None
+    manual_override: Optional[bool] = None
+
+    def clauses(self) -> list:
+        clauses = []
+        if self.user_id is not None:
+            clauses.append(_logs.c.user_id == self.user_id)
+        if self.date_from is not None:
+            clauses.append(_logs.c.date >= self.date_from)
+        if self.date_to is not None:
+            clauses.append(_logs.c.date <= self.date_to)
+        if self.type is not None:
+            clauses.append(_logs.c.type == self.type.value)
+        if self.manual_override is not None:
+            clauses.append(_logs.c.manual_override == self.manual_override)
+        return clauses
+
+
+def encode_cursor(timestamp: datetime, log_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{timestamp.isoformat()}|{log_id}".encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        timestamp, log_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(timestamp), int(log_id)
+    except (ValueError, UnicodeDecodeError) as exc:
+        raise ValueError("Invalid cursor") from exc
+
+
+def _cooldown_clause(user_id: int, now: datetime, cooldown: timedelta):
+    # The date bound lets Postgres prune to the current month's partitions; a day of slack
+    # covers local dates lagging UTC timestamps
+    since = now - cooldown
+    return exists().where(
+        _logs.c.user_id == user_id, _logs.c.date >= since.date() - timedelta(days=1), _logs.c.timestamp > since
+    )
 
 
 class AttendanceRepository:
@@ -57,7 +119,212 @@ class AttendanceRepository:
         self.db.flush()
         return log
 
-    def get_recent_logs(self, limit: int = 50) -> list[AttendanceLog]:
-        stmt = select(AttendanceLog).order_by(AttendanceLog.timestamp.desc()).limit(limit)
-        return list(self.db.scalars(stmt))
+    def mark_statement(
+        self,
+        user_id: int,
+        attendance_date: date,
+        now: datetime,
+        cooldown: timedelta,
+        confidence: int,
+        liveness_score: Optional[int],
+        manual_override: bool = False,
+        metadata: Optional[dict] = None,
+        audit: bool = True,
+        decided_type: Optional[AttendanceTypeEnum] = None,
+        late: bool = False,
+    ):
+        """
+        Cooldown check, CLOCK_IN/CLOCK_OUT decision and insert as one INSERT ... SELECT.
+
+        The SELECT yields no row inside the cooldown, and ON CONFLICT DO NOTHING turns a
+        concurrent mark that loses the race on ``uq_user_date_type`` into no row instead
+        of an IntegrityError. On Postgres the audit insert rides along as a data-modifying
+        CTE and the statement always returns one (blocked, id, type) row; elsewhere it is
+        the bare INSERT ... RETURNING id, type.
+
+        ``decided_type`` comes from a caller that already knows the user's state (the state
+        cache); the SELECT then reads nothing and only ON CONFLICT guards the insert.
+
+        ``late`` is stored on the user's daily_attendance_summary row if the mark is a CLOCK_IN;
+        on Postgres that upsert is one more CTE.
+        """
+        dialect = self.db.get_bind().dialect.name
+        in_cooldown = _cooldown_clause(user_id, now, cooldown)
+        if manual_override or decided_type is not None:
+            decided = (decided_type or AttendanceTypeEnum.CLOCK_IN).value
+            log_type, allowed, blocked = literal(decided, String), true(), false()
+        else:
+            clocked_in = exists().where(
+                _logs.c.user_id == user_id, _logs.c.date == attendance_date, _logs.c.type == AttendanceTypeEnum.CLOCK_IN.value
+            )
+            log_type = case(
+                (clocked_in, literal(AttendanceTypeEnum.CLOCK_OUT.value, String)),
+                else_=literal(AttendanceTypeEnum.CLOCK_IN.value, String),
+            )
+            allowed, blocked = ~in_cooldown, in_cooldown
+
+        # Typed literals, so Postgres can resolve the SELECT list against the target columns
+        decision = select(
+            literal(user_id, Integer),
+            literal(attendance_date, Date),
+            log_type,
+            literal(now, DateTime(timezone=True)),
+            literal(confidence, Integer),
+            literal(liveness_score, Integer),
+            literal(manual_override, Boolean),
+            literal(metadata, _logs.c.extra_data.type),
+        ).where(allowed)
+        insert = (postgresql.insert if dialect == "postgresql" else sqlite.insert)(_logs)
+        stmt = (
+            insert.from_select(
+                ["user_id", "date", "type", "timestamp", "confidence", "liveness_score", "manual_override", "extra_data"], decision
+            )
+            .on_conflict_do_nothing(index_elements=["user_id", "date", "type"])
+            .returning(_logs.c.id, _logs.c.type)
+        )
+        if dialect != "postgresql":
+            return stmt
+
+        inserted = stmt.cte("inserted")
+        result = select(
+            blocked.label("blocked"),
+            select(inserted.c.id).scalar_subquery().label("id"),
+            select(inserted.c.type).scalar_subquery().label("type"),
+        )
+        if audit:
+            details = func.jsonb_build_object(
+                literal("user_id", String), literal(user_id, Integer),
+                literal("type", String), inserted.c.type,
+                literal("confidence", String), literal(confidence, Integer),
+            )  # fmt: skip
+            audit_insert = postgresql.insert(AuditLog.__table__).from_select(
+                ["action", "entity", "entity_id", "details", "created_at"],
+                select(
+                    literal("attendance_mark", String),
+                    literal("attendance_logs", String),
+                    cast(inserted.c.id, String),
+                    details,
+                    literal(now, DateTime(timezone=True)),
+                ),
+            )
+            result = result.add_cte(audit_insert.cte("audit"))
+        summary = mark_summary_statement(dialect, user_id, attendance_date, now, late, inserted.c.type, source=inserted)
+        return result.add_cte(summary.cte("summary"))
+
+    def record_mark(
+        self,
+        user_id: int,
+        attendance_date: date,
+        now: datetime,
+        cooldown: timedelta,
+        confidence: int,
+        liveness_score: Optional[int],
+        manual_override: bool = False,
+        metadata: Optional[dict] = None,
+        audit: bool = True,
+        decided_type: Optional[AttendanceTypeEnum] = None,
+        late: bool = False,
+    ) -> tuple[Optional[AttendanceLog], bool]:
+        """
+        Insert the mark decided by :meth:`mark_statement`; one round trip on Postgres.
+
+        Returns ``(log, blocked)``: the new log (attached to the session without a reload)
+        or None, and whether it was refused for the cooldown rather than the unique constraint.
+        """
+        arguments = dict(
+            user_id=user_id,
+            attendance_date=attendance_date,
+            now=now,
+            cooldown=cooldown,
+            confidence=confidence,
+            liveness_score=liveness_score,
+            manual_override=manual_override,
+            metadata=metadata,
+            audit=audit,
+            decided_type=decided_type,
+            late=late,
+        )
+        row: Optional[Row] = self.db.execute(self.mark_statement(**arguments)).first()
+        if row is not None and "blocked" in row._fields:
+            blocked = bool(row.blocked)
+            row = row if row.id is not None else None
+        elif row is None:
+            # Fallback path: only a refused mark pays for the second query
+            blocked = not manual_override and decided_type is None and bool(
+                self.db.scalar(select(_cooldown_clause(user_id, now, cooldown)))
+            )
+        else:
+            blocked = False
+            if audit:
+                AuditRepository(self.db).log(
+                    action="attendance_mark",
+                    entity="attendance_logs",
+                    entity_id=str(row.id),
+                    details={"user_id": user_id, "type": row.type, "confidence": confidence},
+                )
+            dialect = self.db.get_bind().dialect.name
+            self.db.execute(mark_summary_statement(dialect, user_id, attendance_date, now, late, row.type))
+        if row is None:
+            return None, blocked
+
+        log = AttendanceLog(
+            id=row.id,
+            user_id=user_id,
+            date=attendance_date,
+            type=row.type,
+            timestamp=now,
+            confidence=confidence,
+            liveness_score=liveness_score,
+            manual_override=manual_override,
+            extra_data=metadata,
+        )
+        # Persistent as written; the identity map gets it without reading the row back
+        make_transient_to_detached(log)
+        self.db.add(log)
+        return log, False
+
+    def list_page(self, filters: LogFilters, limit: int, after: Optional[tuple[datetime, int]] = None) -> tuple[list[Row], bool]:
+        """
+        Newest-first page of log rows after the ``(timestamp, id)`` keyset ``after``; also whether more follow.
+        """
+        stmt = select(*LOG_COLUMNS).where(*filters.clauses())
+        if after is not None:
+            timestamp, log_id = after
+            # The date bound lets Postgres skip partitions newer than the cursor
+            stmt = stmt.where(
+                _logs.c.date <= timestamp.date() + timedelta(days=1), tuple_(_logs.c.timestamp, _logs.c.id) < tuple_(timestamp, log_id)
+            )
+        rows = list(self.db.execute(stmt.order_by(_logs.c.timestamp.desc(), _logs.c.id.desc()).limit(limit + 1)))
+        return rows[:limit], len(rows) > limit
+
+    def iter_chunks(self, filters: LogFilters, chunk_size: int) -> Iterator[list[Row]]:
+        """
+        Every matching row, oldest first, ``chunk_size`` rows at a time through a server-side cursor.
+        """
+        stmt = select(*LOG_COLUMNS).where(*filters.clauses()).order_by(_logs.c.timestamp, _logs.c.id)
+        for chunk in self.db.execute(stmt.execution_options(yield_per=chunk_size)).partitions():
+            yield list(chunk)
+
+    def ensure_partitions(self, months_ahead: int) -> int:
+        """
+        Create monthly partitions through ``months_ahead`` months from now, plus any month with rows
+        waiting in the DEFAULT partition; returns how many were new. A no-op unless the
+        partitioning migration has run on Postgres.
+        """
+        if self.db.get_bind().dialect.name != "postgresql":
+            return 0
+        if self.db.scalar(text("SELECT to_regproc('attendance_logs_create_partitions')")) is None:
+            return 0
+        return self.db.scalar(text("SELECT attendance_logs_create_partitions(:months)"), {"months": months_ahead})
+
+    def archive_partitions(self, keep_months: int, archive_schema: str = "attendance_archive") -> list[str]:
+        """
+        Detach partitions older than ``keep_months`` full months and move them to ``archive_schema``.
+        """
+        if self.db.get_bind().dialect.name != "postgresql":
+            return []
+        rows = self.db.execute(
+            text("SELECT attendance_logs_archive_partitions(:keep, :schema)"), {"keep": keep_months, "schema": archive_schema}
+        )
+        return [row[0] for row in rows]
 
@@ -1,15 +1,111 @@
-from typing import Iterable, Optional
+import json
+from datetime import datetime, timezone
+from typing import Callable, Iterable, Optional, Protocol, Sequence
 
 import numpy as np
-from sqlalchemy import select
+from sqlalchemy import event, func, or_, select, text
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session
 
-from app.db.models import FaceEmbedding
+from app.config import get_settings
+from app.db.models import FaceEmbedding, GalleryVersion, User
+
+_PENDING_GALLERY_UPDATES = "pending_gallery_updates"
+GALLERY_CHANNEL = "gallery_changes"
+# NOTIFY payloads are limited to 8000 bytes
+_NOTIFY_BATCH = 500
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_gallery_updates(session: Session) -> None:
+    for update in session.info.pop(_PENDING_GALLERY_UPDATES, []):
+        update()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_gallery_updates(session: Session) -> None:
+    session.info.pop(_PENDING_GALLERY_UPDATES, None)
+
+
+def publish_gallery_change(db: Session, user_ids: Iterable[int], model_version: Optional[str] = None) -> None:
+    """
+    Tell every worker's gallery that ``user_ids`` changed. Postgres delivers NOTIFY only
+    on commit; each message takes the next gallery version in the same transaction, so
+    listeners see a gap-free sequence.
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return
+    ids = sorted({int(user_id) for user_id in user_ids})
+    for start in range(0, len(ids), _NOTIFY_BATCH):
+        # The row lock serializes writers, so versions are delivered in commit order
+        version = db.scalar(
+            text(
+                "INSERT INTO gallery_versions (id, version) VALUES (1, 1) "
+                "ON CONFLICT (id) DO UPDATE SET version = gallery_versions.version + 1 RETURNING version"
+            )
+        )
+        payload = json.dumps({"version": version, "model_version": model_version, "user_ids": ids[start : start + _NOTIFY_BATCH]})
+        db.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": GALLERY_CHANNEL, "payload": payload})
+
+
+def _most_redundant(templates: list, candidate: np.ndarray) -> int:
+    """
+    Index of the stored template with the highest mean similarity to all others,
+    counting the incoming one: the template whose loss costs the least coverage.
+    """
+    vectors = np.asarray([*templates, candidate], dtype=np.float32)
+    vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    similarity = vectors @ vectors.T
+    np.fill_diagonal(similarity, 0.0)
+    return int(similarity[:-1].sum(axis=1).argmax())
+
+
+def _best_per_user(embeddings: Iterable[FaceEmbedding], query: np.ndarray, k: int) -> list[tuple[int, float]]:
+    """
+    The k best (user_id, cosine similarity) pairs, scoring each user by their closest template.
+    """
+    embeddings = list(embeddings)
+    if not embeddings:
+        return []
+    vectors = np.asarray([e.vector for e in embeddings], dtype=np.float32)
+    vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    query = np.asarray(query, dtype=np.float32)
+    scores = vectors @ (query / max(float(np.linalg.norm(query)), 1e-12))
+    best: dict[int, float] = {}
+    for embedding, score in zip(embeddings, scores.tolist()):
+        best[embedding.user_id] = max(score, best.get(embedding.user_id, -1.0))
+    return sorted(best.items(), key=lambda item: item[1], reverse=True)[:k]
+
+
+class GalleryUpdates(Protocol):
+    """
+    What the repository needs from a gallery to mirror committed template changes into it.
+    """
+
+    model_version: str
+
+    def set_templates(self, user_id: int, vectors: np.ndarray) -> None: ...
+
+    def sync_users(self, user_ids: Iterable[int], templates: Iterable[tuple[int, Sequence[float]]]) -> None: ...
 
 
 class EmbeddingRepository:
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, gallery: Optional[GalleryUpdates] = None):
         self.db = db
+        self.gallery = gallery
+        self.settings = get_settings()
+
+    def _after_commit(self, update: Callable[[], None]) -> None:
+        # The in-memory gallery only sees rows once they are committed
+        self.db.info.setdefault(_PENDING_GALLERY_UPDATES, []).append(update)
+
+    def list_templates(self, user_id: int, model_version: str) -> list[FaceEmbedding]:
+        stmt = (
+            select(FaceEmbedding)
+            .where(FaceEmbedding.user_id == user_id, FaceEmbedding.model_version == model_version)
+            .order_by(FaceEmbedding.slot)
+        )
+        return list(self.db.scalars(stmt))
 
     def upsert_embedding(
         self,
@@ -18,32 +114,207 @@ class EmbeddingRepository:
         vector: np.ndarray,
         encrypted_blob: bytes,
         liveness_score: Optional[int],
+        replace: bool = False,
     ) -> FaceEmbedding:
-        existing = self.db.scalar(
-            select(FaceEmbedding).where(
-                FaceEmbedding.user_id == user_id,
-                FaceEmbedding.model_version == model_version,
+        """
+        Add ``vector`` as one of the user's templates.
+
+        Once the user holds ``max_templates_per_user`` templates, the most redundant one
+        is overwritten; ``replace`` discards all existing templates instead.
+        """
+        templates = self.list_templates(user_id, model_version)
+        target = None
+        if replace:
+            for stale in templates[1:]:
+                self.db.delete(stale)
+            templates = templates[:1]
+            target = templates[0] if templates else None
+        elif len(templates) >= self.settings.max_templates_per_user:
+            target = templates[_most_redundant([t.vector for t in templates], vector)]
+
+        if target is not None:
+            target.vector = vector.tolist()
+            target.encrypted_blob = encrypted_blob
+            target.liveness_score = liveness_score
+            embedding = target
+        else:
+            used = {t.slot for t in templates}
+            embedding = FaceEmbedding(
+                user_id=user_id,
+                model_version=model_version,
+                slot=next(slot for slot in range(len(used) + 1) if slot not in used),
+                vector=vector.tolist(),
+                encrypted_blob=encrypted_blob,
+                liveness_score=liveness_score,
             )
-        )
-        if existing:
-            existing.vector = vector.tolist()
-            existing.encrypted_blob = encrypted_blob
-            existing.liveness_score = liveness_score
-            self.db.flush()
-            return existing
-
-        embedding = FaceEmbedding(
-            user_id=user_id,
-            model_version=model_version,
-            vector=vector.tolist(),
-            encrypted_blob=encrypted_blob,
-            liveness_score=liveness_score,
-        )
-        self.db.add(embedding)
+            self.db.add(embedding)
         self.db.flush()
+        self._track(user_id, model_version, [t.vector for t in templates if t is not embedding] + [vector])
+        publish_gallery_change(self.db, [user_id], model_version)
         return embedding
 
-    def list_embeddings(self) -> Iterable[FaceEmbedding]:
+    def blend_template(
+        self,
+        user_id: int,
+        model_version: str,
+        vector: np.ndarray,
+        alpha: float,
+        encrypt: Callable[[np.ndarray], bytes],
+    ) -> Optional[FaceEmbedding]:
+        """
+        Move the user's closest template toward ``vector`` by ``alpha`` (exponential moving average).
+        """
+        templates = self.list_templates(user_id, model_version)
+        if not templates:
+            return None
+        stored = np.asarray([t.vector for t in templates], dtype=np.float32)
+        stored /= np.maximum(np.linalg.norm(stored, axis=1, keepdims=True), 1e-12)
+        query = np.asarray(vector, dtype=np.float32)
+        query = query / max(float(np.linalg.norm(query)), 1e-12)
+        closest = int(np.argmax(stored @ query))
+        blended = (1.0 - alpha) * stored[closest] + alpha * query
+        blended /= max(float(np.linalg.norm(blended)), 1e-12)
+
+        target = templates[closest]
+        target.vector = blended.tolist()
+        target.encrypted_blob = encrypt(blended)
+        self.db.flush()
+        self._track(user_id, model_version, [t.vector for t in templates])
+        publish_gallery_change(self.db, [user_id], model_version)
+        return target
+
+    def bulk_upsert(self, rows: list[dict]) -> None:
+        """
+        Upsert many embeddings with one INSERT ... ON CONFLICT (user_id, model_version, slot) DO UPDATE.
+
+        Each row needs user_id, model_version, vector, encrypted_blob and liveness_score;
+        ``slot`` defaults to 0, the user's first template. Rows repeating a key collapse to the last one.
+        """
+        if not rows:
+            return
+        dialect = self.db.get_bind().dialect.name
+        insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        # Postgres refuses an ON CONFLICT DO UPDATE that touches the same row twice; the last row for a key wins
+        values = {}
+        for row in rows:
+            row = {"slot": 0, **row, "vector": np.asarray(row["vector"], dtype=np.float32).tolist()}
+            values[(row["user_id"], row["model_version"], row["slot"])] = row
+        stmt = insert(FaceEmbedding).values(list(values.values()))
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[FaceEmbedding.user_id, FaceEmbedding.model_version, FaceEmbedding.slot],
+            set_={
+                "vector": stmt.excluded.vector,
+                "encrypted_blob": stmt.excluded.encrypted_blob,
+                "liveness_score": stmt.excluded.liveness_score,
+                # ORM onupdate does not apply to ON CONFLICT DO UPDATE
+                "updated_at": datetime.now(timezone.utc),
+            },
+        )
+        self.db.execute(stmt)
+        for model_version in {row["model_version"] for row in rows}:
+            user_ids = [row["user_id"] for row in rows if row["model_version"] == model_version]
+            gallery = self.gallery
+            if gallery is not None and gallery.model_version == model_version:
+                # Users may hold other templates besides the upserted slot; read them now,
+                # inside the transaction, so the commit hook needs no database access. Deactivated
+                # users have none here and are dropped
+                stmt = (
+                    select(FaceEmbedding.user_id, FaceEmbedding.vector)
+                    .join(User)
+                    .where(FaceEmbedding.model_version == model_version, FaceEmbedding.user_id.in_(user_ids), User.is_active.is_(True))
+                )
+                pairs = [(user_id, vector) for user_id, vector in self.db.execute(stmt)]
+                self._after_commit(lambda: gallery.sync_users(user_ids, pairs))
+            publish_gallery_change(self.db, user_ids, model_version)
+
+    def _track(self, user_id: int, model_version: str, vectors: list) -> None:
+        gallery = self.gallery
+        if gallery is not None and gallery.model_version == model_version:
+            if not self.db.scalar(select(User.is_active).where(User.id == user_id)):
+                # Deactivated users never match, as on the pgvector path; keep them out of the index
+                self._after_commit(lambda: gallery.sync_users([user_id], []))
+                return
+            rows = np.asarray(vectors, dtype=np.float32)
+            self._after_commit(lambda: gallery.set_templates(user_id, rows))
+
+    def list_embeddings(self, model_version: Optional[str] = None, active_only: bool = False) -> Iterable[FaceEmbedding]:
         stmt = select(FaceEmbedding)
+        if model_version is not None:
+            stmt = stmt.where(FaceEmbedding.model_version == model_version)
+        if active_only:
+            stmt = stmt.join(User).where(User.is_active.is_(True))
+        return self.db.scalars(stmt)
+
+    def list_embeddings_since(self, model_version: str, since: datetime) -> Iterable[FaceEmbedding]:
+        # users.updated_at catches reactivated users whose embedding itself is unchanged
+        stmt = (
+            select(FaceEmbedding)
+            .join(User)
+            .where(
+                FaceEmbedding.model_version == model_version,
+                User.is_active.is_(True),
+                or_(FaceEmbedding.updated_at >= since, User.updated_at >= since),
+            )
+        )
         return self.db.scalars(stmt)
 
+    def list_for_users(self, model_version: str, user_ids: Iterable[int]) -> Iterable[FaceEmbedding]:
+        stmt = (
+            select(FaceEmbedding)
+            .join(User)
+            .where(FaceEmbedding.model_version == model_version, FaceEmbedding.user_id.in_(list(user_ids)), User.is_active.is_(True))
+        )
+        return self.db.scalars(stmt)
+
+    def list_user_ids(self, model_version: str) -> list[int]:
+        stmt = select(FaceEmbedding.user_id).join(User).where(FaceEmbedding.model_version == model_version, User.is_active.is_(True))
+        return list(self.db.scalars(stmt))
+
+    def gallery_version(self) -> int:
+        return self.db.scalar(select(GalleryVersion.version).where(GalleryVersion.id == 1)) or 0
+
+    def count_embeddings(self, model_version: str) -> int:
+        stmt = (
+            select(func.count())
+            .select_from(FaceEmbedding)
+            .join(User)
+            .where(FaceEmbedding.model_version == model_version, User.is_active.is_(True))
+        )
+        return self.db.scalar(stmt)
+
+    def _apply_search_settings(self) -> None:
+        # set_config(..., true) is transaction-local, like SET LOCAL, but accepts bind params
+        if self.settings.vector_index_type == "hnsw":
+            self.db.execute(text("SELECT set_config('hnsw.ef_search', :value, true)"), {"value": str(self.settings.hnsw_ef_search)})
+        else:
+            self.db.execute(text("SELECT set_config('ivfflat.probes', :value, true)"), {"value": str(self.settings.ivfflat_probes)})
+
+    def nearest_embeddings(
+        self, query: np.ndarray, model_version: str, k: int = 1, user_ids: Optional[list[int]] = None
+    ) -> list[tuple[int, float]]:
+        """
+        Return the k closest (user_id, cosine similarity) pairs for the query vector,
+        optionally among ``user_ids`` only. Deactivated users never match.
+        """
+        if self.db.get_bind().dialect.name != "postgresql":
+            # No vector operators outside Postgres (tests run on SQLite); score in-process instead
+            rows = self.list_embeddings(model_version, active_only=True) if user_ids is None else self.list_for_users(model_version, user_ids)
+            return _best_per_user(rows, query, k)
+
+        self._apply_search_settings()
+        distance = FaceEmbedding.vector.cosine_distance(np.asarray(query, dtype=np.float32).tolist())
+        stmt = (
+            select(FaceEmbedding.user_id, distance.label("distance"))
+            .join(User)
+            .where(FaceEmbedding.model_version == model_version, User.is_active.is_(True))
+            .order_by(distance)
+        )
+        if user_ids is not None:
+            # A roster is small enough that Postgres scores it exactly instead of via the ANN index
+            stmt = stmt.where(FaceEmbedding.user_id.in_(user_ids))
+        results: dict[int, float] = {}
+        for user_id, dist in self.db.execute(stmt.limit(k * self.settings.max_templates_per_user)):
+            # Rows arrive best first, so the first row of a user is its best template
+            results.setdefault(user_id, 1.0 - float(dist))
+        return list(results.items())[:k]
+
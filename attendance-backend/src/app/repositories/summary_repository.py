@@ -0,0 +1,143 @@
+from datetime import date, datetime
+from typing import Iterator, Optional
+
+from sqlalchemy import Boolean, Date, DateTime, Integer, Row, String, case, cast, delete, false, func, insert, literal, select, true
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.db.models import AttendanceLog, AttendanceTypeEnum, DailyAttendanceSummary, RoleEnum, User
+
+_summary = DailyAttendanceSummary.__table__
+_logs = AttendanceLog.__table__
+_COLUMNS = ["user_id", "date", "first_in", "last_out", "late", "duration_seconds"]
+
+
+def _seconds_between(dialect: str, start, end):
+    if dialect == "postgresql":
+        return cast(func.extract("epoch", end - start), Integer)
+    return cast(func.round((func.julianday(end) - func.julianday(start)) * 86400), Integer)
+
+
+def mark_summary_statement(dialect: str, user_id: int, day: date, now: datetime, late: bool, log_type, source=None):
+    """
+    Upsert of the user's summary row for the mark just written at ``now``.
+
+    ``log_type`` is the mark's type as a value or SQL expression: on Postgres the type is decided
+    inside the mark statement, so this runs as one more CTE reading from ``source``.
+    """
+    is_in = (log_type if source is not None else literal(log_type, String)) == AttendanceTypeEnum.CLOCK_IN.value
+    at = literal(now, DateTime(timezone=True))
+    rows = select(
+        literal(user_id, Integer),
+        literal(day, Date),
+        case((is_in, at), else_=literal(None, DateTime(timezone=True))),
+        case((is_in, literal(None, DateTime(timezone=True))), else_=at),
+        case((is_in, literal(late, Boolean)), else_=false()),
+        literal(None, Integer),
+    ).where(true())
+    if source is not None:
+        rows = rows.select_from(source)
+
+    stmt = (postgresql.insert if dialect == "postgresql" else sqlite.insert)(_summary).from_select(_COLUMNS, rows)
+    first_in = func.coalesce(stmt.excluded.first_in, _summary.c.first_in)
+    last_out = func.coalesce(stmt.excluded.last_out, _summary.c.last_out)
+    return stmt.on_conflict_do_update(
+        index_elements=["user_id", "date"],
+        set_={
+            "first_in": first_in,
+            "last_out": last_out,
+            "late": case((stmt.excluded.first_in.is_not(None), stmt.excluded.late), else_=_summary.c.late),
+            "duration_seconds": _seconds_between(dialect, first_in, last_out),
+        },
+    )
+
+
+class SummaryRepository:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def aggregate_logs(self, date_from: Optional[date], date_to: Optional[date], chunk_size: int) -> Iterator[list[Row]]:
+        """
+        (user_id, date, first_in, last_out) straight from attendance_logs, grouped in the database.
+        """
+        stmt = select(
+            _logs.c.user_id,
+            _logs.c.date,
+            func.min(case((_logs.c.type == AttendanceTypeEnum.CLOCK_IN.value, _logs.c.timestamp))).label("first_in"),
+            func.max(case((_logs.c.type == AttendanceTypeEnum.CLOCK_OUT.value, _logs.c.timestamp))).label("last_out"),
+        ).group_by(_logs.c.user_id, _logs.c.date)
+        if date_from is not None:
+            stmt = stmt.where(_logs.c.date >= date_from)
+        if date_to is not None:
+            stmt = stmt.where(_logs.c.date <= date_to)
+        for chunk in self.db.execute(stmt.execution_options(yield_per=chunk_size)).partitions():
+            yield list(chunk)
+
+    def delete_range(self, date_from: Optional[date], date_to: Optional[date]) -> None:
+        stmt = delete(_summary)
+        if date_from is not None:
+            stmt = stmt.where(_summary.c.date >= date_from)
+        if date_to is not None:
+            stmt = stmt.where(_summary.c.date <= date_to)
+        self.db.execute(stmt)
+
+    def insert_many(self, rows: list[dict]) -> None:
+        if rows:
+            self.db.execute(insert(_summary), rows)
+
+    def _scoped(self, stmt, date_from: date, date_to: date, role: Optional[str], user_ids: list[int]):
+        stmt = stmt.where(_summary.c.date >= date_from, _summary.c.date <= date_to)
+        if role is not None:
+            stmt = stmt.where(_summary.c.user_id.in_(select(User.id).where(User.role == role)))
+        if user_ids:
+            stmt = stmt.where(_summary.c.user_id.in_(user_ids))
+        return stmt
+
+    def daily_counts(self, date_from: date, date_to: date, role: Optional[str] = None, user_ids: list[int] = ()) -> list[Row]:
+        """
+        (date, present, late) for each day in the range that has any attendance. Without a
+        role, admin accounts are left out, as they are from the roster.
+        """
+        stmt = select(
+            _summary.c.date,
+            func.count().label("present"),
+            func.count().filter(_summary.c.late).label("late"),
+        )
+        stmt = self._scoped(stmt, date_from, date_to, role, list(user_ids))
+        if role is None:
+            stmt = stmt.where(_summary.c.user_id.in_(select(User.id).where(User.role != RoleEnum.ADMIN.value)))
+        return list(self.db.execute(stmt.group_by(_summary.c.date).order_by(_summary.c.date)))
+
+    def user_totals(self, date_from: date, date_to: date, role: Optional[str] = None, user_ids: list[int] = ()) -> list[Row]:
+        """
+        (user_id, full_name, roll_no, days_present, days_late, worked_seconds) for each user present in the range.
+        """
+        stmt = select(
+            _summary.c.user_id,
+            User.full_name,
+            User.roll_no,
+            func.count().label("days_present"),
+            func.count().filter(_summary.c.late).label("days_late"),
+            func.coalesce(func.sum(_summary.c.duration_seconds), 0).label("worked_seconds"),
+        ).join(User, User.id == _summary.c.user_id)
+        stmt = self._scoped(stmt, date_from, date_to, role, list(user_ids))
+        stmt = stmt.group_by(_summary.c.user_id, User.full_name, User.roll_no).order_by(_summary.c.user_id)
+        return list(self.db.execute(stmt))
+
+    def roster_joins(self, date_to: date, role: Optional[str] = None, user_ids: list[int] = ()) -> list[Row]:
+        """
+        (joined, users) for active non-admin users in scope created on or before ``date_to``,
+        grouped by the date of their created_at.
+        """
+        joined = func.date(User.created_at, type_=Date)
+        stmt = (
+            select(joined.label("joined"), func.count().label("users"))
+            .where(User.is_active.is_(True), User.role != RoleEnum.ADMIN.value, joined <= date_to)
+            .group_by(joined)
+            .order_by(joined)
+        )
+        if role is not None:
+            stmt = stmt.where(User.role == role)
+        if user_ids:
+            stmt = stmt.where(User.id.in_(list(user_ids)))
+        return list(self.db.execute(stmt))
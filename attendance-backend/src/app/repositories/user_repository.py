@@ -2,6 +2,7 @@ from sqlalchemy import select
 from sqlalchemy.orm import Session
 
 from app.db.models import RoleEnum, User
+from app.repositories.embedding_repository import publish_gallery_change
 
 
 class UserRepository:
@@ -29,3 +30,15 @@ class UserRepository:
     def get_admin(self) -> User | None:
         return self.db.scalar(select(User).where(User.role == RoleEnum.ADMIN.value))
 
+
+    def set_active(self, user: User, active: bool) -> User:
+        user.is_active = active
+        self.db.flush()
+        publish_gallery_change(self.db, [user.id])
+        return user
+
+    def delete_user(self, user: User) -> None:
+        user_id = user.id
+        self.db.delete(user)
+        self.db.flush()
+        publish_gallery_change(self.db, [user_id])
@@ -10,6 +10,21 @@ class AttendanceDecision(BaseModel):
     liveness_score: Optional[int]
     user_id: int
     timestamp: datetime
+    # Scan diagnostics: "roster" or "gallery", and per-stage latency
+    matched_via: Optional[str] = None
+    timings_ms: Optional[dict[str, float]] = None
+
+
+class GroupSkip(BaseModel):
+    user_id: Optional[int]
+    confidence: Optional[float]
+    reason: str
+
+
+class GroupAttendanceResult(BaseModel):
+    faces_detected: int
+    marked: list[AttendanceDecision]
+    skipped: list[GroupSkip]
 
 
 class AttendanceLogOut(BaseModel):
@@ -25,3 +40,27 @@ class AttendanceLogOut(BaseModel):
     class Config:
         from_attributes = True
 
+
+
+class AttendanceLogPage(BaseModel):
+    items: list[AttendanceLogOut]
+    # Pass back as ``cursor`` for the next (older) page; None on the last page
+    next_cursor: Optional[str] = None
+
+
+class DailySummaryOut(BaseModel):
+    date: date
+    present: int
+    late: int
+    # Active users in scope without a summary row that day
+    absent: int
+
+
+class UserSummaryOut(BaseModel):
+    user_id: int
+    full_name: str
+    roll_no: Optional[str]
+    days_present: int
+    days_late: int
+    worked_seconds: int
+    worked_hours: float
@@ -23,3 +23,20 @@ class UserOut(BaseModel):
     class Config:
         from_attributes = True
 
+
+
+class BulkEnrollmentRowOut(BaseModel):
+    row: int
+    external_id: str
+    image: str
+    status: str
+    detail: str
+
+
+class BulkEnrollmentReport(BaseModel):
+    total: int
+    enrolled: int
+    failed: int
+    # Earlier images of a user listed more than once; the last one is enrolled
+    superseded: int = 0
+    rows: list[BulkEnrollmentRowOut]
@@ -0,0 +1,72 @@
+import csv
+import io
+from typing import Callable, Iterable, Iterator
+
+from sqlalchemy.orm import Session
+
+from app.repositories.attendance_repository import LOG_COLUMNS, AttendanceRepository, LogFilters
+
+EXPORT_FORMATS = {"csv": "text/csv", "parquet": "application/vnd.apache.parquet"}
+FIELDS = [column.name for column in LOG_COLUMNS]
+
+
+def parquet_available() -> bool:
+    try:
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _csv_chunks(chunks: Iterable[list]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(FIELDS)
+    for rows in chunks:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    # Header of an empty export
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def _parquet_chunks(chunks: Iterable[list]) -> Iterator[bytes]:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema(
+        [
+            ("id", pa.int64()),
+            ("user_id", pa.int64()),
+            ("date", pa.date32()),
+            ("type", pa.string()),
+            ("timestamp", pa.timestamp("us", tz="UTC")),
+            ("confidence", pa.int32()),
+            ("liveness_score", pa.int32()),
+            ("manual_override", pa.bool_()),
+        ]
+    )
+    # The writer counts its own offsets, so the buffer can be drained after every row group
+    buffer = io.BytesIO()
+    with pq.ParquetWriter(buffer, schema) as writer:
+        for rows in chunks:
+            columns = list(zip(*rows))
+            writer.write_batch(pa.record_batch([pa.array(values, type=field.type) for values, field in zip(columns, schema)], schema=schema))
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def stream_export(session_factory: Callable[[], Session], filters: LogFilters, fmt: str, chunk_size: int = 5000) -> Iterator[bytes]:
+    """
+    The matching logs, oldest first, as CSV or Parquet bytes produced ``chunk_size`` rows at a time.
+
+    Owns its session: the response body is still being produced after the request's
+    dependencies have been torn down. Memory stays at one chunk whatever the export size.
+    """
+    with session_factory() as db:
+        chunks = AttendanceRepository(db).iter_chunks(filters, chunk_size)
+        yield from (_parquet_chunks(chunks) if fmt == "parquet" else _csv_chunks(chunks))
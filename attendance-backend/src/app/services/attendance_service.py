@@ -1,12 +1,16 @@
 from datetime import date, datetime, time, timedelta, timezone
 
+import numpy as np
 from sqlalchemy.orm import Session
 
 from app.config import get_settings
 from app.core.errors import DuplicateAttendance, WindowViolation
-from app.db.models import AttendanceTypeEnum
+from app.core.metrics import metrics
+from app.db.models import AttendanceLog, AttendanceTypeEnum
 from app.repositories.attendance_repository import AttendanceRepository
-from app.repositories.audit_repository import AuditRepository
+from app.services.attendance_state import get_attendance_state_cache, remember_on_commit
+from app.services.attendance_summary import is_late
+from app.services.face.template_updater import get_template_updater
 
 
 class AttendanceService:
@@ -14,7 +18,7 @@ class AttendanceService:
         self.db = db
         self.settings = get_settings()
         self.attendance_repo = AttendanceRepository(db)
-        self.audit_repo = AuditRepository(db)
+        self.state_cache = get_attendance_state_cache() if self.settings.attendance_state_cache_enabled else None
 
     def _within_window(self, now: datetime) -> bool:
         start = datetime.combine(now.date(), time.fromisoformat(self.settings.attendance_window_start)).replace(tzinfo=timezone.utc)
@@ -29,46 +33,75 @@ class AttendanceService:
         liveness_score: int | None,
         manual_override: bool = False,
         metadata: dict | None = None,
+        embedding: np.ndarray | None = None,
     ):
         now = datetime.now(timezone.utc)
         if not self._within_window(now) and not manual_override:
             raise WindowViolation("Outside allowed attendance window")
 
-        last_log = self.attendance_repo.get_last_log(user_id)
-        if last_log:
-            cooldown = timedelta(minutes=self.settings.duplicate_cooldown_minutes)
-            # Ensure both datetimes are timezone-aware for comparison
-            last_timestamp = last_log.timestamp
-            if last_timestamp.tzinfo is None:
-                # If database timestamp is naive, assume it's UTC
-                last_timestamp = last_timestamp.replace(tzinfo=timezone.utc)
-            if now - last_timestamp < cooldown and not manual_override:
-                raise DuplicateAttendance("Duplicate within cooldown window")
-
         attendance_date = date.today()
-        log_type = AttendanceTypeEnum.CLOCK_IN
-        existing_clock_in = self.attendance_repo.get_today_log(user_id, attendance_date, AttendanceTypeEnum.CLOCK_IN)
-        if existing_clock_in and not manual_override:
-            log_type = AttendanceTypeEnum.CLOCK_OUT
+        cooldown = timedelta(minutes=self.settings.duplicate_cooldown_minutes)
+        decided_type = None
+        state = self.state_cache.get(user_id, attendance_date) if self.state_cache is not None and not manual_override else None
+        if state is not None:
+            metrics.incr("attendance.state_cache.hit")
+            # Other workers' marks only make the real state later, so these refusals hold regardless
+            if now - state.last_timestamp < cooldown:
+                raise DuplicateAttendance("Duplicate within cooldown window")
+            if state.clocked_out:
+                raise DuplicateAttendance("Attendance already recorded for today")
+            if not self.settings.attendance_state_cache_verify:
+                decided_type = AttendanceTypeEnum.CLOCK_OUT if state.clocked_in else AttendanceTypeEnum.CLOCK_IN
+        elif self.state_cache is not None and not manual_override:
+            metrics.incr("attendance.state_cache.miss")
 
-        confidence_int = int(match_score * 100)
-        log = self.attendance_repo.create_log(
+        # One statement decides and inserts, so two kiosks racing on the same person
+        # cannot both pass the checks; the loser gets a duplicate instead of a 500
+        mark = dict(
             user_id=user_id,
             attendance_date=attendance_date,
-            log_type=log_type,
-            confidence=confidence_int,
+            now=now,
+            cooldown=cooldown,
+            confidence=int(match_score * 100),
             liveness_score=liveness_score,
             manual_override=manual_override,
             metadata=metadata,
+            audit=self.settings.audit_log_enabled,
+            # Kept on the daily summary row if this turns out to be the day's CLOCK_IN
+            late=is_late(now, self.settings),
         )
+        log, blocked = self.attendance_repo.record_mark(**mark, decided_type=decided_type)
+        if log is None and decided_type is not None:
+            # Another worker marked this user after the entry was cached; let the database decide
+            metrics.incr("attendance.state_cache.stale")
+            self.state_cache.invalidate(user_id)
+            log, blocked = self.attendance_repo.record_mark(**mark)
+        if log is None:
+            if blocked:
+                raise DuplicateAttendance("Duplicate within cooldown window")
+            raise DuplicateAttendance("Attendance already recorded for today")
+        if self.state_cache is not None:
+            remember_on_commit(self.db, user_id, attendance_date, log.type, now)
 
-        if self.settings.audit_log_enabled:
-            self.audit_repo.log(
-                action="attendance_mark",
-                entity="attendance_logs",
-                entity_id=str(log.id),
-                details={"user_id": user_id, "type": log_type.value, "confidence": confidence_int},
-            )
+        if embedding is not None and self.settings.template_update_enabled:
+            # Only buffered here; the updater writes templates in the background
+            get_template_updater().offer(user_id, embedding, match_score, liveness_score)
 
         return log
 
+    def record_many(self, entries: list[tuple[int, float, int | None]]) -> tuple[list[AttendanceLog], list[tuple[int, str]]]:
+        """
+        Record (user_id, match_score, liveness_score) entries in the caller's transaction.
+
+        Each entry runs in its own savepoint, so a duplicate for one person does not undo
+        the rest; rejected entries are returned with their reason instead of raised.
+        """
+        logs: list[AttendanceLog] = []
+        skipped: list[tuple[int, str]] = []
+        for user_id, match_score, liveness_score in entries:
+            try:
+                with self.db.begin_nested():
+                    logs.append(self.record(user_id=user_id, match_score=match_score, liveness_score=liveness_score))
+            except (DuplicateAttendance, WindowViolation) as exc:
+                skipped.append((user_id, exc.detail))
+        return logs, skipped
@@ -0,0 +1,107 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import date, datetime
+from functools import lru_cache
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.db.models import AttendanceTypeEnum
+
+_PENDING = "attendance_state_pending"
+
+
+@dataclass
+class AttendanceState:
+    last_timestamp: datetime
+    clocked_in: bool
+    clocked_out: bool
+    cached_at: float
+
+
+class AttendanceStateCache:
+    """
+    Per-user LRU of today's attendance state, filled from this process's own committed marks.
+
+    Everything is dropped when the date changes. Marks written by other workers never reach
+    this cache, so with several workers an entry can be stale: ``ttl_seconds`` bounds how long
+    it is trusted (0: until the day rolls over).
+    """
+
+    def __init__(self, size: int = 10000, ttl_seconds: float = 0.0):
+        self.size = size
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._day: date | None = None
+        self._states: OrderedDict[int, AttendanceState] = OrderedDict()
+
+    def _roll(self, day: date) -> None:
+        if day != self._day:
+            self._states.clear()
+            self._day = day
+
+    def get(self, user_id: int, day: date) -> AttendanceState | None:
+        with self._lock:
+            self._roll(day)
+            state = self._states.get(user_id)
+            if state is None:
+                return None
+            if self.ttl_seconds and time.monotonic() - state.cached_at > self.ttl_seconds:
+                del self._states[user_id]
+                return None
+            self._states.move_to_end(user_id)
+            return state
+
+    def remember(self, user_id: int, day: date, log_type: str, timestamp: datetime) -> None:
+        with self._lock:
+            self._roll(day)
+            previous = self._states.pop(user_id, None)
+            clocked_out = log_type == AttendanceTypeEnum.CLOCK_OUT.value
+            self._states[user_id] = AttendanceState(
+                last_timestamp=max(timestamp, previous.last_timestamp) if previous else timestamp,
+                # A CLOCK_OUT is only ever written after a CLOCK_IN
+                clocked_in=True,
+                clocked_out=clocked_out or (previous is not None and previous.clocked_out),
+                cached_at=time.monotonic(),
+            )
+            while len(self._states) > self.size:
+                self._states.popitem(last=False)
+
+    def invalidate(self, user_id: int) -> None:
+        with self._lock:
+            self._states.pop(user_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._states.clear()
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+
+def remember_on_commit(db: Session, user_id: int, day: date, log_type: str, timestamp: datetime) -> None:
+    # Write-through happens only once the mark is durable; a rolled back mark must not be cached
+    db.info.setdefault(_PENDING, []).append((user_id, day, log_type, timestamp))
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_pending(session: Session) -> None:
+    pending = session.info.pop(_PENDING, None)
+    if pending:
+        cache = get_attendance_state_cache()
+        for entry in pending:
+            cache.remember(*entry)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_pending(session: Session) -> None:
+    session.info.pop(_PENDING, None)
+
+
+@lru_cache(maxsize=1)
+def get_attendance_state_cache() -> AttendanceStateCache:
+    settings = get_settings()
+    return AttendanceStateCache(size=settings.attendance_state_cache_size, ttl_seconds=settings.attendance_state_cache_ttl_seconds)
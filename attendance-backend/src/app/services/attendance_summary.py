@@ -0,0 +1,73 @@
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+from app.config import Settings, get_settings
+from app.repositories.summary_repository import SummaryRepository
+
+
+def late_threshold(day: date, settings: Settings) -> datetime:
+    start = datetime.combine(day, time.fromisoformat(settings.attendance_window_start)).replace(tzinfo=timezone.utc)
+    return start + timedelta(minutes=settings.attendance_grace_minutes)
+
+
+def is_late(first_in: datetime, settings: Settings) -> bool:
+    if first_in.tzinfo is None:
+        # SQLite hands timestamps back naive; they are stored in UTC
+        first_in = first_in.replace(tzinfo=timezone.utc)
+    return first_in > late_threshold(first_in.date(), settings)
+
+
+def rebuild_summaries(db: Session, date_from: Optional[date] = None, date_to: Optional[date] = None, chunk_size: int = 5000) -> int:
+    """
+    Recompute daily_attendance_summary for the range (everything when open) from attendance_logs.
+
+    For backfilling history and repairing rows after manual edits to the logs. The late flag is
+    judged against the current attendance window. Runs in the caller's transaction, so readers
+    see either the old rows or the new ones; returns the number of rows written.
+    """
+    settings = get_settings()
+    repo = SummaryRepository(db)
+    repo.delete_range(date_from, date_to)
+    written = 0
+    for rows in repo.aggregate_logs(date_from, date_to, chunk_size):
+        summaries = []
+        for user_id, day, first_in, last_out in rows:
+            duration = int((last_out - first_in).total_seconds()) if first_in and last_out else None
+            summaries.append(
+                dict(
+                    user_id=user_id,
+                    date=day,
+                    first_in=first_in,
+                    last_out=last_out,
+                    duration_seconds=duration,
+                    late=first_in is not None and is_late(first_in, settings),
+                )
+            )
+        repo.insert_many(summaries)
+        written += len(summaries)
+    return written
+
+
+def summarize_days(db: Session, date_from: date, date_to: date, role: Optional[str] = None, user_ids: list[int] = ()) -> list[dict]:
+    """
+    Present / late / absent for every day in the range.
+
+    A day's roster is the active non-admin users in scope created on or before it. There is
+    no deactivation history, so users deactivated since are missing from past rosters too.
+    """
+    repo = SummaryRepository(db)
+    counts = {row.date: row for row in repo.daily_counts(date_from, date_to, role, user_ids)}
+    joins = repo.roster_joins(date_to, role, user_ids)
+    days, roster, next_join = [], 0, 0
+    for offset in range((date_to - date_from).days + 1):
+        day = date_from + timedelta(days=offset)
+        while next_join < len(joins) and joins[next_join].joined <= day:
+            roster += joins[next_join].users
+            next_join += 1
+        present = counts[day].present if day in counts else 0
+        late = counts[day].late if day in counts else 0
+        # Marks by users outside today's roster (deactivated since) never make absence negative
+        days.append(dict(date=day, present=present, late=late, absent=max(roster - present, 0)))
+    return days
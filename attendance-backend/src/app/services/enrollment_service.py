@@ -0,0 +1,224 @@
+import csv
+import io
+import logging
+import os
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, fields
+from pathlib import Path
+from typing import BinaryIO, Callable, Iterator, Optional
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.core.errors import FaceNotDetected
+from app.db.models import User
+from app.repositories.embedding_repository import EmbeddingRepository
+from app.services.face.frame import face_area
+from app.services.face.recognition_service import FaceRecognitionService
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BulkEnrollmentRow:
+    row: int
+    external_id: str
+    image: str
+    status: str = "pending"
+    detail: str = ""
+
+
+class ImageSource:
+    """
+    Reads manifest-referenced images from a directory or a ZIP archive.
+    """
+
+    def __init__(self, source: str | Path | BinaryIO):
+        self._zip: Optional[zipfile.ZipFile] = None
+        self._root: Optional[Path] = None
+        if isinstance(source, (str, Path)) and Path(source).is_dir():
+            self._root = Path(source)
+        else:
+            self._zip = zipfile.ZipFile(source)
+
+    def read(self, name: str) -> bytes:
+        if self._zip is not None:
+            return self._zip.read(name)
+        path = (self._root / name).resolve()
+        # Manifest paths must stay inside the source directory
+        if self._root.resolve() not in path.parents:
+            raise FileNotFoundError(name)
+        return path.read_bytes()
+
+    def close(self) -> None:
+        if self._zip is not None:
+            self._zip.close()
+
+
+def read_manifest(manifest: str | Path | BinaryIO) -> list[BulkEnrollmentRow]:
+    """
+    CSV with ``external_id`` and ``image`` columns; rows are numbered from 1.
+    """
+    if isinstance(manifest, (str, Path)):
+        text = Path(manifest).read_text(encoding="utf-8-sig")
+    else:
+        text = manifest.read().decode("utf-8-sig")
+    reader = csv.DictReader(io.StringIO(text))
+    missing = {"external_id", "image"} - set(reader.fieldnames or [])
+    if missing:
+        raise ValueError(f"Manifest is missing columns: {', '.join(sorted(missing))}")
+    return [
+        BulkEnrollmentRow(row=i, external_id=(record["external_id"] or "").strip(), image=(record["image"] or "").strip())
+        for i, record in enumerate(reader, start=1)
+    ]
+
+
+def load_completed_rows(report_path: str | Path) -> set[int]:
+    path = Path(report_path)
+    if not path.exists():
+        return set()
+    with path.open(newline="", encoding="utf-8") as handle:
+        # Superseded rows stay done too: re-running them would overwrite the image that replaced them
+        return {int(record["row"]) for record in csv.DictReader(handle) if record["status"] in ("enrolled", "superseded")}
+
+
+class BulkEnrollmentService:
+    """
+    Enrolls many users per chunk: parallel decode + detect, one batched embedding pass,
+    bulk encryption and a single upsert statement per chunk.
+
+    Results are appended to an optional CSV report after each committed chunk, and rows
+    already reported as enrolled are skipped, so an interrupted run resumes where it stopped.
+    Without a report (the HTTP endpoint) nothing is resumable. A user listed more than once
+    keeps the last image; the earlier rows are reported as superseded and never enrolled, even
+    when the last one fails.
+    """
+
+    def __init__(
+        self,
+        db: Session,
+        face_service: FaceRecognitionService,
+        embedding_repo: Optional[EmbeddingRepository] = None,
+        chunk_size: int = 64,
+        workers: Optional[int] = None,
+    ):
+        self.db = db
+        self.face_service = face_service
+        self.embedding_repo = embedding_repo or EmbeddingRepository(db)
+        self.chunk_size = chunk_size
+        self.workers = workers or os.cpu_count() or 1
+
+    def _detect_largest(self, image_bytes: bytes) -> np.ndarray:
+        faces = self.face_service.detector.detect(self.face_service._load_image(image_bytes))
+        if not faces:
+            raise FaceNotDetected("No face detected")
+        return max(faces, key=face_area)
+
+    def _resolve_users(self, rows: list[BulkEnrollmentRow]) -> dict[str, int]:
+        external_ids = {row.external_id for row in rows}
+        stmt = select(User.external_id, User.id).where(User.external_id.in_(external_ids))
+        return {external_id: user_id for external_id, user_id in self.db.execute(stmt)}
+
+    def _chunks(self, rows: list[BulkEnrollmentRow]) -> Iterator[list[BulkEnrollmentRow]]:
+        for start in range(0, len(rows), self.chunk_size):
+            yield rows[start : start + self.chunk_size]
+
+    def _process_chunk(self, chunk: list[BulkEnrollmentRow], source: ImageSource, pool: ThreadPoolExecutor) -> None:
+        user_ids = self._resolve_users(chunk)
+        pending: list[tuple[BulkEnrollmentRow, bytes]] = []
+        for row in chunk:
+            if row.status == "superseded":
+                continue
+            if row.external_id not in user_ids:
+                row.status, row.detail = "failed", "Unknown external_id"
+                continue
+            try:
+                pending.append((row, source.read(row.image)))
+            except (KeyError, FileNotFoundError):
+                row.status, row.detail = "failed", "Image not found"
+
+        detected = list(pool.map(lambda item: self._safe_detect(item[1]), pending))
+        faces, face_rows = [], []
+        for (row, _), (face, error) in zip(pending, detected):
+            if face is None:
+                row.status, row.detail = "failed", error
+            else:
+                faces.append(face)
+                face_rows.append(row)
+        if not faces:
+            return
+
+        embeddings = self.face_service.embedder.embed_batch(faces).astype(np.float32)
+        model_version = self.face_service.model_version
+        self.embedding_repo.bulk_upsert(
+            [
+                {
+                    "user_id": user_ids[row.external_id],
+                    "model_version": model_version,
+                    "vector": embedding,
+                    "encrypted_blob": self.face_service.encrypt_embedding(embedding),
+                    # Enrollment skips liveness, as in enroll_face
+                    "liveness_score": 100,
+                }
+                for row, embedding in zip(face_rows, embeddings)
+            ]
+        )
+        self.db.commit()
+        for row in face_rows:
+            row.status = "enrolled"
+
+    def _safe_detect(self, image_bytes: bytes) -> tuple[Optional[np.ndarray], str]:
+        try:
+            return self._detect_largest(image_bytes), ""
+        except FaceNotDetected as exc:
+            return None, exc.detail
+        except Exception as exc:  # corrupt or unsupported image files
+            return None, f"Unreadable image: {exc}"
+
+    def run(
+        self,
+        rows: list[BulkEnrollmentRow],
+        source: ImageSource,
+        report_path: str | Path | None = None,
+        on_progress: Optional[Callable[[int, int], None]] = None,
+    ) -> list[BulkEnrollmentRow]:
+        completed = load_completed_rows(report_path) if report_path else set()
+        # One template slot per user: the last row listed for a person wins across the whole
+        # manifest, so an earlier image never overwrites it from a later chunk or run
+        last = {row.external_id: row.row for row in rows}
+        todo = []
+        for row in rows:
+            if row.row in completed:
+                row.status, row.detail = "skipped", "Already enrolled in a previous run"
+            elif last[row.external_id] != row.row:
+                row.status, row.detail = "superseded", f"Replaced by row {last[row.external_id]}"
+                todo.append(row)
+            else:
+                todo.append(row)
+
+        done = 0
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for chunk in self._chunks(todo):
+                try:
+                    self._process_chunk(chunk, source, pool)
+                except Exception:
+                    self.db.rollback()
+                    raise
+                if report_path:
+                    self._append_report(report_path, chunk)
+                done += len(chunk)
+                if on_progress:
+                    on_progress(done, len(todo))
+        return rows
+
+    @staticmethod
+    def _append_report(report_path: str | Path, chunk: list[BulkEnrollmentRow]) -> None:
+        path = Path(report_path)
+        is_new = not path.exists()
+        with path.open("a", newline="", encoding="utf-8") as handle:
+            writer = csv.DictWriter(handle, fieldnames=[f.name for f in fields(BulkEnrollmentRow)])
+            if is_new:
+                writer.writeheader()
+            writer.writerows(asdict(row) for row in chunk)
@@ -0,0 +1,123 @@
+"""
+CPU inference backends for the face models.
+
+``eager`` runs the facenet_pytorch modules as they are. ``torchscript`` traces them once,
+then freezes and optimizes the graph. ``onnx`` exports them and runs them under ONNX Runtime
+with explicit intra/inter-op thread counts. Exports are cached under ``model_dir``; the
+``export_models`` CLI writes them at build time so workers only load files.
+``quantize`` applies dynamic 8-bit quantization (Linear layers in torch; Conv and MatMul in ONNX).
+"""
+
+import logging
+from pathlib import Path
+from typing import Callable, Sequence
+
+import torch
+from torch import nn
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("eager", "torchscript", "onnx")
+
+
+def model_version_for(base: str, backend: str, quantize: bool = False) -> str:
+    """
+    ``base`` for the eager model; otherwise tagged with the backend that produces the embeddings.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend: {backend}")
+    tag = f"{backend}-int8" if quantize else backend
+    return base if tag == "eager" else f"{base}+{tag}"
+
+
+class OnnxModule:
+    """
+    ONNX Runtime session behind the module call signature facenet_pytorch expects.
+    """
+
+    def __init__(self, path: Path, intra_op_threads: int = 0, inter_op_threads: int = 0):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = intra_op_threads
+        options.inter_op_num_threads = inter_op_threads
+        self.session = ort.InferenceSession(str(path), options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def __call__(self, batch: torch.Tensor):
+        outputs = [torch.from_numpy(out) for out in self.session.run(None, {self.input_name: batch.detach().cpu().numpy()})]
+        return outputs[0] if len(outputs) == 1 else tuple(outputs)
+
+
+def _export_onnx(module: nn.Module, example: torch.Tensor, path: Path, outputs: int, spatial_dynamic: bool, quantize: bool) -> None:
+    # P-Net's outputs are score maps whose size follows the input's
+    axes = {0: "batch", 2: "height", 3: "width"} if spatial_dynamic else {0: "batch"}
+    output_names = [f"output{i}" for i in range(outputs)]
+    target = path.with_suffix(".fp32.onnx") if quantize else path
+    torch.onnx.export(
+        module,
+        example,
+        str(target),
+        input_names=["input"],
+        output_names=output_names,
+        dynamic_axes={"input": axes, **{name: axes for name in output_names}},
+        opset_version=17,
+    )
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantize_dynamic(str(target), str(path), weight_type=QuantType.QUInt8)
+        target.unlink()
+
+
+def compile_module(
+    factory: Callable[[], nn.Module],
+    backend: str,
+    path: Path,
+    example: torch.Tensor,
+    quantize: bool = False,
+    outputs: int = 1,
+    spatial_dynamic: bool = False,
+    intra_op_threads: int = 0,
+    inter_op_threads: int = 0,
+):
+    """
+    ``factory``'s module on ``backend``, exporting to ``path`` first if no export is cached there.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend: {backend}")
+    if backend == "eager":
+        module = factory().eval()
+        return torch.ao.quantization.quantize_dynamic(module, {nn.Linear}, dtype=torch.qint8) if quantize else module
+
+    if not path.exists():
+        module = factory().eval()
+        if quantize and backend == "torchscript":
+            module = torch.ao.quantization.quantize_dynamic(module, {nn.Linear}, dtype=torch.qint8)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        logger.info("Exporting %s to %s", type(module).__name__, path)
+        with torch.no_grad():
+            if backend == "torchscript":
+                torch.jit.save(torch.jit.trace(module, example), str(path))
+            else:
+                _export_onnx(module, example, path, outputs, spatial_dynamic, quantize)
+
+    if backend == "torchscript":
+        scripted = torch.jit.load(str(path), map_location="cpu").eval()
+        return torch.jit.optimize_for_inference(torch.jit.freeze(scripted))
+    return OnnxModule(path, intra_op_threads, inter_op_threads)
+
+
+def export_path(model_dir: str | Path, name: str, backend: str, quantize: bool = False) -> Path:
+    suffix = ".onnx" if backend == "onnx" else ".pt"
+    return Path(model_dir) / f"{name}{'-int8' if quantize else ''}{suffix}"
+
+
+def mtcnn_examples() -> Sequence[tuple[str, torch.Tensor, int, bool]]:
+    # (network, example input, outputs, spatially dynamic): P-Net runs on every pyramid scale
+    return (
+        ("pnet", torch.zeros(1, 3, 64, 64), 2, True),
+        ("rnet", torch.zeros(1, 3, 24, 24), 2, False),
+        ("onet", torch.zeros(1, 3, 48, 48), 3, False),
+    )
@@ -0,0 +1,124 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Callable, Sequence
+
+from app.core.metrics import metrics
+
+
+@dataclass
+class _Pending:
+    item: Any
+    future: Future = field(default_factory=Future)
+    enqueued: float = field(default_factory=time.perf_counter)
+
+
+class InferenceBatcher:
+    """
+    Queues items from concurrent requests and runs them through ``batch_fn`` together.
+
+    A batch is flushed as soon as it holds ``max_batch_size`` items or the oldest item has
+    waited ``max_wait_ms``, whichever comes first. Each caller blocks only on its own result.
+    """
+
+    def __init__(self, batch_fn: Callable[[list], Sequence], max_batch_size: int = 16, max_wait_ms: float = 5.0, name: str = "inference"):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000.0
+        self.name = name
+        self._queue: queue.Queue[_Pending | None] = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name=f"{name}-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, item: Any) -> Future:
+        pending = _Pending(item)
+        self._queue.put(pending)
+        return pending.future
+
+    def __call__(self, item: Any) -> Any:
+        return self.submit(item).result()
+
+    def close(self) -> None:
+        self._queue.put(None)
+        self._worker.join()
+
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = [first]
+            deadline = first.enqueued + self.max_wait
+            stop = False
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    pending = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if pending is None:
+                    stop = True
+                    break
+                batch.append(pending)
+            self._flush(batch)
+            if stop:
+                return
+
+    def _flush(self, batch: list[_Pending]) -> None:
+        started = time.perf_counter()
+        for pending in batch:
+            metrics.observe(f"{self.name}.queue_wait_ms", (started - pending.enqueued) * 1000)
+        metrics.observe(f"{self.name}.batch_size", len(batch))
+        try:
+            results = self.batch_fn([pending.item for pending in batch])
+        except Exception as exc:  # surface the failure to every waiting request
+            for pending in batch:
+                pending.future.set_exception(exc)
+            return
+        metrics.observe(f"{self.name}.batch_ms", (time.perf_counter() - started) * 1000)
+        for pending, result in zip(batch, results):
+            pending.future.set_result(result)
+
+
+class BatchingEmbedder:
+    """
+    Drop-in FaceEmbedder whose single-face ``embed`` calls share batched forward passes.
+    """
+
+    def __init__(self, embedder, max_batch_size: int = 16, max_wait_ms: float = 5.0):
+        self.embedder = embedder
+        self.batcher = InferenceBatcher(embedder.embed_batch, max_batch_size, max_wait_ms, name="embedder")
+
+    def embed(self, face):
+        return self.batcher(face)
+
+    def embed_batch(self, faces):
+        # Callers that already batch (group photos) skip the queue
+        return self.embedder.embed_batch(faces)
+
+    def __getattr__(self, name):
+        return getattr(self.embedder, name)
+
+
+class BatchingDetector:
+    """
+    Drop-in FaceDetector whose ``detect`` and ``detect_scored`` calls are coalesced into
+    ``detect_batch_scored`` runs.
+    """
+
+    def __init__(self, detector, max_batch_size: int = 16, max_wait_ms: float = 5.0):
+        self.detector = detector
+        self.batcher = InferenceBatcher(detector.detect_batch_scored, max_batch_size, max_wait_ms, name="detector")
+
+    def detect(self, image):
+        return self.batcher(image)[0]
+
+    def detect_scored(self, image):
+        return self.batcher(image)
+
+    def __getattr__(self, name):
+        return getattr(self.detector, name)
@@ -1,26 +1,119 @@
 from typing import List, Tuple
 
+import cv2
+import numpy as np
 import torch
 from facenet_pytorch import MTCNN
 from PIL import Image
 
+from app.config import get_settings
+from app.services.face.backends import compile_module, export_path, mtcnn_examples
+from app.services.face.frame import crop, to_frame
+
 
 class FaceDetector:
     """
     Separate detection from recognition to allow swapping detectors.
+
+    With ``max_side`` set, MTCNN runs on a copy downscaled to that longest side and the
+    boxes are mapped back, so faces are still cropped from the full-resolution frame.
     """
 
-    def __init__(self, device: str | None = None):
-        self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+    def __init__(
+        self,
+        device: str | None = None,
+        max_side: int | None = None,
+        backend: str | None = None,
+        quantize: bool | None = None,
+        model_dir: str | None = None,
+    ):
+        settings = get_settings()
+        self.backend = settings.inference_backend if backend is None else backend
+        self.quantize = settings.inference_quantize if quantize is None else quantize
+        self.device = device or ("cuda" if torch.cuda.is_available() and self.backend == "eager" else "cpu")
         self.detector = MTCNN(keep_all=True, device=self.device, post_process=True)
+        self.max_side = settings.detection_max_side if max_side is None else max_side
+        if self.backend != "eager":
+            # Swap the three cascade networks; MTCNN's own pre/post-processing stays as is
+            for name, example, outputs, spatial_dynamic in mtcnn_examples():
+                network = getattr(self.detector, name)
+                # An ONNX session is not an nn.Module, so it cannot replace a registered child
+                delattr(self.detector, name)
+                setattr(
+                    self.detector,
+                    name,
+                    compile_module(
+                        lambda network=network: network,
+                        self.backend,
+                        export_path(model_dir or settings.exported_model_dir, f"mtcnn-{name}", self.backend, self.quantize),
+                        example,
+                        quantize=self.quantize,
+                        outputs=outputs,
+                        spatial_dynamic=spatial_dynamic,
+                        intra_op_threads=settings.inference_intra_op_threads,
+                        inter_op_threads=settings.inference_inter_op_threads,
+                    ),
+                )
 
-    def detect(self, image: Image.Image) -> List[Image.Image]:
-        boxes, _ = self.detector.detect(image)
+    def _shrink(self, frame: np.ndarray) -> tuple[np.ndarray, float]:
+        longest = max(frame.shape[:2])
+        if not self.max_side or longest <= self.max_side:
+            return frame, 1.0
+        scale = self.max_side / longest
+        size = (max(1, round(frame.shape[1] * scale)), max(1, round(frame.shape[0] * scale)))
+        return cv2.resize(frame, size, interpolation=cv2.INTER_AREA), scale
+
+    def locate(self, frame: np.ndarray | Image.Image) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Face boxes (x1, y1, x2, y2) in ``frame`` coordinates and their detection probabilities.
+        """
+        small, scale = self._shrink(to_frame(frame))
+        with torch.inference_mode():
+            boxes, probs = self.detector.detect(small)
         if boxes is None:
-            return []
-        faces: List[Image.Image] = []
-        for box in boxes:
-            x1, y1, x2, y2 = [int(b) for b in box]
-            faces.append(image.crop((x1, y1, x2, y2)))
-        return faces
+            return np.empty((0, 4), dtype=np.float32), np.empty(0, dtype=np.float32)
+        return np.asarray(boxes, dtype=np.float32) / scale, np.asarray(probs, dtype=np.float32)
+
+    def detect(self, frame: np.ndarray | Image.Image) -> List[np.ndarray]:
+        return self.detect_scored(frame)[0]
 
+    def detect_scored(self, frame: np.ndarray | Image.Image) -> Tuple[List[np.ndarray], List[float]]:
+        """
+        Face crops and their MTCNN detection probabilities.
+        """
+        frame = to_frame(frame)
+        small, scale = self._shrink(frame)
+        with torch.inference_mode():
+            boxes, probs = self.detector.detect(small)
+        return self._crop(frame, boxes, probs, scale)
+
+    def detect_batch(self, frames: List[np.ndarray | Image.Image]) -> List[List[np.ndarray]]:
+        return [faces for faces, _ in self.detect_batch_scored(frames)]
+
+    def detect_batch_scored(self, frames: List[np.ndarray | Image.Image]) -> List[Tuple[List[np.ndarray], List[float]]]:
+        # MTCNN only batches equally sized frames, so run one cascade per distinct shape
+        frames = [to_frame(frame) for frame in frames]
+        shrunk = [self._shrink(frame) for frame in frames]
+        results: List[Tuple[List[np.ndarray], List[float]]] = [([], []) for _ in frames]
+        by_shape: dict[Tuple[int, ...], List[int]] = {}
+        for i, (small, _) in enumerate(shrunk):
+            by_shape.setdefault(small.shape, []).append(i)
+        for indices in by_shape.values():
+            with torch.inference_mode():
+                batch_boxes, batch_probs = self.detector.detect(np.stack([shrunk[i][0] for i in indices]))
+            for i, boxes, probs in zip(indices, batch_boxes, batch_probs):
+                results[i] = self._crop(frames[i], boxes, probs, shrunk[i][1])
+        return results
+
+    @staticmethod
+    def _crop(frame: np.ndarray, boxes, probs, scale: float = 1.0) -> Tuple[List[np.ndarray], List[float]]:
+        if boxes is None:
+            return [], []
+        # Views into the decoded frame, not copies; boxes entirely off-frame are dropped
+        faces, scores = [], []
+        for box, prob in zip(boxes, probs):
+            face = crop(frame, np.asarray(box) / scale)
+            if face.size:
+                faces.append(face)
+                scores.append(float(prob))
+        return faces, scores
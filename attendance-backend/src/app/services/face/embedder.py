@@ -1,25 +1,68 @@
+import numpy as np
 import torch
 from facenet_pytorch import InceptionResnetV1
 from PIL import Image
-from torchvision import transforms
+
+from app.config import get_settings
+from app.services.face.backends import compile_module, export_path
+from app.services.face.frame import to_frame
 
 
 class FaceEmbedder:
-    def __init__(self, device: str | None = None, model_name: str = "vggface2"):
-        self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+    """
+    InceptionResnetV1 on the configured backend (eager, torchscript or onnx; see backends).
+
+    ``model_name=None`` builds the network with random weights, which is only useful in tests.
+    """
+
+    input_size = 160
+
+    def __init__(
+        self,
+        device: str | None = None,
+        model_name: str | None = "vggface2",
+        backend: str | None = None,
+        quantize: bool | None = None,
+        model_dir: str | None = None,
+    ):
+        settings = get_settings()
+        self.backend = settings.inference_backend if backend is None else backend
+        self.quantize = settings.inference_quantize if quantize is None else quantize
+        # Exported graphs are CPU-only
+        self.device = device or ("cuda" if torch.cuda.is_available() and self.backend == "eager" else "cpu")
         self.model_name = model_name
-        self.model = InceptionResnetV1(pretrained=model_name).eval().to(self.device)
-        self.transform = transforms.Compose(
-            [
-                transforms.Resize((160, 160)),
-                transforms.ToTensor(),
-                transforms.Normalize([0.5, 0.5, 0.5], [0.5, 0.5, 0.5]),
-            ]
+        self.model = compile_module(
+            lambda: InceptionResnetV1(pretrained=model_name).eval().to(self.device),
+            self.backend,
+            export_path(model_dir or settings.exported_model_dir, f"inception_resnet_v1-{model_name}", self.backend, self.quantize),
+            torch.zeros(1, 3, self.input_size, self.input_size),
+            quantize=self.quantize,
+            intra_op_threads=settings.inference_intra_op_threads,
+            inter_op_threads=settings.inference_inter_op_threads,
         )
 
-    def embed(self, face: Image.Image):
-        tensor = self.transform(face).unsqueeze(0).to(self.device)
-        with torch.no_grad():
-            embedding = self.model(tensor)
-        return embedding[0].cpu().numpy()
+    def _to_batch(self, faces: list[np.ndarray | Image.Image]) -> torch.Tensor:
+        # Resize each crop into one preallocated uint8 NHWC buffer, then convert and
+        # normalize to [-1, 1] (same as ToTensor + Normalize(0.5, 0.5)) in a single pass
+        size = self.input_size
+        batch = np.empty((len(faces), size, size, 3), dtype=np.uint8)
+        for i, face in enumerate(faces):
+            image = face if isinstance(face, Image.Image) else Image.fromarray(to_frame(face))
+            # PIL's antialiased bilinear resize, as torchvision's Resize did at enrollment:
+            # identical pixels keep scans comparable with every template under the same tag
+            batch[i] = np.asarray(image.convert("RGB").resize((size, size), Image.BILINEAR))
+        tensor = torch.from_numpy(batch).to(self.device).permute(0, 3, 1, 2).float()
+        return tensor.sub_(127.5).div_(127.5)
+
+    def embed(self, face: np.ndarray | Image.Image):
+        return self.embed_batch([face])[0]
 
+    def embed_batch(self, faces: list[np.ndarray | Image.Image]) -> np.ndarray:
+        # One forward pass for every crop instead of a batch-of-one per face
+        if not faces:
+            return np.empty((0, 512), dtype=np.float32)
+        batch = self._to_batch(faces)
+        # No autograd bookkeeping at all (no version counters or grad-mode tensors)
+        with torch.inference_mode():
+            embeddings = self.model(batch)
+        return embeddings.cpu().numpy()
@@ -0,0 +1,53 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
+from typing import Any, Callable
+
+from app.config import get_settings
+from app.core.errors import ServiceOverloaded
+from app.core.metrics import metrics
+
+
+class InferenceExecutor:
+    """
+    Dedicated, sized thread pool for CPU-bound face work with admission control.
+
+    At most ``max_workers`` jobs run and ``max_queue`` wait; anything beyond that is
+    rejected immediately with 503 + Retry-After instead of piling up latency.
+    Threads (not processes) because torch and OpenCV release the GIL during inference
+    and the models are already loaded once per process.
+    """
+
+    def __init__(self, max_workers: int = 2, max_queue: int = 16, retry_after: int = 2):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="inference")
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue)
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        if not self._slots.acquire(blocking=False):
+            metrics.incr("executor.rejected")
+            raise ServiceOverloaded(retry_after=self.retry_after)
+        try:
+            future = self._pool.submit(partial(fn, *args, **kwargs))
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        metrics.incr("executor.accepted")
+        return await asyncio.wrap_future(future)
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=True)
+
+
+@lru_cache(maxsize=1)
+def get_inference_executor() -> InferenceExecutor:
+    settings = get_settings()
+    return InferenceExecutor(
+        max_workers=settings.inference_executor_workers,
+        max_queue=settings.inference_queue_size,
+        retry_after=settings.overload_retry_after_seconds,
+    )
@@ -0,0 +1,40 @@
+import io
+from typing import Sequence
+
+import numpy as np
+from PIL import Image
+
+# Frames are decoded once into a uint8 HWC RGB buffer; every later stage works on it or on
+# views into it, so a scan no longer re-copies pixels between PIL, numpy and torch.
+
+
+def decode_frame(file_bytes: bytes, max_side: int = 0) -> np.ndarray:
+    image = Image.open(io.BytesIO(file_bytes))
+    if max_side and image.format == "JPEG" and max(image.size) > max_side:
+        # JPEG draft mode decodes straight at a reduced DCT scale (1/2, 1/4, 1/8) that
+        # still covers max_side, instead of decoding full size and resizing afterwards
+        image.draft("RGB", (max_side, max_side))
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    return np.asarray(image)
+
+
+def to_frame(image: np.ndarray | Image.Image) -> np.ndarray:
+    if isinstance(image, np.ndarray):
+        return image
+    return np.asarray(image.convert("RGB") if image.mode != "RGB" else image)
+
+
+def crop(frame: np.ndarray, box: Sequence[float]) -> np.ndarray:
+    """
+    Zero-copy view of ``box`` (x1, y1, x2, y2), clamped to the frame.
+    """
+    height, width = frame.shape[:2]
+    x1, y1, x2, y2 = [int(b) for b in box]
+    x1, x2 = max(0, min(x1, width)), max(0, min(x2, width))
+    y1, y2 = max(0, min(y1, height)), max(0, min(y2, height))
+    return frame[y1:y2, x1:x2]
+
+
+def face_area(face: np.ndarray) -> int:
+    return face.shape[0] * face.shape[1]
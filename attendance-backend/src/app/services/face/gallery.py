@@ -0,0 +1,458 @@
+import threading
+from functools import lru_cache
+from typing import TYPE_CHECKING, Callable, Iterable, Optional, Sequence
+
+import numpy as np
+
+from app.config import get_settings
+from app.db.models import FaceEmbedding
+from app.services.face.quantization import Int8Quantizer, ProductQuantizer, mapped_rows
+
+if TYPE_CHECKING:
+    from app.repositories.embedding_repository import EmbeddingRepository
+
+
+class GalleryIndex:
+    """
+    In-memory matcher holding every enrolled embedding as one pre-normalized float32 matrix.
+
+    Rows are written in place and never moved, so a search works on views of the current
+    buffers without taking the lock; removed rows become tombstones (user_id -1) that are
+    reused by later inserts.
+
+    A user owns up to ``max_templates`` rows and scores as the best of them. In "centroid"
+    mode the user's templates are averaged into a single row instead.
+    """
+
+    def __init__(
+        self,
+        model_version: str = "facenet_v1",
+        dim: int | None = None,
+        initial_capacity: int = 1024,
+        max_templates: int | None = None,
+        template_mode: str | None = None,
+    ):
+        settings = get_settings()
+        self.model_version = model_version
+        self.dim = dim or settings.embedding_dim
+        self.max_templates = max_templates or settings.max_templates_per_user
+        self.template_mode = template_mode or settings.template_match_mode
+        if self.template_mode not in ("max", "centroid"):
+            raise ValueError(f"Unknown template match mode: {self.template_mode}")
+        self._lock = threading.RLock()
+        # (matrix, user_ids) swapped as one tuple so readers never mix buffers
+        self._buffers = (
+            np.zeros((initial_capacity, self.dim), dtype=np.float32),
+            np.full(initial_capacity, -1, dtype=np.int64),
+        )
+        self._size = 0
+        self._positions: dict[int, list[int]] = {}
+        self._free: list[int] = []
+        self.loaded = False
+
+    @classmethod
+    def from_embeddings(cls, embeddings: Iterable[FaceEmbedding], model_version: str = "facenet_v1") -> "GalleryIndex":
+        index = cls(model_version=model_version)
+        index.load(embeddings)
+        return index
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def load(self, embeddings: Iterable[FaceEmbedding]) -> None:
+        user_ids = []
+        vectors = []
+        for stored in embeddings:
+            user_ids.append(stored.user_id)
+            vectors.append(stored.vector)
+        self.load_arrays(np.asarray(user_ids, dtype=np.int64), np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim))
+
+    @property
+    def rows_per_user(self) -> int:
+        return 1 if self.template_mode == "centroid" else self.max_templates
+
+    def _template_rows(self, vectors: np.ndarray) -> np.ndarray:
+        rows = self._normalize(np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim))
+        if self.template_mode == "centroid":
+            return self._normalize(rows.mean(axis=0, keepdims=True))
+        return rows[-self.max_templates :]
+
+    @staticmethod
+    def _group_bounds(sorted_ids: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        if not len(sorted_ids):
+            return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp)
+        starts = np.flatnonzero(np.r_[True, sorted_ids[1:] != sorted_ids[:-1]])
+        return starts, np.r_[starts[1:], len(sorted_ids)]
+
+    def load_arrays(self, user_ids: np.ndarray, vectors: np.ndarray, normalized: bool = False) -> None:
+        """
+        Replace the gallery with one row per (user_id, vector) pair, grouped by user.
+
+        Only the last ``max_templates`` rows of a user are kept, matching template eviction.
+        """
+        order = np.argsort(user_ids, kind="stable")
+        user_ids = user_ids[order]
+        rows = vectors[order].astype(np.float32, copy=False)
+        rows = rows if normalized else self._normalize(rows)
+        starts, ends = self._group_bounds(user_ids)
+        if self.template_mode == "centroid":
+            # Segment sums over the grouped rows: one normalized centroid per user
+            rows = self._normalize(np.add.reduceat(rows, starts, axis=0)) if len(starts) else rows[:0]
+            user_ids = user_ids[starts]
+            starts, ends = np.arange(len(starts)), np.arange(1, len(starts) + 1)
+        else:
+            group_end = np.repeat(ends, ends - starts)
+            keep = group_end - np.arange(len(user_ids)) <= self.max_templates
+            if not keep.all():
+                user_ids, rows = user_ids[keep], rows[keep]
+                starts, ends = self._group_bounds(user_ids)
+        buffers = self._build_buffers(rows, max(len(rows), 1024))
+        buffers[1][: len(rows)] = user_ids
+        positions = {int(user_ids[start]): list(range(start, end)) for start, end in zip(starts.tolist(), ends.tolist())}
+        with self._lock:
+            self._buffers = buffers
+            self._size = len(rows)
+            self._positions = positions
+            self._free = []
+            self.loaded = True
+
+    def _build_buffers(self, rows: np.ndarray, capacity: int) -> tuple:
+        matrix = np.zeros((capacity, self.dim), dtype=np.float32)
+        matrix[: len(rows)] = rows
+        return matrix, np.full(capacity, -1, dtype=np.int64)
+
+    def ensure_loaded(self, populate: Callable[["GalleryIndex"], None]) -> "GalleryIndex":
+        if not self.loaded:
+            with self._lock:
+                if not self.loaded:
+                    populate(self)
+        return self
+
+    def export_arrays(self) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Copies of the live (user_ids, normalized matrix) rows, tombstones excluded.
+        """
+        with self._lock:
+            matrix, user_ids = self._buffers
+            ids = user_ids[: self._size]
+            live = ids >= 0
+            return ids[live].copy(), matrix[: self._size][live].copy()
+
+    def user_ids(self) -> set[int]:
+        with self._lock:
+            return set(self._positions)
+
+    def _grow(self) -> None:
+        old_matrix, old_ids = self._buffers
+        capacity = old_matrix.shape[0] * 2
+        matrix = np.zeros((capacity, self.dim), dtype=np.float32)
+        matrix[: self._size] = old_matrix[: self._size]
+        ids = np.full(capacity, -1, dtype=np.int64)
+        ids[: self._size] = old_ids[: self._size]
+        # Searches holding the old buffers stay valid
+        self._buffers = (matrix, ids)
+
+    def _allocate(self) -> tuple[int, bool]:
+        # Caller holds the lock; returns a free row and whether it extends _size
+        if self._free:
+            return self._free.pop(), False
+        if self._size == self._buffers[0].shape[0]:
+            self._grow()
+        return self._size, True
+
+    def _write_row(self, pos: int, row: Optional[np.ndarray]) -> None:
+        self._buffers[0][pos] = 0.0 if row is None else row
+
+    def _release(self, pos: int) -> None:
+        self._buffers[1][pos] = -1
+        self._write_row(pos, None)
+        self._free.append(pos)
+
+    def set_templates(self, user_id: int, vectors: np.ndarray) -> None:
+        """
+        Replace all of ``user_id``'s rows with ``vectors`` (one template per row).
+        """
+        rows = self._template_rows(vectors)
+        with self._lock:
+            current = self._positions.get(user_id, [])
+            for pos in current[len(rows) :]:
+                self._release(pos)
+            positions = current[: len(rows)]
+            for index, row in enumerate(rows):
+                if index < len(positions):
+                    pos, appended = positions[index], False
+                else:
+                    pos, appended = self._allocate()
+                    positions.append(pos)
+                # Vector before id, so a concurrent search never pairs the id with a stale row
+                self._write_row(pos, row)
+                self._buffers[1][pos] = user_id
+                if appended:
+                    self._size += 1
+            self._positions[user_id] = positions
+
+    def upsert(self, user_id: int, vector: np.ndarray) -> None:
+        self.set_templates(user_id, np.asarray(vector).reshape(1, self.dim))
+
+    def sync_users(self, user_ids: Iterable[int], templates: Iterable[tuple[int, Sequence[float]]]) -> None:
+        """
+        Reload the templates of ``user_ids`` from (user_id, vector) pairs; users without any are dropped.
+        """
+        grouped: dict[int, list] = {}
+        for user_id, vector in templates:
+            grouped.setdefault(user_id, []).append(vector)
+        for user_id in user_ids:
+            if user_id in grouped:
+                self.set_templates(user_id, np.asarray(grouped[user_id], dtype=np.float32))
+            else:
+                self.remove(user_id)
+
+    def remove(self, user_id: int) -> None:
+        with self._lock:
+            for pos in self._positions.pop(user_id, []):
+                self._release(pos)
+
+    def _gather_rows(self, positions: np.ndarray) -> np.ndarray:
+        return self._buffers[0][positions]
+
+    def search_users(self, query: np.ndarray, user_ids: Iterable[int], k: int = 1) -> list[tuple[int, float]]:
+        """
+        Top-k among ``user_ids`` only; costs O(their templates), not O(gallery).
+        """
+        query = self._normalize(np.asarray(query, dtype=np.float32).reshape(self.dim))
+        with self._lock:
+            pairs = [(user_id, pos) for user_id in set(user_ids) for pos in self._positions.get(user_id, ())]
+            if not pairs:
+                return []
+            owners = np.array([user_id for user_id, _ in pairs], dtype=np.int64)
+            rows = self._gather_rows(np.array([pos for _, pos in pairs], dtype=np.intp))
+        scores = rows @ query
+        order = np.argsort(-scores, kind="stable")
+        return self._best_per_user(owners, order, scores[order], k)
+
+    @staticmethod
+    def _best_per_user(ids: np.ndarray, rows: np.ndarray, scores: np.ndarray, k: int) -> list[tuple[int, float]]:
+        # rows/scores sorted best first: the first hit of each user is its max over templates
+        results: list[tuple[int, float]] = []
+        seen: set[int] = set()
+        for row, score in zip(rows.tolist(), scores.tolist()):
+            user_id = int(ids[row])
+            if user_id < 0 or user_id in seen:
+                continue
+            seen.add(user_id)
+            results.append((user_id, float(score)))
+            if len(results) == k:
+                break
+        return results
+
+    def search(self, query: np.ndarray, k: int = 1) -> list[tuple[int, float]]:
+        return self.search_batch(np.asarray(query).reshape(1, self.dim), k)[0]
+
+    def search_batch(self, queries: np.ndarray, k: int = 1) -> list[list[tuple[int, float]]]:
+        """
+        Top-k users for every row of ``queries`` with a single matrix multiply.
+
+        The k best users all have a template among the best k * rows_per_user rows, so
+        reducing that shortlist per user gives the exact max-over-templates ranking.
+        """
+        queries = self._normalize(np.asarray(queries, dtype=np.float32).reshape(-1, self.dim))
+        matrix, user_ids = self._buffers
+        size = min(self._size, matrix.shape[0])
+        if size == 0:
+            return [[] for _ in range(len(queries))]
+        scores = queries @ matrix[:size].T
+        ids = user_ids[:size]
+        if self._free:
+            scores[:, ids < 0] = -np.inf
+        shortlist = min(k * self.rows_per_user, size)
+        if shortlist < size:
+            top = np.argpartition(-scores, shortlist - 1, axis=1)[:, :shortlist]
+        else:
+            top = np.broadcast_to(np.arange(size), scores.shape)
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind="stable")
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+        return [self._best_per_user(ids, row, row_scores, k) for row, row_scores in zip(top, top_scores)]
+
+
+class QuantizedGalleryIndex(GalleryIndex):
+    """
+    GalleryIndex that keeps only int8 or product-quantized codes resident.
+
+    The codes shortlist the ``rerank`` best candidates, which are then re-scored exactly
+    against float32 rows held in a file-backed map. Buffers are (codes, user_ids, rows,
+    quantizer) so a retrained quantizer is swapped together with the codes it produced.
+    """
+
+    def __init__(
+        self,
+        model_version: str = "facenet_v1",
+        dim: int | None = None,
+        initial_capacity: int = 1024,
+        compression: str = "int8",
+        rerank: int = 32,
+        store_dir: Optional[str] = None,
+        pq_subvectors: int = 64,
+        max_templates: int | None = None,
+        template_mode: str | None = None,
+    ):
+        super().__init__(model_version, dim, initial_capacity=1, max_templates=max_templates, template_mode=template_mode)
+        if compression not in ("int8", "pq"):
+            raise ValueError(f"Unknown gallery compression: {compression}")
+        self.compression = compression
+        self.rerank = rerank
+        self.store_dir = store_dir
+        self.pq_subvectors = pq_subvectors
+        self._buffers = self._empty_buffers(initial_capacity, self._new_quantizer())
+
+    def _new_quantizer(self) -> Int8Quantizer | ProductQuantizer:
+        if self.compression == "pq":
+            return ProductQuantizer(self.dim, subvectors=self.pq_subvectors)
+        return Int8Quantizer(self.dim)
+
+    def _empty_buffers(self, capacity: int, quantizer) -> tuple:
+        return (
+            np.zeros((capacity, *quantizer.code_shape), dtype=quantizer.code_dtype),
+            np.full(capacity, -1, dtype=np.int64),
+            mapped_rows(capacity, self.dim, self.store_dir),
+            quantizer,
+        )
+
+    def _build_buffers(self, rows: np.ndarray, capacity: int) -> tuple:
+        quantizer = self._new_quantizer()
+        quantizer.fit(rows)
+        buffers = self._empty_buffers(capacity, quantizer)
+        buffers[0][: len(rows)] = quantizer.encode(rows)
+        buffers[2][: len(rows)] = rows
+        return buffers
+
+    def _grow(self) -> None:
+        codes, ids, rows, quantizer = self._buffers
+        grown = self._empty_buffers(codes.shape[0] * 2, quantizer)
+        grown[0][: self._size] = codes[: self._size]
+        grown[1][: self._size] = ids[: self._size]
+        grown[2][: self._size] = rows[: self._size]
+        self._buffers = grown
+
+    def _write_row(self, pos: int, row: Optional[np.ndarray]) -> None:
+        codes, _, rows, quantizer = self._buffers
+        if row is None:
+            codes[pos] = 0
+            rows[pos] = 0.0
+        else:
+            # Rows added after a load reuse its codebook until the gallery outgrows it
+            codes[pos] = quantizer.encode(row[None])[0]
+            rows[pos] = row
+            size = max(self._size, pos + 1)
+            if quantizer.stale(size - len(self._free)):
+                self._refit(size)
+
+    def _refit(self, size: int) -> None:
+        # Caller holds the lock. Fits on the live rows, then re-encodes every row; searches
+        # keep the codes and quantizer they started with, as the buffers swap together
+        codes, ids, rows, _ = self._buffers
+        live = np.ones(size, dtype=bool)
+        live[[pos for pos in self._free if pos < size]] = False
+        quantizer = self._new_quantizer()
+        quantizer.fit(np.asarray(rows[:size][live]))
+        refitted = np.zeros_like(codes)
+        refitted[:size] = quantizer.encode(np.asarray(rows[:size]))
+        self._buffers = (refitted, ids, rows, quantizer)
+
+    def _gather_rows(self, positions: np.ndarray) -> np.ndarray:
+        # Exact float rows from the file-backed map
+        return np.asarray(self._buffers[2][positions])
+
+    def export_arrays(self) -> tuple[np.ndarray, np.ndarray]:
+        with self._lock:
+            _, user_ids, rows, _ = self._buffers
+            ids = user_ids[: self._size]
+            live = ids >= 0
+            return ids[live].copy(), np.asarray(rows[: self._size][live])
+
+    def memory_bytes(self) -> int:
+        codes, ids, _, quantizer = self._buffers
+        # Resident footprint; the float rows live in the file-backed map
+        return codes.nbytes + ids.nbytes + quantizer.nbytes
+
+    def search_batch(self, queries: np.ndarray, k: int = 1) -> list[list[tuple[int, float]]]:
+        queries = self._normalize(np.asarray(queries, dtype=np.float32).reshape(-1, self.dim))
+        codes, user_ids, rows, quantizer = self._buffers
+        size = min(self._size, codes.shape[0])
+        if size == 0:
+            return [[] for _ in range(len(queries))]
+        ids = user_ids[:size]
+        shortlist = min(max(self.rerank, k * self.rows_per_user), size)
+        if not quantizer.trained:
+            # No usable codebook yet (a small or freshly started gallery): score every row exactly
+            shortlist = size
+        if shortlist < size:
+            approx = quantizer.scores(queries, codes[:size])
+            if self._free:
+                approx[:, ids < 0] = -np.inf
+            candidates = np.argpartition(-approx, shortlist - 1, axis=1)[:, :shortlist]
+        else:
+            candidates = np.broadcast_to(np.arange(size), (len(queries), size))
+        results = []
+        for query, row in zip(queries, candidates):
+            row = np.sort(row[ids[row] >= 0])
+            exact = np.asarray(rows[row]) @ query
+            order = np.argsort(-exact, kind="stable")
+            results.append(self._best_per_user(ids, row[order], exact[order], k))
+        return results
+
+
+class DatabaseGallery:
+    """
+    Same search interface as GalleryIndex, answered by pgvector instead of process memory.
+    """
+
+    def __init__(self, repository: "EmbeddingRepository", model_version: str = "facenet_v1"):
+        self.repository = repository
+        self.model_version = model_version
+
+    def __len__(self) -> int:
+        return self.repository.count_embeddings(self.model_version)
+
+    def search(self, query: np.ndarray, k: int = 1) -> list[tuple[int, float]]:
+        return self.repository.nearest_embeddings(query, self.model_version, k)
+
+    def search_batch(self, queries: np.ndarray, k: int = 1) -> list[list[tuple[int, float]]]:
+        return [self.search(query, k) for query in queries]
+
+    def search_users(self, query: np.ndarray, user_ids: Iterable[int], k: int = 1) -> list[tuple[int, float]]:
+        return self.repository.nearest_embeddings(query, self.model_version, k, user_ids=list(user_ids))
+
+    def set_templates(self, user_id: int, vectors: np.ndarray) -> None:
+        # Rows are already in the table the search runs against
+        pass
+
+    def upsert(self, user_id: int, vector: np.ndarray) -> None:
+        pass
+
+    def sync_users(self, user_ids: Iterable[int], templates: Iterable[tuple[int, Sequence[float]]]) -> None:
+        pass
+
+    def remove(self, user_id: int) -> None:
+        pass
+
+
+@lru_cache(maxsize=None)
+def get_gallery_index(model_version: str) -> GalleryIndex:
+    settings = get_settings()
+    if settings.gallery_compression != "none":
+        return QuantizedGalleryIndex(
+            model_version=model_version,
+            compression=settings.gallery_compression,
+            rerank=settings.gallery_rerank_candidates,
+            store_dir=settings.gallery_float_store_dir,
+            pq_subvectors=settings.pq_subvectors,
+        )
+    return GalleryIndex(model_version=model_version)
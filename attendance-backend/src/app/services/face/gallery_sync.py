@@ -0,0 +1,105 @@
+import json
+import logging
+import select
+import threading
+from typing import Callable, Optional
+
+import psycopg
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+
+from app.core.metrics import metrics
+from app.repositories.embedding_repository import GALLERY_CHANNEL, EmbeddingRepository
+from app.services.face.gallery import GalleryIndex
+from app.services.face.snapshot import populate_gallery
+
+logger = logging.getLogger(__name__)
+
+
+class GallerySubscriber:
+    """
+    Keeps this worker's GalleryIndex in step with writes from every other worker and replica.
+
+    Listens on the gallery NOTIFY channel; each message names the changed users and carries
+    the next gallery version. Changed users are re-read and upserted or dropped, so replaying
+    a message is harmless. A version gap or a lost listener connection triggers a full resync.
+    """
+
+    def __init__(
+        self,
+        gallery: GalleryIndex,
+        session_factory: Callable[[], Session],
+        dsn: Optional[str] = None,
+        reconnect_seconds: float = 1.0,
+    ):
+        self.gallery = gallery
+        self.session_factory = session_factory
+        self.dsn = dsn
+        self.reconnect_seconds = reconnect_seconds
+        self.version = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_url(cls, gallery: GalleryIndex, session_factory: Callable[[], Session], database_url: str) -> "GallerySubscriber":
+        # psycopg wants a plain libpq URL, not the SQLAlchemy "+psycopg" dialect form
+        dsn = make_url(database_url).set(drivername="postgresql").render_as_string(hide_password=False)
+        return cls(gallery, session_factory, dsn)
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="gallery-subscriber", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def resync(self) -> None:
+        with self.session_factory() as db:
+            repo = EmbeddingRepository(db)
+            # Read the version first: everything up to it is in the load that follows
+            version = repo.gallery_version()
+            populate_gallery(self.gallery, repo)
+        self.version = version
+        metrics.incr("gallery_sync.resyncs")
+        logger.info("Gallery resynced at version %d with %d rows", version, len(self.gallery))
+
+    def handle(self, payload: str) -> None:
+        message = json.loads(payload)
+        version = message["version"]
+        if version <= self.version:
+            return
+        if version != self.version + 1:
+            logger.warning("Gallery change gap: at version %d, received %d", self.version, version)
+            self.resync()
+            return
+        model_version = message.get("model_version")
+        if model_version in (None, self.gallery.model_version):
+            self.apply(message["user_ids"])
+        self.version = version
+
+    def apply(self, user_ids: list[int]) -> None:
+        with self.session_factory() as db:
+            rows = [(row.user_id, row.vector) for row in EmbeddingRepository(db).list_for_users(self.gallery.model_version, user_ids)]
+        # Deleted, deactivated or template-less users have no rows and are dropped
+        self.gallery.sync_users(user_ids, rows)
+        metrics.incr("gallery_sync.applied")
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                with psycopg.connect(self.dsn, autocommit=True) as conn:
+                    conn.add_notify_handler(lambda notify: self.handle(notify.payload))
+                    conn.execute(f"LISTEN {GALLERY_CHANNEL}")
+                    # Anything committed while no listener was attached is only visible via a reload
+                    self.resync()
+                    while not self._stop.is_set():
+                        readable, _, _ = select.select([conn.fileno()], [], [], self.reconnect_seconds)
+                        if readable:
+                            # Notifications are dispatched to the handler while a statement runs
+                            conn.execute("SELECT 1")
+            except Exception:
+                logger.exception("Gallery subscriber lost its connection, reconnecting")
+                metrics.incr("gallery_sync.reconnects")
+                self._stop.wait(self.reconnect_seconds)
@@ -5,6 +5,20 @@ import cv2
 import numpy as np
 from PIL import Image
 
+from app.config import get_settings
+from app.services.face.frame import to_frame
+
+# Neighbour offsets (dy, dx) into the edge-padded image, from the most significant bit down:
+# top-left, top, top-right, right, bottom-right, bottom, bottom-left, left
+_LBP_NEIGHBOURS = ((0, 0), (0, 1), (0, 2), (1, 2), (2, 2), (2, 1), (2, 0), (1, 0))
+
+
+def variance_of_laplacian(gray: np.ndarray) -> float:
+    """
+    Focus measure: low values mean a blurry (or flat) image.
+    """
+    return cv2.Laplacian(gray, cv2.CV_64F).var()
+
 
 @dataclass
 class LivenessResult:
@@ -18,36 +32,32 @@ class LivenessService:
     Basic texture-based liveness with clear extension hooks for advanced models.
     """
 
-    def __init__(self, texture_threshold: float = 50.0, blur_threshold: float = 30.0):
+    def __init__(self, texture_threshold: float = 50.0, blur_threshold: float = 30.0, lbp_size: int | None = None):
         # Lowered thresholds to be less strict for enrollment
         self.texture_threshold = texture_threshold
         self.blur_threshold = blur_threshold
+        # Fixed working resolution for LBP (0 = native) so cost does not grow with the camera
+        self.lbp_size = get_settings().liveness_lbp_size if lbp_size is None else lbp_size
 
     def _variance_of_laplacian(self, gray: np.ndarray) -> float:
-        return cv2.Laplacian(gray, cv2.CV_64F).var()
+        return variance_of_laplacian(gray)
 
     def _lbp_histogram(self, gray: np.ndarray) -> np.ndarray:
-        lbp = np.zeros_like(gray)
+        if self.lbp_size and gray.shape != (self.lbp_size, self.lbp_size):
+            gray = cv2.resize(gray, (self.lbp_size, self.lbp_size), interpolation=cv2.INTER_AREA)
+        height, width = gray.shape
         padded = np.pad(gray, pad_width=1, mode="edge")
-        for i in range(1, padded.shape[0] - 1):
-            for j in range(1, padded.shape[1] - 1):
-                center = padded[i, j]
-                binary = (
-                    (padded[i - 1, j - 1] > center) << 7
-                    | (padded[i - 1, j] > center) << 6
-                    | (padded[i - 1, j + 1] > center) << 5
-                    | (padded[i, j + 1] > center) << 4
-                    | (padded[i + 1, j + 1] > center) << 3
-                    | (padded[i + 1, j] > center) << 2
-                    | (padded[i + 1, j - 1] > center) << 1
-                    | (padded[i, j - 1] > center)
-                )
-                lbp[i - 1, j - 1] = binary
-        hist, _ = np.histogram(lbp.ravel(), bins=256, range=(0, 256), density=True)
-        return hist
-
-    def evaluate(self, frame: Image.Image) -> LivenessResult:
-        gray = cv2.cvtColor(np.array(frame), cv2.COLOR_RGB2GRAY)
+        center = padded[1:-1, 1:-1]
+        lbp = np.zeros((height, width), dtype=np.uint8)
+        bit = np.empty((height, width), dtype=np.bool_)
+        for shift, (dy, dx) in zip(range(7, -1, -1), _LBP_NEIGHBOURS):
+            np.greater(padded[dy : dy + height, dx : dx + width], center, out=bit)
+            lbp |= bit.view(np.uint8) << shift
+        # Same as np.histogram(..., bins=256, range=(0, 256), density=True) for unit-width bins
+        return np.bincount(lbp.ravel(), minlength=256) / lbp.size
+
+    def evaluate(self, frame: np.ndarray | Image.Image) -> LivenessResult:
+        gray = cv2.cvtColor(to_frame(frame), cv2.COLOR_RGB2GRAY)
         blur = self._variance_of_laplacian(gray)
         texture_hist = self._lbp_histogram(gray)
         texture_score = float(np.var(texture_hist) * 1000)
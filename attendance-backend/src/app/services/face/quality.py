@@ -0,0 +1,113 @@
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional, Sequence
+
+import cv2
+import numpy as np
+
+from app.config import get_settings
+from app.core.metrics import metrics
+from app.services.face.liveness import variance_of_laplacian
+
+
+@dataclass
+class QualityResult:
+    score: float
+    accepted: bool
+    # "ok", or the first failed check: low_confidence, too_small, too_dark, too_bright, low_contrast, blurry
+    reason: str
+    sharpness: float
+    brightness: float
+    contrast: float
+
+
+class QualityScorer:
+    """
+    Cheap checks on a detected crop, run before liveness and embedding.
+
+    A face that fails any threshold is rejected with a reason code, saving the
+    InceptionResnetV1 pass it would otherwise waste. ``score`` (0..1) ranks crops,
+    e.g. to keep the best frame of a burst. Zero thresholds disable a check.
+    """
+
+    def __init__(
+        self,
+        min_face_size: int = 0,
+        min_sharpness: float = 0.0,
+        min_brightness: float = 0.0,
+        max_brightness: float = 255.0,
+        min_contrast: float = 0.0,
+        min_detection_probability: float = 0.0,
+    ):
+        self.min_face_size = min_face_size
+        self.min_sharpness = min_sharpness
+        self.min_brightness = min_brightness
+        self.max_brightness = max_brightness
+        self.min_contrast = min_contrast
+        self.min_detection_probability = min_detection_probability
+
+    @classmethod
+    def from_settings(cls) -> "QualityScorer":
+        settings = get_settings()
+        if not settings.quality_gating_enabled:
+            return cls()
+        return cls(
+            min_face_size=settings.quality_min_face_size,
+            min_sharpness=settings.quality_min_sharpness,
+            min_brightness=settings.quality_min_brightness,
+            max_brightness=settings.quality_max_brightness,
+            min_contrast=settings.quality_min_contrast,
+            min_detection_probability=settings.quality_min_detection_probability,
+        )
+
+    def evaluate(self, face: np.ndarray, probability: Optional[float] = None) -> QualityResult:
+        gray = cv2.cvtColor(face, cv2.COLOR_RGB2GRAY)
+        side = min(gray.shape)
+        sharpness = float(variance_of_laplacian(gray))
+        brightness = float(gray.mean())
+        contrast = float(gray.std())
+        probability = 1.0 if probability is None else float(probability)
+
+        checks = (
+            ("low_confidence", probability < self.min_detection_probability),
+            ("too_small", side < self.min_face_size),
+            ("too_dark", brightness < self.min_brightness),
+            ("too_bright", brightness > self.max_brightness),
+            ("low_contrast", contrast < self.min_contrast),
+            ("blurry", sharpness < self.min_sharpness),
+        )
+        reason = next((code for code, failed in checks if failed), "ok")
+
+        # Each factor saturates at 1 comfortably above its threshold
+        score = (
+            probability
+            * min(1.0, side / max(2 * self.min_face_size, 80))
+            * min(1.0, sharpness / max(4 * self.min_sharpness, 100.0))
+            * min(1.0, contrast / max(3 * self.min_contrast, 40.0))
+            * (1.0 - abs(brightness - 128.0) / 128.0) ** 0.5
+        )
+        return QualityResult(score, reason == "ok", reason, sharpness, brightness, contrast)
+
+    def gate(self, face: np.ndarray, probability: Optional[float] = None) -> QualityResult:
+        return self.record(self.evaluate(face, probability))
+
+    @staticmethod
+    def record(result: QualityResult) -> QualityResult:
+        # A rejected crop is an embedding that never ran
+        if not result.accepted:
+            metrics.incr("quality.skipped_inference")
+            metrics.incr(f"quality.rejected.{result.reason}")
+        return result
+
+    def best(self, faces: Sequence[np.ndarray], probabilities: Sequence[Optional[float]]) -> tuple[int, QualityResult]:
+        """
+        Index and result of the highest-scoring crop, preferring accepted ones.
+        """
+        results = [self.evaluate(face, probability) for face, probability in zip(faces, probabilities)]
+        index = max(range(len(results)), key=lambda i: (results[i].accepted, results[i].score))
+        return index, results[index]
+
+
+@lru_cache(maxsize=1)
+def get_quality_scorer() -> QualityScorer:
+    return QualityScorer.from_settings()
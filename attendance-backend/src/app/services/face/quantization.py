@@ -0,0 +1,158 @@
+import os
+import tempfile
+from typing import Optional
+
+import numpy as np
+
+# Compressed encodings for the in-memory gallery. Both quantizers score float queries
+# directly against the codes (asymmetric distance), so only the gallery side loses precision.
+
+# Rows scored per step, so a scan never materializes a float copy of the whole gallery
+_SCAN_ROWS = 16384
+
+
+class Int8Quantizer:
+    """
+    Per-dimension symmetric int8 scalar quantization: 4x smaller than float32.
+    """
+
+    def __init__(self, dim: int):
+        self.dim = dim
+        # Covers any unit vector until fitted
+        self.scale = np.full(dim, 1.0 / 127.0, dtype=np.float32)
+        self.code_shape: tuple[int, ...] = (dim,)
+        self.code_dtype = np.int8
+        self.fitted_on = 0
+
+    @property
+    def nbytes(self) -> int:
+        return self.scale.nbytes
+
+    @property
+    def trained(self) -> bool:
+        return True
+
+    def stale(self, rows: int) -> bool:
+        # The default scale spends few levels on unit-vector components, and rows beyond a
+        # fitted range are clipped: fit at 256 rows, then again each time the gallery doubles
+        return rows >= max(2 * self.fitted_on, 256)
+
+    def fit(self, vectors: np.ndarray) -> None:
+        if len(vectors):
+            limit = np.abs(vectors).max(axis=0)
+            self.scale = (np.maximum(limit, 1e-6) / 127.0).astype(np.float32)
+            self.fitted_on = len(vectors)
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        return np.clip(np.rint(vectors / self.scale), -127, 127).astype(np.int8)
+
+    def scores(self, queries: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        scaled = queries * self.scale
+        out = np.empty((len(queries), len(codes)), dtype=np.float32)
+        for start in range(0, len(codes), _SCAN_ROWS):
+            block = codes[start : start + _SCAN_ROWS].astype(np.float32)
+            out[:, start : start + len(block)] = scaled @ block.T
+        return out
+
+
+class ProductQuantizer:
+    """
+    Splits vectors into ``subvectors`` chunks and stores each as the id of its nearest
+    k-means centroid: one byte per chunk, 64 bytes for a 512-d embedding at the default.
+    """
+
+    def __init__(self, dim: int, subvectors: int = 64, centroids: int = 256, iterations: int = 10, sample_size: int = 25000, seed: int = 0):
+        if dim % subvectors:
+            raise ValueError(f"Embedding dim {dim} is not divisible by {subvectors} subvectors")
+        self.dim = dim
+        self.subvectors = subvectors
+        self.sub_dim = dim // subvectors
+        self.centroids = centroids
+        self.iterations = iterations
+        self.sample_size = sample_size
+        self.seed = seed
+        self.codebooks = np.zeros((subvectors, 1, self.sub_dim), dtype=np.float32)
+        self.code_shape: tuple[int, ...] = (subvectors,)
+        self.code_dtype = np.uint8
+        self.fitted_on = 0
+
+    @property
+    def nbytes(self) -> int:
+        return self.codebooks.nbytes
+
+    @property
+    def trained(self) -> bool:
+        # A codebook fitted on fewer rows than centroids only knows those rows
+        return self.codebooks.shape[1] == self.centroids
+
+    def stale(self, rows: int) -> bool:
+        """
+        Whether a gallery grown to ``rows`` rows should refit: a full codebook once there are
+        enough rows for one, then again each time the gallery doubles, up to ``sample_size``.
+        """
+        if not self.trained:
+            return rows >= self.centroids
+        return self.fitted_on < self.sample_size and rows >= 2 * self.fitted_on
+
+    def _split(self, vectors: np.ndarray) -> np.ndarray:
+        # (n, dim) -> (subvectors, n, sub_dim), contiguous so each subspace matmul is dense
+        return np.ascontiguousarray(vectors.reshape(len(vectors), self.subvectors, self.sub_dim).transpose(1, 0, 2))
+
+    def fit(self, vectors: np.ndarray) -> None:
+        if not len(vectors):
+            return
+        self.fitted_on = len(vectors)
+        rng = np.random.default_rng(self.seed)
+        if len(vectors) > self.sample_size:
+            vectors = vectors[rng.choice(len(vectors), self.sample_size, replace=False)]
+        parts = self._split(np.asarray(vectors, dtype=np.float32))
+        k = min(self.centroids, len(vectors))
+        codebooks = parts[:, rng.choice(len(vectors), k, replace=False)].copy()
+        for _ in range(self.iterations):
+            assign = self._assign(parts, codebooks)
+            for j in range(self.subvectors):
+                counts = np.bincount(assign[j], minlength=k)
+                sums = np.stack([np.bincount(assign[j], weights=parts[j][:, d], minlength=k) for d in range(self.sub_dim)], axis=1)
+                used = counts > 0
+                # Empty clusters keep their previous centroid
+                codebooks[j, used] = sums[used] / counts[used, None]
+        self.codebooks = codebooks
+
+    @staticmethod
+    def _assign(parts: np.ndarray, codebooks: np.ndarray) -> np.ndarray:
+        # argmin ||x - c||^2 == argmax (x.c - ||c||^2 / 2); one subspace at a time bounds memory
+        half_norms = 0.5 * np.einsum("skd,skd->sk", codebooks, codebooks)
+        return np.stack([(part @ book.T - norms).argmax(axis=1) for part, book, norms in zip(parts, codebooks, half_norms)])
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        codes = np.empty((len(vectors), self.subvectors), dtype=np.uint8)
+        for start in range(0, len(vectors), _SCAN_ROWS):
+            block = self._split(vectors[start : start + _SCAN_ROWS])
+            codes[start : start + block.shape[1]] = self._assign(block, self.codebooks).T
+        return codes
+
+    def scores(self, queries: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        # Lookup table of query-chunk . centroid products; a score is a sum of m lookups
+        table = np.einsum("sqd,skd->qsk", self._split(queries), self.codebooks)
+        k = self.codebooks.shape[1]
+        flat = table.reshape(len(queries), -1)
+        offsets = np.arange(self.subvectors) * k
+        out = np.empty((len(queries), len(codes)), dtype=np.float32)
+        step = max(1024, (1 << 22) // max(1, len(queries) * self.subvectors))
+        for start in range(0, len(codes), step):
+            block = codes[start : start + step].astype(np.intp) + offsets
+            out[:, start : start + len(block)] = flat[:, block].sum(axis=2)
+        return out
+
+
+def mapped_rows(capacity: int, dim: int, directory: Optional[str] = None) -> np.memmap:
+    """
+    File-backed float32 rows: only the pages touched by re-ranking stay resident.
+    """
+    handle, path = tempfile.mkstemp(prefix="gallery-", suffix=".f32", dir=directory or None)
+    os.close(handle)
+    rows = np.memmap(path, dtype=np.float32, mode="w+", shape=(capacity, dim))
+    # The mapping keeps the data reachable; the name is not needed after this
+    os.unlink(path)
+    return rows
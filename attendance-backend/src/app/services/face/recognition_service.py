@@ -1,17 +1,27 @@
-import io
-from dataclasses import dataclass
-from typing import Optional
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator, Optional, Sequence
 
 import numpy as np
-from PIL import Image
 
 from app.config import get_settings
-from app.core.errors import FaceNotDetected, SpoofDetected
+from app.core.errors import FaceNotDetected, LowQualityFrame, SpoofDetected
+from app.core.metrics import metrics
 from app.core.security import decrypt_bytes, encrypt_bytes
 from app.db.models import FaceEmbedding
+from app.services.face.backends import model_version_for
 from app.services.face.detector import FaceDetector
 from app.services.face.embedder import FaceEmbedder
+from app.services.face.frame import decode_frame, face_area
+from app.services.face.gallery import DatabaseGallery, GalleryIndex
 from app.services.face.liveness import LivenessResult, LivenessService
+from app.services.face.quality import QualityResult, QualityScorer
+
+
+# Embeddings from different backends are kept apart; the tag records which one produced them
+BASE_MODEL_VERSION = "facenet_v1"
+MODEL_VERSION = model_version_for(BASE_MODEL_VERSION, get_settings().inference_backend, get_settings().inference_quantize)
 
 
 @dataclass
@@ -19,18 +29,50 @@ class MatchResult:
     user_id: int
     score: float
     liveness: Optional[LivenessResult]
+    # Query embedding, kept for adaptive template updates
+    embedding: Optional[np.ndarray] = field(default=None, repr=False)
+    # "roster" when the kiosk's roster produced a confident match, else "gallery"
+    matched_via: str = "gallery"
+    timings: dict[str, float] = field(default_factory=dict)
+
+
+@dataclass
+class GroupMatchResult:
+    faces_detected: int
+    matches: list[MatchResult] = field(default_factory=list)
+    rejected: list[str] = field(default_factory=list)
+
+
+@contextmanager
+def _timed(timings: Optional[dict[str, float]], stage: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = (time.perf_counter() - started) * 1000
+        metrics.observe(f"scan.{stage}_ms", elapsed)
+        if timings is not None:
+            timings[stage] = round(elapsed, 3)
 
 
 class FaceRecognitionService:
-    def __init__(self, detector: FaceDetector | None = None, embedder: FaceEmbedder | None = None, liveness: LivenessService | None = None):
+    def __init__(
+        self,
+        detector: FaceDetector | None = None,
+        embedder: FaceEmbedder | None = None,
+        liveness: LivenessService | None = None,
+        quality: QualityScorer | None = None,
+    ):
         self.settings = get_settings()
         self.detector = detector or FaceDetector()
         self.embedder = embedder or FaceEmbedder()
         self.liveness = liveness or LivenessService()
-        self.model_version = "facenet_v1"
+        # Without thresholds the scorer still ranks crops but rejects nothing
+        self.quality = quality or QualityScorer()
+        self.model_version = MODEL_VERSION
 
-    def _load_image(self, file_bytes: bytes) -> Image.Image:
-        return Image.open(io.BytesIO(file_bytes)).convert("RGB")
+    def _load_image(self, file_bytes: bytes) -> np.ndarray:
+        return decode_frame(file_bytes, max_side=self.settings.max_decode_side)
 
     def register(self, file_bytes: bytes, strict_liveness: bool = True) -> tuple[np.ndarray, LivenessResult]:
         image = self._load_image(file_bytes)
@@ -38,41 +80,165 @@ class FaceRecognitionService:
         if not faces:
             raise FaceNotDetected()
         # Select largest face
-        face = sorted(faces, key=lambda f: f.size[0] * f.size[1], reverse=True)[0]
+        face = max(faces, key=face_area)
         live_result = self.liveness.evaluate(face)
         if strict_liveness and not live_result.is_live:
             raise SpoofDetected(live_result.reason)
         embedding = self.embedder.embed(face)
         return embedding, live_result
 
-    def find_match(self, file_bytes: bytes, embeddings: list[FaceEmbedding]) -> MatchResult:
-        image = self._load_image(file_bytes)
-        faces = self.detector.detect(image)
+    def embed_largest_face(self, file_bytes: bytes) -> np.ndarray:
+        """
+        Enrollment path: detect and embed the largest face without a liveness check.
+        """
+        faces = self.detector.detect(self._load_image(file_bytes))
+        if not faces:
+            raise FaceNotDetected(
+                "No face detected in image. Please upload a clear image with a visible face looking at the camera."
+            )
+        return self.embedder.embed(max(faces, key=face_area))
+
+    def analyze(self, file_bytes: bytes, timings: Optional[dict[str, float]] = None) -> tuple[np.ndarray, LivenessResult]:
+        """
+        CPU-bound half of a scan (decode, detect, quality, liveness, embed); no database access.
+        """
+        with _timed(timings, "decode"):
+            image = self._load_image(file_bytes)
+        with _timed(timings, "detect"):
+            faces, probabilities = self.detector.detect_scored(image)
         if not faces:
             raise FaceNotDetected()
         face = faces[0]
-        live_result = self.liveness.evaluate(face)
+        with _timed(timings, "quality"):
+            quality = self.quality.gate(face, probabilities[0])
+        return self._verify_and_embed(face, quality, timings)
+
+    def analyze_burst(self, frames: Sequence[bytes], timings: Optional[dict[str, float]] = None) -> tuple[np.ndarray, LivenessResult]:
+        """
+        ``analyze`` for several captures of one person: only the best-quality face is embedded.
+        """
+        with _timed(timings, "decode"):
+            images = [self._load_image(data) for data in frames]
+        with _timed(timings, "detect"):
+            detections = self.detector.detect_batch_scored(images)
+        # The largest face in each frame is the person at the kiosk
+        candidates = [max(zip(faces, probabilities), key=lambda pair: face_area(pair[0])) for faces, probabilities in detections if faces]
+        if not candidates:
+            raise FaceNotDetected()
+        with _timed(timings, "quality"):
+            index, quality = self.quality.best([face for face, _ in candidates], [probability for _, probability in candidates])
+        metrics.incr("quality.burst_frames_skipped", len(frames) - 1)
+        return self._verify_and_embed(candidates[index][0], self.quality.record(quality), timings)
+
+    def _verify_and_embed(
+        self, face: np.ndarray, quality: QualityResult, timings: Optional[dict[str, float]]
+    ) -> tuple[np.ndarray, LivenessResult]:
+        if not quality.accepted:
+            raise LowQualityFrame(quality.reason)
+        with _timed(timings, "liveness"):
+            live_result = self.liveness.evaluate(face)
         if not live_result.is_live:
             raise SpoofDetected(live_result.reason)
-        query_embedding = self.embedder.embed(face)
-        query_embedding = query_embedding / np.linalg.norm(query_embedding)
-
-        best_score = -1.0
-        best_user_id = None
-        for stored in embeddings:
-            stored_vec = np.array(stored.vector)
-            stored_vec = stored_vec / np.linalg.norm(stored_vec)
-            score = float(np.dot(query_embedding, stored_vec))
-            if score > best_score:
-                best_score = score
-                best_user_id = stored.user_id
-
-        if best_user_id is None:
+        with _timed(timings, "embed"):
+            embedding = self.embedder.embed(face)
+        return embedding, live_result
+
+    def match(
+        self,
+        query_embedding: np.ndarray,
+        live_result: LivenessResult,
+        gallery: GalleryIndex | DatabaseGallery,
+        roster: Optional[Iterable[int]] = None,
+        timings: Optional[dict[str, float]] = None,
+    ) -> MatchResult:
+        """
+        Search ``roster`` (the kiosk's expected or recent users) first and accept its best hit
+        if it clears similarity_threshold by roster_accept_margin; otherwise search the gallery.
+        """
+        timings = {} if timings is None else timings
+        if roster:
+            with _timed(timings, "roster_search"):
+                candidates = gallery.search_users(query_embedding, roster, k=1)
+            if candidates and candidates[0][1] >= self.settings.similarity_threshold + self.settings.roster_accept_margin:
+                metrics.incr("match.roster_hit")
+                user_id, score = candidates[0]
+                return MatchResult(user_id, score, live_result, embedding=query_embedding, matched_via="roster", timings=timings)
+            metrics.incr("match.roster_miss")
+
+        with _timed(timings, "gallery_search"):
+            candidates = gallery.search(query_embedding, k=1)
+        if not candidates:
             raise FaceNotDetected("No embeddings available")
 
-        return MatchResult(user_id=best_user_id, score=best_score, liveness=live_result)
+        best_user_id, best_score = candidates[0]
+        return MatchResult(best_user_id, best_score, live_result, embedding=query_embedding, timings=timings)
+
+    def find_match(
+        self,
+        file_bytes: bytes,
+        gallery: GalleryIndex | DatabaseGallery | Iterable[FaceEmbedding],
+        roster: Optional[Iterable[int]] = None,
+    ) -> MatchResult:
+        if not isinstance(gallery, (GalleryIndex, DatabaseGallery)):
+            gallery = GalleryIndex.from_embeddings(gallery, model_version=self.model_version)
+        timings: dict[str, float] = {}
+        query_embedding, live_result = self.analyze(file_bytes, timings)
+        return self.match(query_embedding, live_result, gallery, roster=roster, timings=timings)
+
+    def find_match_burst(
+        self,
+        frames: Sequence[bytes],
+        gallery: GalleryIndex | DatabaseGallery | Iterable[FaceEmbedding],
+        roster: Optional[Iterable[int]] = None,
+    ) -> MatchResult:
+        if not isinstance(gallery, (GalleryIndex, DatabaseGallery)):
+            gallery = GalleryIndex.from_embeddings(gallery, model_version=self.model_version)
+        timings: dict[str, float] = {}
+        query_embedding, live_result = self.analyze_burst(frames, timings)
+        return self.match(query_embedding, live_result, gallery, roster=roster, timings=timings)
+
+    def find_matches(self, file_bytes: bytes, gallery: GalleryIndex | DatabaseGallery | Iterable[FaceEmbedding]) -> GroupMatchResult:
+        """
+        Match every face in a group photo: one batched embedding pass and one gallery multiply.
+        """
+        if not isinstance(gallery, (GalleryIndex, DatabaseGallery)):
+            gallery = GalleryIndex.from_embeddings(gallery, model_version=self.model_version)
+        image = self._load_image(file_bytes)
+        faces, probabilities = self.detector.detect_scored(image)
+        if not faces:
+            raise FaceNotDetected()
+
+        result = GroupMatchResult(faces_detected=len(faces))
+        live_faces = []
+        live_results = []
+        for face, probability in zip(faces, probabilities):
+            quality = self.quality.gate(face, probability)
+            if not quality.accepted:
+                result.rejected.append(LowQualityFrame(quality.reason).detail)
+                continue
+            live_result = self.liveness.evaluate(face)
+            if live_result.is_live:
+                live_faces.append(face)
+                live_results.append(live_result)
+            else:
+                result.rejected.append(live_result.reason)
+        if not live_faces:
+            return result
+
+        embeddings = self.embedder.embed_batch(live_faces)
+        # The same person can only be matched once per photo; keep their best-scoring face
+        best: dict[int, MatchResult] = {}
+        for candidates, live_result, embedding in zip(gallery.search_batch(embeddings, k=1), live_results, embeddings):
+            if not candidates:
+                continue
+            user_id, score = candidates[0]
+            if user_id not in best or score > best[user_id].score:
+                best[user_id] = MatchResult(user_id=user_id, score=score, liveness=live_result, embedding=embedding)
+        result.matches = sorted(best.values(), key=lambda m: m.score, reverse=True)
+        return result
 
-    def encrypt_embedding(self, embedding: np.ndarray) -> bytes:
+    @staticmethod
+    def encrypt_embedding(embedding: np.ndarray) -> bytes:
         return encrypt_bytes(embedding.tobytes())
 
     def decrypt_embedding(self, encrypted: bytes) -> np.ndarray:
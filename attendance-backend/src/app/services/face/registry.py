@@ -0,0 +1,93 @@
+import logging
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Callable
+
+import numpy as np
+
+from app.config import get_settings
+from app.services.face.batching import BatchingDetector, BatchingEmbedder
+from app.services.face.detector import FaceDetector
+from app.services.face.embedder import FaceEmbedder
+from app.services.face.liveness import LivenessService
+
+logger = logging.getLogger(__name__)
+
+
+class ModelRegistry:
+    """
+    Process-wide holder for the face models so they are loaded once, not per request.
+
+    Inference on the loaded modules is read-only (eval mode), so the same instances
+    are shared by every worker thread; only construction is serialised.
+    """
+
+    def __init__(
+        self,
+        detector_factory: Callable[[], Any] = FaceDetector,
+        embedder_factory: Callable[[], Any] = FaceEmbedder,
+        liveness_factory: Callable[[], Any] = LivenessService,
+    ):
+        self._detector_factory = detector_factory
+        self._embedder_factory = embedder_factory
+        self._liveness_factory = liveness_factory
+        self._lock = threading.Lock()
+        self.detector = None
+        self.embedder = None
+        self.liveness = None
+        self.load_seconds: float | None = None
+        self.warmup_seconds: float | None = None
+        self.is_warm = False
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.detector is not None and self.embedder is not None and self.liveness is not None
+
+    def load(self, warmup: bool = True) -> "ModelRegistry":
+        if self.is_loaded and (self.is_warm or not warmup):
+            return self
+        with self._lock:
+            if not self.is_loaded:
+                started = time.perf_counter()
+                self.detector = self._detector_factory()
+                self.embedder = self._embedder_factory()
+                self.liveness = self._liveness_factory()
+                self.load_seconds = time.perf_counter() - started
+                settings = get_settings()
+                if settings.inference_batching_enabled:
+                    batch_size, wait_ms = settings.inference_max_batch_size, settings.inference_max_wait_ms
+                    self.detector = BatchingDetector(self.detector, batch_size, wait_ms)
+                    self.embedder = BatchingEmbedder(self.embedder, batch_size, wait_ms)
+                logger.info("Face models loaded in %.2fs", self.load_seconds)
+            if warmup and not self.is_warm:
+                self._warmup()
+        return self
+
+    def _warmup(self) -> None:
+        # One throwaway pass through each stage so lazy allocations and kernel
+        # selection happen at startup instead of on the first kiosk scan.
+        started = time.perf_counter()
+        frame = np.full((160, 160, 3), 128, dtype=np.uint8)
+        self.detector.detect(frame)
+        self.liveness.evaluate(frame)
+        self.embedder.embed(frame)
+        self.warmup_seconds = time.perf_counter() - started
+        self.is_warm = True
+        logger.info("Face models warmed up in %.2fs", self.warmup_seconds)
+
+    def status(self) -> dict:
+        return {
+            "loaded": self.is_loaded,
+            "warm": self.is_warm,
+            "load_seconds": self.load_seconds,
+            "warmup_seconds": self.warmup_seconds,
+            "batching": isinstance(self.embedder, BatchingEmbedder),
+            "backend": get_settings().inference_backend,
+            "quantized": get_settings().inference_quantize,
+        }
+
+
+@lru_cache(maxsize=1)
+def get_model_registry() -> ModelRegistry:
+    return ModelRegistry()
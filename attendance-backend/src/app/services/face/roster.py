@@ -0,0 +1,33 @@
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+from app.config import get_settings
+
+
+class RecentRoster:
+    """
+    Per-kiosk LRU of recently matched users, searched before the full gallery.
+    """
+
+    def __init__(self, size: int = 256):
+        self.size = size
+        self._lock = threading.Lock()
+        self._recent: dict[int, OrderedDict[int, None]] = {}
+
+    def remember(self, kiosk_id: int, user_id: int) -> None:
+        with self._lock:
+            recent = self._recent.setdefault(kiosk_id, OrderedDict())
+            recent[user_id] = None
+            recent.move_to_end(user_id)
+            while len(recent) > self.size:
+                recent.popitem(last=False)
+
+    def users(self, kiosk_id: int) -> list[int]:
+        with self._lock:
+            return list(self._recent.get(kiosk_id, ()))
+
+
+@lru_cache(maxsize=1)
+def get_recent_roster() -> RecentRoster:
+    return RecentRoster(size=get_settings().recent_roster_size)
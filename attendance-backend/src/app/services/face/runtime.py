@@ -0,0 +1,58 @@
+import logging
+import os
+
+import cv2
+import torch
+
+from app.config import Settings, get_settings
+
+logger = logging.getLogger(__name__)
+
+
+def available_cores() -> int:
+    # Respects cgroup/affinity limits (containers), unlike os.cpu_count()
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def configure_runtime(settings: Settings | None = None) -> dict:
+    """
+    Apply the per-worker thread budget to torch and OpenCV and log the resulting topology.
+
+    Every uvicorn worker is a separate process with its own torch pool; left at their
+    defaults, N workers each spin up one thread per core and fight over the CPU.
+    Must run before the first inference: torch fixes its inter-op pool on first use.
+    """
+    settings = settings or get_settings()
+    if settings.inference_intra_op_threads > 0:
+        torch.set_num_threads(settings.inference_intra_op_threads)
+    if settings.inference_inter_op_threads > 0:
+        try:
+            torch.set_num_interop_threads(settings.inference_inter_op_threads)
+        except RuntimeError:
+            logger.warning("torch inter-op pool already started; keeping %d threads", torch.get_num_interop_threads())
+    if settings.opencv_threads >= 0:
+        cv2.setNumThreads(settings.opencv_threads)
+
+    cores = available_cores()
+    topology = {
+        "cores": cores,
+        "workers": settings.web_concurrency,
+        "executor_workers": settings.inference_executor_workers,
+        "torch_threads": torch.get_num_threads(),
+        "torch_interop_threads": torch.get_num_interop_threads(),
+        "opencv_threads": cv2.getNumThreads(),
+        "backend": settings.inference_backend,
+    }
+    # Threads that can be busy at once across the host for this configuration
+    topology["peak_threads"] = settings.web_concurrency * settings.inference_executor_workers * topology["torch_threads"]
+    logger.info("Inference topology: %s", " ".join(f"{key}={value}" for key, value in topology.items()))
+    if topology["peak_threads"] > cores:
+        logger.warning(
+            "workers x executor_workers x torch_threads = %d exceeds %d cores; expect latency spikes under load",
+            topology["peak_threads"],
+            cores,
+        )
+    return topology
@@ -0,0 +1,205 @@
+import json
+import logging
+import mmap
+import os
+import struct
+import tempfile
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+
+from app.config import get_settings
+from app.repositories.embedding_repository import EmbeddingRepository
+from app.services.face.gallery import GalleryIndex
+
+logger = logging.getLogger(__name__)
+
+# File layout:
+#   MAGIC | u32 header length | header JSON (authenticated, not encrypted) | 8-byte nonce prefix
+#   then repeated: u32 ciphertext length | AES-GCM ciphertext of the next plaintext chunk
+# The plaintext is the int64 user_id array followed by the float32 (count x dim) matrix.
+MAGIC = b"GSNAP1\n"
+_CHUNK = 64 * 1024 * 1024
+# Rows committed slightly after the snapshot's newest updated_at can carry an older timestamp;
+# re-reading a window behind the high-water mark is cheap because upserts are idempotent.
+_HIGH_WATER_SLACK = timedelta(minutes=5)
+
+
+@dataclass
+class GallerySnapshot:
+    model_version: str
+    high_water: Optional[datetime]
+    user_ids: np.ndarray
+    matrix: np.ndarray
+    template_mode: str = "max"
+
+
+def _snapshot_key() -> bytes:
+    # Envelope-derived key: never reuse the Fernet key directly for a second cipher
+    return HKDF(algorithm=hashes.SHA256(), length=32, salt=None, info=b"gallery-snapshot-v1").derive(
+        get_settings().fernet_key.encode()
+    )
+
+
+def write_snapshot(
+    path: str | Path,
+    model_version: str,
+    user_ids: np.ndarray,
+    matrix: np.ndarray,
+    high_water: Optional[datetime],
+    template_mode: str = "max",
+) -> None:
+    user_ids = np.ascontiguousarray(user_ids, dtype=np.int64)
+    matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+    header = json.dumps(
+        {
+            "model_version": model_version,
+            "count": int(len(user_ids)),
+            "dim": int(matrix.shape[1]) if matrix.ndim == 2 else 0,
+            "high_water": high_water.isoformat() if high_water else None,
+            # Centroid galleries store one averaged row per user, not the templates
+            "template_mode": template_mode,
+        }
+    ).encode()
+    aes = AESGCM(_snapshot_key())
+    prefix = os.urandom(8)
+    payload = memoryview(user_ids.tobytes() + matrix.tobytes())
+
+    path = Path(path)
+    # A temp file of its own: workers sharing the snapshot path rewrite it at the same time
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as handle:
+            handle.write(MAGIC)
+            handle.write(struct.pack(">I", len(header)))
+            handle.write(header)
+            handle.write(prefix)
+            for index, start in enumerate(range(0, len(payload), _CHUNK)):
+                nonce = prefix + struct.pack(">I", index)
+                ciphertext = aes.encrypt(nonce, payload[start : start + _CHUNK], header)
+                handle.write(struct.pack(">I", len(ciphertext)))
+                handle.write(ciphertext)
+            handle.flush()
+            os.fsync(handle.fileno())
+        # Atomic swap so concurrently starting workers never read a half-written file
+        os.replace(tmp, path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+
+def read_snapshot(path: str | Path) -> GallerySnapshot:
+    tampered = False
+    with open(path, "rb") as handle, mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        view = memoryview(mapped)
+        try:
+            if bytes(view[: len(MAGIC)]) != MAGIC:
+                raise ValueError("Not a gallery snapshot")
+            offset = len(MAGIC)
+            (header_len,) = struct.unpack_from(">I", mapped, offset)
+            offset += 4
+            header = bytes(view[offset : offset + header_len])
+            offset += header_len
+            meta = json.loads(header)
+            prefix = bytes(view[offset : offset + 8])
+            offset += 8
+
+            count, dim = meta["count"], meta["dim"]
+            plaintext = bytearray(count * 8 + count * dim * 4)
+            aes = AESGCM(_snapshot_key())
+            written = 0
+            index = 0
+            while offset < len(mapped):
+                (length,) = struct.unpack_from(">I", mapped, offset)
+                offset += 4
+                # Decrypt straight from the mapped file, no intermediate read buffer
+                try:
+                    chunk = aes.decrypt(prefix + struct.pack(">I", index), view[offset : offset + length], header)
+                except InvalidTag:
+                    # Raised only after the map is closed: the live exception pins the buffer export
+                    tampered = True
+                    break
+                plaintext[written : written + len(chunk)] = chunk
+                written += len(chunk)
+                offset += length
+                index += 1
+        finally:
+            view.release()
+    if tampered:
+        raise InvalidTag()
+    if written != len(plaintext):
+        raise ValueError("Truncated gallery snapshot")
+
+    user_ids = np.frombuffer(plaintext, dtype=np.int64, count=count)
+    matrix = np.frombuffer(plaintext, dtype=np.float32, offset=count * 8).reshape(count, dim)
+    high_water = datetime.fromisoformat(meta["high_water"]) if meta["high_water"] else None
+    return GallerySnapshot(
+        model_version=meta["model_version"],
+        high_water=high_water,
+        user_ids=user_ids,
+        matrix=matrix,
+        template_mode=meta.get("template_mode", "max"),
+    )
+
+
+def _max_timestamp(current: Optional[datetime], value: Optional[datetime]) -> Optional[datetime]:
+    if value is None:
+        return current
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value if current is None or value > current else current
+
+
+def populate_gallery(gallery: GalleryIndex, repo: EmbeddingRepository, snapshot_path: Optional[str] = None) -> None:
+    """
+    Fill ``gallery`` from the snapshot plus rows changed since its high-water mark,
+    falling back to a full table read; the snapshot is rewritten whenever it was stale.
+    """
+    snapshot_path = get_settings().gallery_snapshot_path if snapshot_path is None else snapshot_path
+    snapshot = None
+    if snapshot_path and Path(snapshot_path).exists():
+        try:
+            snapshot = read_snapshot(snapshot_path)
+        except (InvalidTag, ValueError, KeyError, struct.error) as exc:
+            logger.warning("Ignoring unreadable gallery snapshot %s: %s", snapshot_path, exc)
+        if snapshot is not None and (
+            snapshot.model_version != gallery.model_version
+            or snapshot.matrix.shape[1] != gallery.dim
+            or snapshot.template_mode != gallery.template_mode
+        ):
+            snapshot = None
+
+    if snapshot is not None and snapshot.high_water is not None:
+        gallery.load_arrays(snapshot.user_ids, snapshot.matrix, normalized=True)
+        high_water = snapshot.high_water
+        changed_users = set()
+        for row in repo.list_embeddings_since(gallery.model_version, snapshot.high_water - _HIGH_WATER_SLACK):
+            changed_users.add(row.user_id)
+            high_water = _max_timestamp(high_water, row.updated_at)
+        if changed_users:
+            # A changed template reloads all of that user's templates
+            gallery.sync_users(changed_users, [(row.user_id, row.vector) for row in repo.list_for_users(gallery.model_version, changed_users)])
+        changed = len(changed_users)
+        removed = gallery.user_ids() - set(repo.list_user_ids(gallery.model_version))
+        for user_id in removed:
+            gallery.remove(user_id)
+        logger.info("Gallery loaded from snapshot: %d rows, %d changed, %d removed", len(gallery), changed, len(removed))
+        if changed or removed:
+            write_snapshot(snapshot_path, gallery.model_version, *gallery.export_arrays(), high_water=high_water, template_mode=gallery.template_mode)
+        return
+
+    user_ids, vectors, high_water = [], [], None
+    for row in repo.list_embeddings(model_version=gallery.model_version, active_only=True):
+        user_ids.append(row.user_id)
+        vectors.append(row.vector)
+        high_water = _max_timestamp(high_water, row.updated_at)
+    gallery.load_arrays(np.asarray(user_ids, dtype=np.int64), np.asarray(vectors, dtype=np.float32).reshape(-1, gallery.dim))
+    if snapshot_path and high_water is not None:
+        write_snapshot(snapshot_path, gallery.model_version, *gallery.export_arrays(), high_water=high_water, template_mode=gallery.template_mode)
@@ -0,0 +1,163 @@
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Callable, Optional
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.core.metrics import metrics
+from app.db.models import User
+from app.db.session import SessionLocal
+from app.repositories.audit_repository import AuditRepository
+from app.repositories.embedding_repository import EmbeddingRepository
+from app.services.face.gallery import get_gallery_index
+from app.services.face.recognition_service import MODEL_VERSION, FaceRecognitionService
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _Sample:
+    user_id: int
+    embedding: np.ndarray
+    score: float
+    liveness_score: Optional[int]
+
+
+class TemplateUpdater:
+    """
+    Folds embeddings from high-confidence, clearly-live scans back into users' templates.
+
+    ``offer`` runs on the request path and only filters and buffers (best sample per user).
+    A background thread writes the buffer every ``interval_seconds`` in one transaction,
+    with a per-user cooldown and a cap on updates per flush. In "template" mode a sample
+    is added as a template (evicting the most redundant one); in "ema" mode it nudges the
+    user's closest template by ``alpha``.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        min_score: float,
+        min_liveness: int = 80,
+        mode: str = "template",
+        alpha: float = 0.1,
+        interval_seconds: float = 300.0,
+        cooldown_seconds: float = 86400.0,
+        max_per_flush: int = 500,
+        model_version: str = MODEL_VERSION,
+    ):
+        if mode not in ("template", "ema"):
+            raise ValueError(f"Unknown template update mode: {mode}")
+        self.session_factory = session_factory
+        self.min_score = min_score
+        self.min_liveness = min_liveness
+        self.mode = mode
+        self.alpha = alpha
+        self.interval_seconds = interval_seconds
+        self.cooldown_seconds = cooldown_seconds
+        self.max_per_flush = max_per_flush
+        self.model_version = model_version
+        self._lock = threading.Lock()
+        self._pending: dict[int, _Sample] = {}
+        self._last_update: dict[int, float] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def offer(self, user_id: int, embedding: np.ndarray, score: float, liveness_score: Optional[int]) -> bool:
+        if score < self.min_score or liveness_score is None or liveness_score < self.min_liveness:
+            return False
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_update.get(user_id, -np.inf) < self.cooldown_seconds:
+                return False
+            current = self._pending.get(user_id)
+            if current is None and len(self._pending) >= self.max_per_flush:
+                metrics.incr("template_updater.dropped")
+                return False
+            if current is None or score > current.score:
+                self._pending[user_id] = _Sample(user_id, np.asarray(embedding, dtype=np.float32).copy(), score, liveness_score)
+        return True
+
+    def flush(self) -> int:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+        settings = get_settings()
+        gallery = get_gallery_index(self.model_version) if settings.gallery_backend == "memory" else None
+        with self.session_factory() as db:
+            # Users deleted or deactivated since their scan are skipped
+            active = set(db.scalars(select(User.id).where(User.id.in_(list(pending)), User.is_active.is_(True))))
+            repo = EmbeddingRepository(db, gallery=gallery)
+            audit = AuditRepository(db)
+            updated = []
+            for sample in pending.values():
+                if sample.user_id not in active:
+                    continue
+                if self.mode == "ema":
+                    embedding = repo.blend_template(
+                        sample.user_id, self.model_version, sample.embedding, self.alpha, FaceRecognitionService.encrypt_embedding
+                    )
+                    if embedding is None:
+                        continue
+                else:
+                    repo.upsert_embedding(
+                        user_id=sample.user_id,
+                        model_version=self.model_version,
+                        vector=sample.embedding,
+                        encrypted_blob=FaceRecognitionService.encrypt_embedding(sample.embedding),
+                        liveness_score=sample.liveness_score,
+                    )
+                audit.log(
+                    action="template_update",
+                    entity="face_embeddings",
+                    entity_id=str(sample.user_id),
+                    details={"mode": self.mode, "match_score": round(sample.score, 4), "liveness_score": sample.liveness_score},
+                )
+                updated.append(sample.user_id)
+            db.commit()
+        now = time.monotonic()
+        with self._lock:
+            for user_id in updated:
+                self._last_update[user_id] = now
+        metrics.incr("template_updater.updated", len(updated))
+        logger.info("Updated templates for %d users", len(updated))
+        return len(updated)
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="template-updater", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_seconds):
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Template update flush failed")
+
+
+@lru_cache(maxsize=1)
+def get_template_updater() -> TemplateUpdater:
+    settings = get_settings()
+    return TemplateUpdater(
+        SessionLocal,
+        min_score=settings.similarity_threshold + settings.template_update_margin,
+        min_liveness=settings.template_update_min_liveness,
+        mode=settings.template_update_mode,
+        alpha=settings.template_update_alpha,
+        interval_seconds=settings.template_update_interval_seconds,
+        cooldown_seconds=settings.template_update_cooldown_hours * 3600,
+        max_per_flush=settings.template_update_max_per_flush,
+    )
@@ -0,0 +1,96 @@
+import itertools
+from dataclasses import dataclass, field
+from typing import Optional, Sequence
+
+import numpy as np
+
+
+def iou(a: Sequence[float], b: Sequence[float]) -> float:
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, x2 - x1) * max(0.0, y2 - y1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return float(inter / union) if union > 0 else 0.0
+
+
+@dataclass
+class Track:
+    track_id: int
+    box: np.ndarray
+    # Frame index of the detection that last updated the box
+    frame: int
+    velocity: np.ndarray = field(default_factory=lambda: np.zeros(4, dtype=np.float32))
+    # Detector confidence of the latest box
+    probability: Optional[float] = None
+    # Consecutive detections in which the box barely moved
+    steady: int = 1
+    missed: int = 0
+    attempts: int = 0
+    user_id: Optional[int] = None
+    done: bool = False
+
+    def predict(self, frame: int) -> np.ndarray:
+        return self.box + self.velocity * (frame - self.frame)
+
+
+class FaceTracker:
+    """
+    Greedy IoU tracker for one kiosk stream.
+
+    Detections arrive only every few frames; in between, tracks coast on a constant-velocity
+    estimate, so associating the next detections costs a handful of box overlaps and no pixels.
+    A track whose box keeps overlapping its previous one by ``steady_iou`` counts as steady;
+    one left unmatched by more than ``max_missed`` detections is dropped.
+    """
+
+    def __init__(self, match_iou: float = 0.3, steady_iou: float = 0.6, max_missed: int = 2):
+        self.match_iou = match_iou
+        self.steady_iou = steady_iou
+        self.max_missed = max_missed
+        self.tracks: dict[int, Track] = {}
+        self._ids = itertools.count(1)
+
+    def update(
+        self, boxes: Sequence[Sequence[float]], frame: int, probabilities: Optional[Sequence[float]] = None
+    ) -> tuple[list[Track], list[Track]]:
+        """
+        Associate a detection pass with the tracks; returns (tracks seen in it, tracks dropped).
+        """
+        boxes = [np.asarray(box, dtype=np.float32) for box in boxes]
+        probabilities = [None] * len(boxes) if probabilities is None else [float(p) for p in probabilities]
+        pairs = sorted(
+            ((iou(track.predict(frame), box), track_id, i) for track_id, track in self.tracks.items() for i, box in enumerate(boxes)),
+            key=lambda pair: pair[0],
+            reverse=True,
+        )
+        assigned: dict[int, int] = {}
+        for overlap, track_id, i in pairs:
+            if overlap < self.match_iou:
+                break
+            if track_id not in assigned and i not in assigned.values():
+                assigned[track_id] = i
+
+        seen = []
+        for track_id, i in assigned.items():
+            track = self.tracks[track_id]
+            box = boxes[i]
+            track.steady = track.steady + 1 if iou(track.box, box) >= self.steady_iou else 1
+            track.velocity = (box - track.box) / max(1, frame - track.frame)
+            track.box, track.frame, track.missed = box, frame, 0
+            track.probability = probabilities[i]
+            seen.append(track)
+
+        lost = []
+        for track_id in [track_id for track_id in self.tracks if track_id not in assigned]:
+            track = self.tracks[track_id]
+            track.missed += 1
+            if track.missed > self.max_missed:
+                lost.append(self.tracks.pop(track_id))
+
+        matched = set(assigned.values())
+        for i, box in enumerate(boxes):
+            if i not in matched:
+                track = Track(track_id=next(self._ids), box=box, frame=frame, probability=probabilities[i])
+                self.tracks[track.track_id] = track
+                seen.append(track)
+        return seen, lost
@@ -0,0 +1,127 @@
+from typing import Any, Callable, Iterable
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.core.errors import DuplicateAttendance, FaceNotDetected, WindowViolation
+from app.core.metrics import metrics
+from app.schemas.attendance import AttendanceDecision
+from app.services.attendance_service import AttendanceService
+from app.services.face.frame import crop, decode_frame
+from app.services.face.recognition_service import FaceRecognitionService
+from app.services.face.roster import get_recent_roster
+from app.services.face.tracker import FaceTracker, Track
+
+
+class StreamSession:
+    """
+    State of one kiosk's frame stream.
+
+    Only every ``detect_every``-th frame is decoded and run through the detector; the tracker
+    carries faces across the rest. A track is embedded once it has been steady for ``min_steady``
+    detections and its crop passes the quality gate, and is never embedded again after a decision, so
+    a person standing at the kiosk costs a few detector passes and usually one embedding.
+    """
+
+    def __init__(
+        self,
+        face_service: FaceRecognitionService,
+        session_factory: Callable[[], Session],
+        gallery_factory: Callable[[Session], Any],
+        kiosk_id: int,
+        roster: Iterable[int] = (),
+        tracker: FaceTracker | None = None,
+    ):
+        self.settings = get_settings()
+        self.face_service = face_service
+        self.session_factory = session_factory
+        self.gallery_factory = gallery_factory
+        self.kiosk_id = kiosk_id
+        self.roster = list(roster)
+        self.tracker = tracker or FaceTracker()
+        self.frame = 0
+
+    def next_frame(self) -> bool:
+        """
+        Count an incoming frame; True if it should be sent to ``process_frame``.
+        """
+        self.frame += 1
+        if (self.frame - 1) % self.settings.stream_detect_every:
+            metrics.incr("stream.frames_skipped")
+            return False
+        return True
+
+    def process_frame(self, file_bytes: bytes) -> list[dict]:
+        try:
+            image = decode_frame(file_bytes, max_side=self.settings.max_decode_side)
+        except OSError:
+            metrics.incr("stream.bad_frames")
+            return [{"type": "error", "frame": self.frame, "reason": "Unreadable frame"}]
+        boxes, probabilities = self.face_service.detector.locate(image)
+        seen, lost = self.tracker.update(boxes, self.frame, probabilities)
+        events: list[dict] = [
+            {
+                "type": "tracks",
+                "frame": self.frame,
+                "tracks": [{"track_id": t.track_id, "box": [round(float(v)) for v in t.box], "user_id": t.user_id} for t in seen],
+                "lost": [t.track_id for t in lost],
+            }
+        ]
+        for track in seen:
+            if track.done or track.steady < self.settings.stream_min_steady:
+                continue
+            face = crop(image, track.box)
+            # A poor crop just waits for the next detection of the same track
+            if face.size and self.face_service.quality.gate(face, track.probability).accepted:
+                events.append(self._decide(track, face))
+        return events
+
+    def _reject(self, track: Track, reason: str) -> dict:
+        # Unrecognised or spoof-like tracks get a few more tries on later, hopefully better, frames
+        track.done = track.attempts >= self.settings.stream_max_attempts
+        metrics.incr("stream.rejected")
+        return {"type": "rejected", "track_id": track.track_id, "user_id": track.user_id, "reason": reason}
+
+    def _decide(self, track: Track, face: np.ndarray) -> dict:
+        track.attempts += 1
+        metrics.incr("stream.embeddings")
+        live_result = self.face_service.liveness.evaluate(face)
+        if not live_result.is_live:
+            return self._reject(track, live_result.reason)
+        embedding = self.face_service.embedder.embed(face)
+        roster = list(dict.fromkeys([*self.roster, *get_recent_roster().users(self.kiosk_id)]))
+        with self.session_factory() as db:
+            try:
+                match = self.face_service.match(embedding, live_result, self.gallery_factory(db), roster=roster)
+            except FaceNotDetected as exc:
+                return self._reject(track, exc.detail)
+            if match.score < self.settings.similarity_threshold:
+                return self._reject(track, "Face not recognized")
+            track.user_id = match.user_id
+            try:
+                log = AttendanceService(db).record(
+                    user_id=match.user_id,
+                    match_score=match.score,
+                    liveness_score=live_result.score,
+                    metadata={"source": "stream", "track_id": track.track_id},
+                    embedding=embedding,
+                )
+            except (DuplicateAttendance, WindowViolation) as exc:
+                # The person is known; there is nothing to retry
+                track.done = True
+                return {"type": "rejected", "track_id": track.track_id, "user_id": match.user_id, "reason": exc.detail}
+            db.commit()
+            decision = AttendanceDecision(
+                status=log.type,
+                confidence=match.score,
+                liveness_score=live_result.score,
+                user_id=match.user_id,
+                timestamp=log.timestamp,
+                matched_via=match.matched_via,
+                timings_ms=match.timings,
+            )
+        track.done = True
+        get_recent_roster().remember(self.kiosk_id, match.user_id)
+        metrics.incr("stream.decisions")
+        return {"type": "decision", "track_id": track.track_id, **decision.model_dump(mode="json")}
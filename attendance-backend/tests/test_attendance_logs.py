@@ -0,0 +1,84 @@
+import csv
+import io
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+
+from app.core.security import hash_password
+from app.db.models import AttendanceLog, AttendanceTypeEnum, User
+from app.repositories.attendance_repository import AttendanceRepository, LogFilters, decode_cursor, encode_cursor
+from app.services.attendance_export import stream_export
+
+
+@pytest.fixture(scope="module")
+def history(in_memory_db):
+    db = in_memory_db()
+    users = [User(full_name=f"Log User {i}", roll_no=f"L{i}", role="STUDENT", external_id=f"l{i}", password_hash=hash_password("pass")) for i in range(2)]
+    db.add_all(users)
+    db.commit()
+    start = datetime(2025, 3, 1, 8, tzinfo=timezone.utc)
+    for day in range(10):
+        for user in users:
+            # Same second for both users: (timestamp, id) keeps the order total
+            db.add(AttendanceLog(user_id=user.id, date=(start + timedelta(days=day)).date(), type=AttendanceTypeEnum.CLOCK_IN.value, timestamp=start + timedelta(days=day), confidence=90, manual_override=day == 3))
+    db.commit()
+    yield db, [user.id for user in users]
+    db.query(AttendanceLog).filter(AttendanceLog.user_id.in_([user.id for user in users])).delete()
+    db.commit()
+    db.close()
+
+
+def test_keyset_pages_cover_every_row_once_with_filters(history):
+    db, user_ids = history
+    repo = AttendanceRepository(db)
+    filters = LogFilters(user_id=None, date_from=date(2025, 3, 2), date_to=date(2025, 3, 9))
+    seen, after = [], None
+    while True:
+        rows, has_more = repo.list_page(filters, limit=3, after=after)
+        seen.extend(rows)
+        if not has_more:
+            break
+        after = decode_cursor(encode_cursor(rows[-1].timestamp, rows[-1].id))
+    assert len(seen) == 16 and len({row.id for row in seen}) == 16
+    assert [(row.timestamp, row.id) for row in seen] == sorted(((row.timestamp, row.id) for row in seen), reverse=True)
+
+    rows, _ = repo.list_page(LogFilters(user_id=user_ids[0], manual_override=True), limit=10)
+    assert [(row.user_id, row.date) for row in rows] == [(user_ids[0], date(2025, 3, 4))]
+
+
+def test_export_streams_csv_and_parquet_in_chunks(history, in_memory_db):
+    _, user_ids = history
+    filters = LogFilters(user_id=user_ids[1])
+
+    chunks = list(stream_export(in_memory_db, filters, "csv", chunk_size=4))
+    assert len(chunks) == 3
+    rows = list(csv.DictReader(io.StringIO(b"".join(chunks).decode())))
+    assert len(rows) == 10 and rows[0]["date"] == "2025-03-01" and rows[-1]["date"] == "2025-03-10"
+
+    pq = pytest.importorskip("pyarrow.parquet")
+    parquet = pq.ParquetFile(io.BytesIO(b"".join(stream_export(in_memory_db, filters, "parquet", chunk_size=4))))
+    assert parquet.metadata.num_row_groups == 3
+    table = parquet.read()
+    assert table.num_rows == 10
+    assert table.column("timestamp")[0].as_py() == datetime(2025, 3, 1, 8, tzinfo=timezone.utc)
+    assert table.column("user_id").to_pylist() == [user_ids[1]] * 10
+
+
+def test_default_partition_downgrade_restores_the_previous_function():
+    import importlib.util
+    from pathlib import Path
+    from unittest.mock import MagicMock
+
+    def load(name):
+        spec = importlib.util.spec_from_file_location(name, Path(__file__).resolve().parents[1] / "migrations/versions" / f"{name}.py")
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        module.op = MagicMock()
+        return module
+
+    partitions, default_partition = load("20260405_0006_attendance_partitions"), load("20260427_0009_attendance_default_partition")
+    default_partition.downgrade()
+    statements = [call.args[0] for call in default_partition.op.execute.call_args_list]
+    # The default is drained by 0009's function before it goes; 0006's function is what is left behind
+    assert statements.index("DROP TABLE attendance_logs_default") < statements.index(partitions.CREATE_PARTITIONS_FN)
+    assert statements[-1] == partitions.CREATE_PARTITIONS_FN
@@ -1,9 +1,16 @@
 from datetime import timedelta, timezone, datetime, date
+from unittest.mock import MagicMock
 
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql
+
+from app.config import get_settings
+from app.core.errors import DuplicateAttendance
 from app.core.security import hash_password
-from app.db.models import AttendanceTypeEnum, User
+from app.db.models import AttendanceLog, AttendanceTypeEnum, AuditLog, User
 from app.repositories.attendance_repository import AttendanceRepository
 from app.services.attendance_service import AttendanceService
+from app.services.attendance_state import AttendanceStateCache
 
 
 def test_attendance_clock_in_out(db_session):
@@ -40,3 +47,113 @@ def test_duplicate_prevention(db_session):
     except Exception:
         assert True
 
+
+
+def test_record_many_skips_duplicates_in_one_transaction(db_session):
+    db = db_session
+    users = [
+        User(full_name=f"Group User {i}", roll_no=f"G{i}", role="STUDENT", external_id=f"g{i}", password_hash=hash_password("pass"))
+        for i in range(2)
+    ]
+    db.add_all(users)
+    db.commit()
+
+    service = AttendanceService(db)
+    logs, skipped = service.record_many(
+        [(users[0].id, 0.9, 95), (users[1].id, 0.8, 90), (users[0].id, 0.91, 96)]
+    )
+    db.commit()
+
+    assert sorted(log.user_id for log in logs) == sorted(u.id for u in users)
+    assert all(log.type == AttendanceTypeEnum.CLOCK_IN.value for log in logs)
+    assert skipped == [(users[0].id, "Duplicate within cooldown window")]
+
+
+def test_unique_conflict_is_a_duplicate_and_audit_is_written(db_session):
+    db = db_session
+    user = User(full_name="Race User", roll_no="R1", role="STUDENT", external_id="r1", password_hash=hash_password("pass"))
+    db.add(user)
+    db.commit()
+
+    service = AttendanceService(db)
+    log = service.record(user_id=user.id, match_score=0.9, liveness_score=90, manual_override=True)
+    db.commit()
+    assert db.query(AuditLog).filter(AuditLog.entity_id == str(log.id)).count() == 1
+
+    # A second forced CLOCK_IN hits uq_user_date_type, as a racing kiosk would
+    try:
+        service.record(user_id=user.id, match_score=0.9, liveness_score=90, manual_override=True)
+        assert False, "Expected the unique constraint to be reported as a duplicate"
+    except DuplicateAttendance as exc:
+        assert exc.detail == "Attendance already recorded for today"
+
+
+def test_postgres_mark_is_one_statement():
+    db = MagicMock()
+    db.get_bind.return_value.dialect.name = "postgresql"
+    stmt = AttendanceRepository(db).mark_statement(
+        user_id=1,
+        attendance_date=date.today(),
+        now=datetime.now(timezone.utc),
+        cooldown=timedelta(minutes=2),
+        confidence=90,
+        liveness_score=95,
+    )
+    sql = str(stmt.compile(dialect=postgresql.psycopg.dialect()))
+    assert sql.startswith("WITH inserted AS")
+    assert "ON CONFLICT (user_id, date, type) DO NOTHING" in sql
+    assert "INSERT INTO audit_logs" in sql
+    assert "INSERT INTO daily_attendance_summary" in sql and "ON CONFLICT (user_id, date) DO UPDATE" in sql
+
+
+def test_state_cache_refuses_repeats_without_queries_and_recovers_when_stale(db_session, monkeypatch):
+    settings = get_settings()
+    monkeypatch.setattr(settings, "attendance_state_cache_enabled", True)
+    monkeypatch.setattr(settings, "attendance_window_start", "00:00")
+    monkeypatch.setattr(settings, "attendance_window_end", "23:59")
+    cache = AttendanceStateCache(size=4)
+    monkeypatch.setattr("app.services.attendance_service.get_attendance_state_cache", lambda: cache)
+    monkeypatch.setattr("app.services.attendance_state.get_attendance_state_cache", lambda: cache)
+
+    db = db_session
+    user = User(full_name="Cached User", roll_no="C1", role="STUDENT", external_id="c1", password_hash=hash_password("pass"))
+    db.add(user)
+    db.commit()
+    service = AttendanceService(db)
+
+    # Not cached until the transaction commits
+    service.record(user_id=user.id, match_score=0.9, liveness_score=90)
+    db.rollback()
+    assert cache.get(user.id, date.today()) is None
+    service.record(user_id=user.id, match_score=0.9, liveness_score=90)
+    db.commit()
+    assert cache.get(user.id, date.today()).clocked_in
+
+    statements = []
+    listener = lambda *args: statements.append(args[2])  # noqa: E731
+    event.listen(db.get_bind(), "before_cursor_execute", listener)
+    try:
+        try:
+            service.record(user_id=user.id, match_score=0.9, liveness_score=90)
+            assert False, "Expected the cached cooldown to refuse"
+        except DuplicateAttendance as exc:
+            assert exc.detail == "Duplicate within cooldown window"
+        assert statements == []
+
+        # Another worker clocks the user out behind this cache's back
+        db.add(AttendanceLog(user_id=user.id, date=date.today(), type=AttendanceTypeEnum.CLOCK_OUT.value, confidence=90))
+        db.commit()
+        monkeypatch.setattr(settings, "duplicate_cooldown_minutes", 0)
+        statements.clear()
+        try:
+            service.record(user_id=user.id, match_score=0.9, liveness_score=90)
+            assert False, "Expected the stale entry to fall back to the database"
+        except DuplicateAttendance as exc:
+            assert exc.detail == "Attendance already recorded for today"
+        assert cache.get(user.id, date.today()) is None
+    finally:
+        event.remove(db.get_bind(), "before_cursor_execute", listener)
+
+    # A new day starts empty
+    cache.remember(user.id, date.today(), AttendanceTypeEnum.CLOCK_IN.value, datetime.now(timezone.utc))
+    assert cache.get(user.id, date.today() + timedelta(days=1)) is None
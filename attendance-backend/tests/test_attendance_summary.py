@@ -0,0 +1,93 @@
+from datetime import date, datetime, timedelta, timezone
+
+from app.core.security import hash_password
+from app.db.models import AttendanceLog, DailyAttendanceSummary, User
+from app.repositories.attendance_repository import AttendanceRepository
+from app.repositories.summary_repository import SummaryRepository
+from app.services.attendance_summary import rebuild_summaries, summarize_days
+
+
+def _summaries(db, user_ids):
+    rows = db.query(DailyAttendanceSummary).filter(DailyAttendanceSummary.user_id.in_(user_ids)).order_by(DailyAttendanceSummary.date, DailyAttendanceSummary.user_id)
+    return [(row.user_id, row.date, row.first_in.replace(tzinfo=None) if row.first_in else None, row.last_out.replace(tzinfo=None) if row.last_out else None, row.duration_seconds, row.late) for row in rows]
+
+
+def test_marks_maintain_summary_and_rebuild_matches(db_session):
+    db = db_session
+    users = [User(full_name=f"Summary User {i}", roll_no=f"S{i}", role="STAFF", external_id=f"s{i}", password_hash=hash_password("pass")) for i in range(2)]
+    db.add_all(users)
+    db.commit()
+    user_ids = [user.id for user in users]
+    repo = AttendanceRepository(db)
+    day = date(2025, 6, 2)
+
+    def mark(user_id, hour, minute, late=False):
+        now = datetime(2025, 6, 2, hour, minute, tzinfo=timezone.utc)
+        return repo.record_mark(user_id, day, now, timedelta(0), confidence=90, liveness_score=90, late=late)[0]
+
+    assert mark(user_ids[0], 7, 5).type == "CLOCK_IN"
+    db.commit()
+    # Open day: no CLOCK_OUT, no duration yet
+    assert _summaries(db, user_ids) == [(user_ids[0], day, datetime(2025, 6, 2, 7, 5), None, None, False)]
+
+    assert mark(user_ids[0], 16, 35).type == "CLOCK_OUT"
+    assert mark(user_ids[1], 9, 0, late=True).type == "CLOCK_IN"
+    # Refused marks leave the summary alone
+    assert mark(user_ids[0], 17, 0) is None
+    db.commit()
+    incremental = _summaries(db, user_ids)
+    assert incremental == [
+        (user_ids[0], day, datetime(2025, 6, 2, 7, 5), datetime(2025, 6, 2, 16, 35), 9 * 3600 + 30 * 60, False),
+        (user_ids[1], day, datetime(2025, 6, 2, 9, 0), None, None, True),
+    ]
+
+    # Rebuilding from the logs reproduces it; the default window (07:00 + 10 min grace) flags the 09:00 arrival
+    assert rebuild_summaries(db, day, day, chunk_size=1) == 2
+    db.commit()
+    assert _summaries(db, user_ids) == incremental
+
+    summaries = SummaryRepository(db)
+    assert [tuple(row) for row in summaries.daily_counts(day, day, user_ids=user_ids)] == [(day, 2, 1)]
+    totals = summaries.user_totals(day - timedelta(days=7), day, role="STAFF", user_ids=user_ids)
+    assert [(row.user_id, row.days_present, row.days_late, row.worked_seconds) for row in totals] == [
+        (user_ids[0], 1, 0, 34200),
+        (user_ids[1], 1, 1, 0),
+    ]
+    assert summaries.user_totals(day, day, role="STUDENT", user_ids=user_ids) == []
+
+    db.query(AttendanceLog).filter(AttendanceLog.user_id.in_(user_ids)).delete()
+    db.query(DailyAttendanceSummary).filter(DailyAttendanceSummary.user_id.in_(user_ids)).delete()
+    db.commit()
+
+
+def test_daily_absence_counts_the_roster_of_each_day_without_admins(db_session):
+    db = db_session
+    day = date(2025, 7, 1)
+
+    def joined(days):
+        return datetime(2025, 7, 1, 12, tzinfo=timezone.utc) + timedelta(days=days)
+
+    users = [
+        User(full_name="Early", roll_no="R0", role="STUDENT", external_id="roster0", password_hash="x", created_at=joined(-30)),
+        User(full_name="Joiner", roll_no="R1", role="STUDENT", external_id="roster1", password_hash="x", created_at=joined(1)),
+        User(full_name="Boss", roll_no="R2", role="ADMIN", external_id="roster2", password_hash="x", created_at=joined(-30)),
+    ]
+    db.add_all(users)
+    db.commit()
+    user_ids = [user.id for user in users]
+    repo = AttendanceRepository(db)
+    for user in (users[0], users[2]):
+        repo.record_mark(user.id, day, datetime(2025, 7, 1, 8, tzinfo=timezone.utc), timedelta(0), confidence=90, liveness_score=90)
+    db.commit()
+
+    days = summarize_days(db, day - timedelta(days=1), day + timedelta(days=1), user_ids=user_ids)
+    # The admin's mark is not attendance; the joiner only counts from their creation date
+    assert [(d["date"], d["present"], d["absent"]) for d in days] == [
+        (day - timedelta(days=1), 0, 1),
+        (day, 1, 0),
+        (day + timedelta(days=1), 0, 2),
+    ]
+
+    db.query(AttendanceLog).filter(AttendanceLog.user_id.in_(user_ids)).delete()
+    db.query(DailyAttendanceSummary).filter(DailyAttendanceSummary.user_id.in_(user_ids)).delete()
+    db.commit()
@@ -0,0 +1,50 @@
+import threading
+
+from app.core.metrics import metrics
+from app.services.face.batching import InferenceBatcher
+
+
+def test_concurrent_submissions_share_a_batch():
+    metrics.reset()
+    batches = []
+
+    def batch_fn(items):
+        batches.append(list(items))
+        return [item * 2 for item in items]
+
+    batcher = InferenceBatcher(batch_fn, max_batch_size=4, max_wait_ms=200, name="test")
+    barrier = threading.Barrier(4)
+    results = {}
+
+    def worker(value):
+        barrier.wait()
+        results[value] = batcher(value)
+
+    threads = [threading.Thread(target=worker, args=(v,)) for v in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    batcher.close()
+
+    assert results == {v: v * 2 for v in range(4)}
+    # Full batch flushes immediately instead of waiting out max_wait_ms
+    assert len(batches) < 4
+    snapshot = metrics.snapshot()["summaries"]
+    assert snapshot["test.batch_size"]["max"] >= 2
+    assert snapshot["test.queue_wait_ms"]["count"] == 4
+
+
+def test_batch_errors_reach_every_caller():
+    def batch_fn(items):
+        raise RuntimeError("boom")
+
+    batcher = InferenceBatcher(batch_fn, max_batch_size=2, max_wait_ms=1, name="failing")
+    future = batcher.submit(1)
+    try:
+        future.result(timeout=5)
+        assert False, "Expected the batch error to propagate"
+    except RuntimeError as exc:
+        assert str(exc) == "boom"
+    finally:
+        batcher.close()
@@ -0,0 +1,104 @@
+import csv
+import io
+import zipfile
+
+import numpy as np
+import pytest
+from PIL import Image
+from sqlalchemy import select
+
+from app.core.security import hash_password
+from app.db.models import FaceEmbedding, User
+from app.repositories.embedding_repository import EmbeddingRepository
+from app.services.enrollment_service import BulkEnrollmentService, ImageSource, read_manifest
+from app.services.face.recognition_service import FaceRecognitionService
+
+
+class DummyDetector:
+    def detect(self, image):
+        return [image]
+
+
+class ColorEmbedder:
+    def embed_batch(self, faces):
+        # Deterministic per-image vector derived from the pixel colour
+        return np.stack([np.resize(face[0, 0].astype(np.float32) + 1.0, 512) for face in faces])
+
+
+def _jpeg(color):
+    buf = io.BytesIO()
+    Image.new("RGB", (64, 64), color=color).save(buf, format="JPEG")
+    return buf.getvalue()
+
+
+def test_bulk_upsert_inserts_and_updates(db_session):
+    db = db_session
+    user = User(full_name="Bulk", roll_no="B0", role="STUDENT", external_id="bulk0", password_hash=hash_password("pass"))
+    db.add(user)
+    db.commit()
+    repo = EmbeddingRepository(db)
+    row = {"user_id": user.id, "model_version": "bulk_v1", "vector": np.ones(512), "encrypted_blob": b"a", "liveness_score": 1}
+    repo.bulk_upsert([row])
+    repo.bulk_upsert([{**row, "vector": np.full(512, 2.0), "encrypted_blob": b"b"}])
+    db.commit()
+
+    stored = db.scalars(select(FaceEmbedding).where(FaceEmbedding.model_version == "bulk_v1")).all()
+    assert len(stored) == 1
+    assert stored[0].encrypted_blob == b"b"
+    assert stored[0].vector[0] == 2.0
+
+
+def test_bulk_enrollment_reports_and_resumes(db_session, tmp_path):
+    db = db_session
+    users = [User(full_name=f"Intake {i}", roll_no=f"I{i}", role="STUDENT", external_id=f"intake{i}", password_hash="x") for i in range(4)]
+    db.add_all(users)
+    db.commit()
+
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("a.jpg", _jpeg((10, 20, 30)))
+        zf.writestr("b.jpg", _jpeg((40, 50, 60)))
+        zf.writestr("c.jpg", b"not an image")
+    manifest = io.BytesIO(
+        b"external_id,image\nintake0,a.jpg\nintake1,b.jpg\nintake2,c.jpg\nnobody,a.jpg\nintake3,missing.jpg\n"
+    )
+
+    face_service = FaceRecognitionService(detector=DummyDetector(), embedder=ColorEmbedder(), liveness=object())
+    service = BulkEnrollmentService(db, face_service, chunk_size=2, workers=2)
+    report = tmp_path / "report.csv"
+    rows = service.run(read_manifest(manifest), ImageSource(archive), report_path=report)
+
+    assert [row.status for row in rows] == ["enrolled", "enrolled", "failed", "failed", "failed"]
+    assert rows[3].detail == "Unknown external_id"
+    assert rows[4].detail == "Image not found"
+    ids = {u.id for u in users[:2]}
+    stored = db.scalars(select(FaceEmbedding.user_id).where(FaceEmbedding.user_id.in_(ids))).all()
+    assert set(stored) == ids
+    with report.open() as handle:
+        assert len(list(csv.DictReader(handle))) == 5
+
+    manifest.seek(0)
+    rerun = service.run(read_manifest(manifest), ImageSource(archive), report_path=report)
+    assert [row.status for row in rerun[:2]] == ["skipped", "skipped"]
+
+
+@pytest.mark.parametrize("chunk_size", [8, 1])
+def test_bulk_enrollment_keeps_last_image_for_repeated_user(db_session, chunk_size):
+    db = db_session
+    user = User(full_name="Twice", roll_no=f"T{chunk_size}", role="STUDENT", external_id=f"twice{chunk_size}", password_hash="x")
+    db.add(user)
+    db.commit()
+
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("first.jpg", _jpeg((10, 10, 10)))
+        zf.writestr("second.jpg", _jpeg((200, 200, 200)))
+    manifest = io.BytesIO(f"external_id,image\ntwice{chunk_size},first.jpg\ntwice{chunk_size},second.jpg\n".encode())
+
+    face_service = FaceRecognitionService(detector=DummyDetector(), embedder=ColorEmbedder(), liveness=object())
+    rows = BulkEnrollmentService(db, face_service, chunk_size=chunk_size, workers=1).run(read_manifest(manifest), ImageSource(archive))
+
+    assert [row.status for row in rows] == ["superseded", "enrolled"]
+    assert rows[0].detail == "Replaced by row 2"
+    stored = db.scalars(select(FaceEmbedding).where(FaceEmbedding.user_id == user.id)).all()
+    assert len(stored) == 1 and stored[0].vector[0] > 100
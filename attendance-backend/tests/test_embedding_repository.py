@@ -0,0 +1,120 @@
+from unittest.mock import MagicMock
+
+import numpy as np
+from sqlalchemy.dialects import postgresql
+
+from app.core.security import hash_password
+from app.db.models import User
+from app.repositories.embedding_repository import EmbeddingRepository
+from app.services.face.gallery import GalleryIndex
+
+
+def _user(db, external_id):
+    user = User(full_name="Gallery User", roll_no=external_id, role="STUDENT", external_id=external_id, password_hash=hash_password("pass"))
+    db.add(user)
+    db.flush()
+    return user
+
+
+def test_nearest_embeddings_falls_back_in_process(db_session):
+    db = db_session
+    repo = EmbeddingRepository(db)
+    rng = np.random.default_rng(2)
+    vectors = rng.normal(size=(3, 512)).astype(np.float32)
+    users = [_user(db, f"nn{i}") for i in range(3)]
+    for user, vector in zip(users, vectors):
+        repo.upsert_embedding(user_id=user.id, model_version="nn_test", vector=vector, encrypted_blob=b"x", liveness_score=None)
+    db.commit()
+
+    results = repo.nearest_embeddings(vectors[1], model_version="nn_test", k=2)
+    assert results[0][0] == users[1].id
+    assert abs(results[0][1] - 1.0) < 1e-5
+    assert len(results) == 2
+    assert repo.count_embeddings("nn_test") == 3
+
+
+def test_deactivated_users_never_match(db_session):
+    db = db_session
+    repo = EmbeddingRepository(db)
+    vectors = np.random.default_rng(3).normal(size=(2, 512)).astype(np.float32)
+    users = [_user(db, f"inactive{i}") for i in range(2)]
+    for user, vector in zip(users, vectors):
+        repo.upsert_embedding(user_id=user.id, model_version="inactive_test", vector=vector, encrypted_blob=b"x", liveness_score=None)
+    users[0].is_active = False
+    db.commit()
+
+    assert [user_id for user_id, _ in repo.nearest_embeddings(vectors[0], model_version="inactive_test", k=2)] == [users[1].id]
+    assert repo.nearest_embeddings(vectors[0], model_version="inactive_test", user_ids=[users[0].id]) == []
+    assert repo.count_embeddings("inactive_test") == 1
+
+    # The pgvector query filters in SQL
+    pg = MagicMock()
+    pg.get_bind.return_value.dialect.name = "postgresql"
+    EmbeddingRepository(pg).nearest_embeddings(vectors[0], model_version="inactive_test")
+    sql = str(pg.execute.call_args_list[-1].args[0].compile(dialect=postgresql.psycopg.dialect()))
+    assert "JOIN users" in sql and "users.is_active IS true" in sql
+
+
+def test_gallery_skips_deactivated_users(db_session):
+    db = db_session
+    gallery = GalleryIndex(model_version="inactive_gallery")
+    gallery.load([])
+    repo = EmbeddingRepository(db, gallery=gallery)
+    users = [_user(db, f"inactive_gallery{i}") for i in range(2)]
+    users[0].is_active = False
+    vectors = np.random.default_rng(4).normal(size=(2, 512)).astype(np.float32)
+
+    repo.upsert_embedding(user_id=users[0].id, model_version="inactive_gallery", vector=vectors[0], encrypted_blob=b"x", liveness_score=None)
+    repo.bulk_upsert(
+        [
+            dict(user_id=user.id, model_version="inactive_gallery", vector=vector, encrypted_blob=b"x", liveness_score=None)
+            for user, vector in zip(users, vectors)
+        ]
+    )
+    db.commit()
+    assert gallery.user_ids() == {users[1].id}
+
+
+def test_gallery_updated_only_after_commit(db_session):
+    db = db_session
+    gallery = GalleryIndex(model_version="commit_test")
+    gallery.load([])
+    repo = EmbeddingRepository(db, gallery=gallery)
+    user = _user(db, "commit1")
+    vector = np.ones(512, dtype=np.float32)
+
+    repo.upsert_embedding(user_id=user.id, model_version="commit_test", vector=vector, encrypted_blob=b"x", liveness_score=None)
+    assert len(gallery) == 0
+    db.rollback()
+    db.commit()
+    assert len(gallery) == 0
+
+    user = _user(db, "commit2")
+    repo.upsert_embedding(user_id=user.id, model_version="commit_test", vector=vector, encrypted_blob=b"x", liveness_score=None)
+    db.commit()
+    assert gallery.search(vector)[0][0] == user.id
+
+
+def test_templates_capped_with_redundant_eviction(db_session, monkeypatch):
+    db = db_session
+    repo = EmbeddingRepository(db)
+    monkeypatch.setattr(repo.settings, "max_templates_per_user", 3)
+    user = _user(db, "templ1")
+    rng = np.random.default_rng(9)
+    base = rng.normal(size=512).astype(np.float32)
+    distinct = [rng.normal(size=512).astype(np.float32) for _ in range(2)]
+    # Two distinct templates plus a near-duplicate of the first
+    for vector in (base, distinct[0], base + rng.normal(scale=0.01, size=512).astype(np.float32)):
+        repo.upsert_embedding(user_id=user.id, model_version="templ", vector=vector, encrypted_blob=b"x", liveness_score=None)
+    assert [t.slot for t in repo.list_templates(user.id, "templ")] == [0, 1, 2]
+
+    repo.upsert_embedding(user_id=user.id, model_version="templ", vector=distinct[1], encrypted_blob=b"x", liveness_score=None)
+    templates = repo.list_templates(user.id, "templ")
+    assert len(templates) == 3
+    stored = np.asarray([t.vector for t in templates], dtype=np.float32)
+    # One of the near-duplicates went; both distinct templates survive
+    for vector in distinct:
+        assert np.isclose(stored @ vector / np.linalg.norm(stored, axis=1) / np.linalg.norm(vector), 1.0, atol=1e-5).any()
+
+    repo.upsert_embedding(user_id=user.id, model_version="templ", vector=base, encrypted_blob=b"x", liveness_score=None, replace=True)
+    assert len(repo.list_templates(user.id, "templ")) == 1
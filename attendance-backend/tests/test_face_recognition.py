@@ -12,6 +12,9 @@ class DummyDetector:
     def detect(self, image):
         return [image]
 
+    def detect_scored(self, image):
+        return [image], [0.99]
+
 
 class DummyEmbedder:
     def embed(self, face):
@@ -31,7 +34,7 @@ def test_match_selection():
 
     service = FaceRecognitionService(detector=DummyDetector(), embedder=DummyEmbedder(), liveness=DummyLiveness())
     embeddings = [
-        FaceEmbedding(user_id=1, model_version="facenet_v1", vector=(np.ones(512, dtype=np.float32) * 0.9).tolist(), encrypted_blob=b"x"),
+        FaceEmbedding(user_id=1, model_version="facenet_v1", vector=np.where(np.arange(512) % 2, 1.0, 0.2).astype(np.float32).tolist(), encrypted_blob=b"x"),
         FaceEmbedding(user_id=2, model_version="facenet_v1", vector=np.ones(512, dtype=np.float32).tolist(), encrypted_blob=b"x"),
     ]
 
@@ -39,3 +42,120 @@ def test_match_selection():
     assert result.user_id == 2
     assert result.score > 0.99
 
+
+
+class MultiFaceDetector:
+    def detect(self, image):
+        return [image, image, image]
+
+    def detect_scored(self, image):
+        return [image, image, image], [0.99, 0.99, 0.99]
+
+
+class SequenceEmbedder:
+    def __init__(self, vectors):
+        self.vectors = vectors
+
+    def embed_batch(self, faces):
+        return np.stack(self.vectors[: len(faces)])
+
+
+def test_group_matches_use_one_batch_and_dedupe_users():
+    img = Image.new("RGB", (160, 160), color="white")
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG")
+
+    user_1 = np.where(np.arange(512) % 2, 1.0, 0.2).astype(np.float32)
+    user_2 = np.ones(512, dtype=np.float32)
+    embedder = SequenceEmbedder([user_2, user_1, user_2 * 0.5 + user_1 * 0.5])
+    service = FaceRecognitionService(detector=MultiFaceDetector(), embedder=embedder, liveness=DummyLiveness())
+    embeddings = [
+        FaceEmbedding(user_id=1, model_version="facenet_v1", vector=user_1.tolist(), encrypted_blob=b"x"),
+        FaceEmbedding(user_id=2, model_version="facenet_v1", vector=user_2.tolist(), encrypted_blob=b"x"),
+    ]
+
+    result = service.find_matches(buf.getvalue(), embeddings)
+    assert result.faces_detected == 3
+    assert sorted(m.user_id for m in result.matches) == [1, 2]
+    assert all(m.score > 0.99 for m in result.matches)
+
+
+def test_roster_first_match_and_fallback(monkeypatch):
+    img = Image.new("RGB", (160, 160), color="white")
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG")
+    data = buf.getvalue()
+
+    service = FaceRecognitionService(detector=DummyDetector(), embedder=DummyEmbedder(), liveness=DummyLiveness())
+    monkeypatch.setattr(service.settings, "similarity_threshold", 0.6)
+    monkeypatch.setattr(service.settings, "roster_accept_margin", 0.05)
+    query = np.ones(512, dtype=np.float32)
+    near = query + np.where(np.arange(512) % 2, 0.3, -0.3).astype(np.float32)
+    far = np.where(np.arange(512) % 2, 1.0, -1.0).astype(np.float32)
+    embeddings = [
+        FaceEmbedding(user_id=1, model_version="facenet_v1", vector=near.tolist(), encrypted_blob=b"x"),
+        FaceEmbedding(user_id=2, model_version="facenet_v1", vector=query.tolist(), encrypted_blob=b"x"),
+        FaceEmbedding(user_id=3, model_version="facenet_v1", vector=far.tolist(), encrypted_blob=b"x"),
+    ]
+
+    # A confident roster hit is accepted without scanning the gallery
+    result = service.find_match(data, embeddings, roster=[1])
+    assert (result.user_id, result.matched_via) == (1, "roster")
+    assert "gallery_search" not in result.timings
+    assert {"decode", "detect", "liveness", "embed", "roster_search"} <= set(result.timings)
+
+    # A weak roster hit falls through to the full gallery
+    result = service.find_match(data, embeddings, roster=[3])
+    assert (result.user_id, result.matched_via) == (2, "gallery")
+    assert "gallery_search" in result.timings
+
+
+class BurstDetector:
+    def detect_batch_scored(self, images):
+        return [([image], [0.99]) for image in images]
+
+
+def _jpeg(pixels):
+    buf = io.BytesIO()
+    Image.fromarray(pixels).save(buf, format="JPEG", quality=95)
+    return buf.getvalue()
+
+
+def test_quality_gate_rejects_before_embedding_and_burst_keeps_best_frame():
+    from app.core.errors import LowQualityFrame
+    from app.core.metrics import metrics
+    from app.services.face.quality import QualityScorer
+
+    rng = np.random.default_rng(5)
+    sharp = rng.integers(30, 225, size=(160, 160, 3), dtype=np.uint8)
+    flat = np.full((160, 160, 3), 128, dtype=np.uint8)
+    dark = (sharp // 8).astype(np.uint8)
+
+    scorer = QualityScorer(min_face_size=40, min_sharpness=20, min_brightness=40, max_brightness=220, min_contrast=15, min_detection_probability=0.9)
+    assert scorer.evaluate(sharp, 0.99).accepted
+    assert scorer.evaluate(sharp[:30, :30], 0.99).reason == "too_small"
+    assert scorer.evaluate(dark, 0.99).reason == "too_dark"
+    assert scorer.evaluate(flat, 0.99).reason == "low_contrast"
+    assert scorer.evaluate(sharp, 0.5).reason == "low_confidence"
+
+    class CountingEmbedder(DummyEmbedder):
+        calls = 0
+
+        def embed(self, face):
+            CountingEmbedder.calls += 1
+            return super().embed(face)
+
+    service = FaceRecognitionService(detector=DummyDetector(), embedder=CountingEmbedder(), liveness=DummyLiveness(), quality=scorer)
+    embeddings = [FaceEmbedding(user_id=1, model_version="facenet_v1", vector=np.ones(512, dtype=np.float32).tolist(), encrypted_blob=b"x")]
+    skipped = metrics.snapshot()["counters"].get("quality.skipped_inference", 0)
+    try:
+        service.find_match(_jpeg(flat), embeddings)
+        assert False, "Expected the flat frame to be rejected"
+    except LowQualityFrame as exc:
+        assert exc.reason == "low_contrast"
+    assert CountingEmbedder.calls == 0
+    assert metrics.snapshot()["counters"]["quality.skipped_inference"] == skipped + 1
+
+    service.detector = BurstDetector()
+    result = service.find_match_burst([_jpeg(flat), _jpeg(sharp), _jpeg(dark)], embeddings)
+    assert result.user_id == 1 and CountingEmbedder.calls == 1
@@ -0,0 +1,73 @@
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from app.services.face.frame import crop, decode_frame
+
+
+def _jpeg(width, height):
+    buf = io.BytesIO()
+    Image.new("RGB", (width, height), color=(200, 120, 40)).save(buf, format="JPEG")
+    return buf.getvalue()
+
+
+def test_oversized_jpeg_decodes_in_draft_mode():
+    frame = decode_frame(_jpeg(4000, 3000), max_side=1000)
+    assert frame.dtype == np.uint8 and frame.ndim == 3 and frame.shape[2] == 3
+    # Draft picks the smallest DCT scale (here 1/2) whose output still covers max_side x max_side
+    assert frame.shape[:2] == (1500, 2000)
+
+
+def test_small_or_unlimited_frames_keep_native_size():
+    assert decode_frame(_jpeg(320, 240), max_side=1000).shape == (240, 320, 3)
+    assert decode_frame(_jpeg(2000, 1000), max_side=0).shape == (1000, 2000, 3)
+
+
+def test_crop_is_a_clamped_view():
+    frame = np.zeros((100, 200, 3), dtype=np.uint8)
+    face = crop(frame, (-10.4, 20.7, 50.2, 300.0))
+    assert face.shape == (80, 50, 3)
+    assert np.shares_memory(face, frame)
+
+
+def test_detection_on_downscaled_frame_crops_full_resolution():
+    from app.services.face.detector import FaceDetector
+
+    class RecordingMTCNN:
+        def detect(self, frame):
+            self.shape = frame.shape
+            # Box in the downscaled frame's coordinates
+            return np.array([[10.0, 20.0, 60.0, 80.0]]), np.array([0.99])
+
+    detector = FaceDetector.__new__(FaceDetector)
+    detector.detector = RecordingMTCNN()
+    detector.max_side = 320
+    frame = np.zeros((960, 1280, 3), dtype=np.uint8)
+    faces = detector.detect(frame)
+    assert detector.detector.shape == (240, 320, 3)
+    assert faces[0].shape == (240, 200, 3)
+    assert np.shares_memory(faces[0], frame)
+
+
+def test_embedder_preprocessing_matches_the_enrollment_transform():
+    transforms = pytest.importorskip("torchvision.transforms")
+    import cv2
+
+    from app.services.face.embedder import FaceEmbedder
+
+    embedder = FaceEmbedder.__new__(FaceEmbedder)
+    embedder.device = "cpu"
+    # The preprocessing every facenet_v1 template was enrolled with
+    reference = transforms.Compose([transforms.Resize((160, 160)), transforms.ToTensor(), transforms.Normalize([0.5] * 3, [0.5] * 3)])
+    rng = np.random.default_rng(0)
+    for height, width in [(900, 700), (480, 400), (161, 150), (100, 90)]:
+        # Smooth structure plus fine texture, the worst case for aliasing
+        coarse = rng.integers(0, 256, size=(height // 8, width // 8, 3), dtype=np.uint8)
+        face = cv2.resize(coarse, (width, height), interpolation=cv2.INTER_CUBIC).astype(int) + rng.integers(-20, 21, size=(height, width, 3))
+        face = np.clip(face, 0, 255).astype(np.uint8)
+        expected = reference(Image.fromarray(face))
+        # Same pixels from a numpy view or a PIL crop; only float rounding differs
+        for crop_input in (face, Image.fromarray(face)):
+            np.testing.assert_allclose(embedder._to_batch([crop_input])[0].numpy(), expected.numpy(), atol=1e-6)
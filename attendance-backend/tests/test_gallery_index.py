@@ -0,0 +1,91 @@
+import numpy as np
+
+from app.services.face.gallery import GalleryIndex
+
+
+def _brute_force(user_ids, vectors, query):
+    normed = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    scores = normed @ (query / np.linalg.norm(query))
+    best = int(np.argmax(scores))
+    return user_ids[best], float(scores[best])
+
+
+def test_search_matches_brute_force():
+    rng = np.random.default_rng(0)
+    user_ids = np.arange(1, 5001, dtype=np.int64)
+    vectors = rng.normal(size=(5000, 512)).astype(np.float32)
+    index = GalleryIndex(dim=512)
+    index.load_arrays(user_ids, vectors)
+
+    query = vectors[1234] + rng.normal(scale=0.1, size=512).astype(np.float32)
+    expected_id, expected_score = _brute_force(user_ids, vectors, query)
+    results = index.search(query, k=5)
+
+    assert len(results) == 5
+    assert results[0][0] == expected_id
+    assert abs(results[0][1] - expected_score) < 1e-5
+    assert [score for _, score in results] == sorted((score for _, score in results), reverse=True)
+
+
+def test_incremental_upsert_and_remove():
+    rng = np.random.default_rng(1)
+    index = GalleryIndex(dim=512, initial_capacity=2)
+    vectors = rng.normal(size=(5, 512)).astype(np.float32)
+    for user_id, vector in enumerate(vectors, start=1):
+        index.upsert(user_id, vector)
+    assert len(index) == 5
+    assert index.search(vectors[3])[0][0] == 4
+
+    # Re-enrolling replaces the vector in place
+    index.upsert(4, vectors[0])
+    assert len(index) == 5
+    assert index.search(vectors[3])[0][0] != 4
+
+    index.remove(1)
+    index.remove(4)
+    assert len(index) == 3
+    assert all(user_id not in (1, 4) for user_id, _ in index.search(vectors[0], k=5))
+
+    # Freed rows are reused
+    index.upsert(6, vectors[3])
+    assert index.search(vectors[3])[0][0] == 6
+
+
+def test_user_scores_as_best_of_templates():
+    rng = np.random.default_rng(3)
+    vectors = rng.normal(size=(6, 512)).astype(np.float32)
+    index = GalleryIndex(dim=512, max_templates=3, template_mode="max")
+    # User 1 owns three templates, everyone else one
+    index.load_arrays(np.array([1, 2, 1, 3, 1, 4], dtype=np.int64), vectors)
+    assert len(index) == 4
+    for row in (0, 2, 4):
+        assert index.search(vectors[row])[0][0] == 1
+    results = index.search(vectors[2], k=4)
+    assert [user_id for user_id, _ in results].count(1) == 1
+    assert len(results) == 4
+
+    # Shrinking a user's templates frees rows for reuse
+    index.set_templates(1, vectors[:1])
+    assert index.search(vectors[4])[0][0] != 1
+    index.upsert(5, vectors[4])
+    assert index.search(vectors[4])[0][0] == 5
+
+
+def test_load_keeps_latest_templates_and_centroid_mode():
+    rng = np.random.default_rng(4)
+    vectors = rng.normal(size=(4, 512)).astype(np.float32)
+    ids = np.array([7, 7, 7, 8], dtype=np.int64)
+
+    capped = GalleryIndex(dim=512, max_templates=2, template_mode="max")
+    capped.load_arrays(ids, vectors)
+    # The oldest of user 7's three templates is dropped
+    assert capped.search(vectors[0])[0][1] < 0.99
+    assert capped.search(vectors[1])[0][0] == 7
+    assert capped.search(vectors[2])[0][0] == 7
+
+    centroid = GalleryIndex(dim=512, max_templates=3, template_mode="centroid")
+    centroid.load_arrays(ids, vectors)
+    normed = vectors[:3] / np.linalg.norm(vectors[:3], axis=1, keepdims=True)
+    mean = normed.mean(axis=0)
+    user_id, score = centroid.search(mean)[0]
+    assert user_id == 7 and abs(score - 1.0) < 1e-5
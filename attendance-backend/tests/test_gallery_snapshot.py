@@ -0,0 +1,110 @@
+import numpy as np
+import pytest
+from cryptography.exceptions import InvalidTag
+
+from app.core.security import hash_password
+from app.db.models import User
+from app.repositories.embedding_repository import EmbeddingRepository
+from app.services.face import snapshot as snapshot_module
+from app.services.face.gallery import GalleryIndex
+from app.services.face.snapshot import populate_gallery, read_snapshot, write_snapshot
+
+
+def test_snapshot_round_trip_and_tamper_detection(tmp_path, monkeypatch):
+    monkeypatch.setattr(snapshot_module, "_CHUNK", 1000)  # force several encrypted chunks
+    rng = np.random.default_rng(5)
+    ids = np.arange(10, 20, dtype=np.int64)
+    matrix = rng.normal(size=(10, 512)).astype(np.float32)
+    path = tmp_path / "gallery.snap"
+    write_snapshot(path, "facenet_v1", ids, matrix, high_water=None)
+
+    loaded = read_snapshot(path)
+    assert loaded.model_version == "facenet_v1"
+    np.testing.assert_array_equal(loaded.user_ids, ids)
+    np.testing.assert_array_equal(loaded.matrix, matrix)
+    assert matrix.tobytes() not in path.read_bytes()
+
+    data = bytearray(path.read_bytes())
+    data[-5] ^= 0xFF
+    path.write_bytes(bytes(data))
+    with pytest.raises(InvalidTag):
+        read_snapshot(path)
+
+
+def test_populate_applies_delta_after_snapshot(db_session, tmp_path):
+    db = db_session
+    repo = EmbeddingRepository(db)
+    rng = np.random.default_rng(6)
+    users = [User(full_name=f"Snap {i}", roll_no=f"S{i}", role="STUDENT", external_id=f"snap{i}", password_hash=hash_password("p")) for i in range(3)]
+    db.add_all(users)
+    db.flush()
+    vectors = rng.normal(size=(3, 512)).astype(np.float32)
+    for user, vector in zip(users[:2], vectors[:2]):
+        repo.upsert_embedding(user_id=user.id, model_version="snap_v1", vector=vector, encrypted_blob=b"x", liveness_score=None)
+    db.commit()
+
+    path = str(tmp_path / "gallery.snap")
+    first = GalleryIndex(model_version="snap_v1")
+    populate_gallery(first, repo, snapshot_path=path)
+    assert len(first) == 2
+
+    # Enroll a third user and delete the first after the snapshot was written
+    repo.upsert_embedding(user_id=users[2].id, model_version="snap_v1", vector=vectors[2], encrypted_blob=b"x", liveness_score=None)
+    db.delete(users[0])
+    db.commit()
+
+    second = GalleryIndex(model_version="snap_v1")
+    populate_gallery(second, repo, snapshot_path=path)
+    assert second.user_ids() == {users[1].id, users[2].id}
+    assert second.search(vectors[2])[0][0] == users[2].id
+    # The refreshed snapshot already contains the delta
+    assert set(read_snapshot(path).user_ids.tolist()) == {users[1].id, users[2].id}
+
+
+def test_concurrent_snapshot_writers_leave_a_whole_file(tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+
+    rng = np.random.default_rng(8)
+    path = tmp_path / "gallery.snap"
+    versions = [(np.arange(n, dtype=np.int64), rng.normal(size=(n, 512)).astype(np.float32)) for n in range(50, 58)]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda version: write_snapshot(path, "facenet_v1", *version, high_water=None), versions))
+
+    loaded = read_snapshot(path)
+    # Exactly one writer's snapshot, intact, and no temp files left behind
+    assert any(np.array_equal(loaded.matrix, matrix) for _, matrix in versions)
+    assert [p.name for p in tmp_path.iterdir()] == ["gallery.snap"]
+
+
+def test_failed_snapshot_write_removes_its_temp_file(tmp_path, monkeypatch):
+    def fail(*args):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(snapshot_module.os, "replace", fail)
+    with pytest.raises(OSError):
+        write_snapshot(tmp_path / "gallery.snap", "facenet_v1", np.arange(2, dtype=np.int64), np.ones((2, 512), dtype=np.float32), high_water=None)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_high_water_is_an_instant_under_a_non_utc_session_timezone():
+    import importlib.util
+    from datetime import datetime, timedelta, timezone
+    from pathlib import Path
+    from unittest.mock import MagicMock
+
+    spec = importlib.util.spec_from_file_location("m0003", Path(__file__).resolve().parents[1] / "migrations/versions/20260310_0003_face_embeddings_updated_at.py")
+    migration = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration)
+    migration.op = MagicMock()
+    migration.upgrade()
+    column = migration.op.add_column.call_args.args[1]
+    # A naive column would hand back session-local wall times that read as UTC
+    assert column.name == "updated_at" and column.type.timezone is True
+
+    # timestamptz values come back in the session's zone (here UTC+05:30) and still order as instants
+    kolkata = timezone(timedelta(hours=5, minutes=30))
+    snapshot_at = datetime(2026, 3, 10, 15, 0, tzinfo=kolkata)
+    changed_after = datetime(2026, 3, 10, 9, 40, tzinfo=timezone.utc)
+    high_water = snapshot_module._max_timestamp(None, snapshot_at)
+    assert snapshot_module._max_timestamp(high_water, changed_after) == changed_after
+    assert changed_after > high_water - snapshot_module._HIGH_WATER_SLACK
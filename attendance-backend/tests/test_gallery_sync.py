@@ -0,0 +1,71 @@
+import json
+
+import numpy as np
+
+from app.core.security import hash_password
+from app.db.models import GalleryVersion, User
+from app.repositories.embedding_repository import EmbeddingRepository
+from app.repositories.user_repository import UserRepository
+from app.services.face.gallery import GalleryIndex
+from app.services.face.gallery_sync import GallerySubscriber
+
+
+def _message(version, user_ids, model_version="sync_v1"):
+    return json.dumps({"version": version, "model_version": model_version, "user_ids": user_ids})
+
+
+def _users(db, count, prefix):
+    users = [User(full_name=f"{prefix} {i}", roll_no=f"{prefix}{i}", role="STUDENT", external_id=f"{prefix}{i}", password_hash=hash_password("p")) for i in range(count)]
+    db.add_all(users)
+    db.flush()
+    return users
+
+
+def test_notifications_apply_enrollments_and_deactivations(in_memory_db):
+    rng = np.random.default_rng(11)
+    vectors = rng.normal(size=(2, 512)).astype(np.float32)
+    gallery = GalleryIndex(model_version="sync_v1")
+    subscriber = GallerySubscriber(gallery, in_memory_db)
+
+    with in_memory_db() as db:
+        users = _users(db, 2, "sync")
+        repo = EmbeddingRepository(db)
+        for user, vector in zip(users, vectors):
+            repo.upsert_embedding(user_id=user.id, model_version="sync_v1", vector=vector, encrypted_blob=b"x", liveness_score=None)
+        db.commit()
+        ids = [user.id for user in users]
+
+    subscriber.handle(_message(1, ids))
+    assert gallery.user_ids() == set(ids)
+    assert gallery.search(vectors[1])[0][0] == ids[1]
+
+    with in_memory_db() as db:
+        UserRepository(db).set_active(db.get(User, ids[0]), False)
+        db.commit()
+    subscriber.handle(_message(2, [ids[0]]))
+    assert gallery.user_ids() == {ids[1]}
+
+    # Replayed messages are ignored
+    subscriber.handle(_message(1, ids))
+    assert gallery.user_ids() == {ids[1]}
+    assert subscriber.version == 2
+
+
+def test_version_gap_triggers_full_resync(in_memory_db):
+    rng = np.random.default_rng(12)
+    gallery = GalleryIndex(model_version="gap_v1")
+    subscriber = GallerySubscriber(gallery, in_memory_db)
+
+    with in_memory_db() as db:
+        users = _users(db, 3, "gap")
+        repo = EmbeddingRepository(db)
+        for user in users:
+            repo.upsert_embedding(user_id=user.id, model_version="gap_v1", vector=rng.normal(size=512), encrypted_blob=b"x", liveness_score=None)
+        db.merge(GalleryVersion(id=1, version=7))
+        db.commit()
+        ids = {user.id for user in users}
+
+    # Versions 1..6 were never seen, so the message alone is not trusted
+    subscriber.handle(_message(7, [users[0].id], model_version="gap_v1"))
+    assert subscriber.version == 7
+    assert gallery.user_ids() == ids
@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+import torch
+
+from app.services.face.backends import model_version_for
+from app.services.face.detector import FaceDetector
+from app.services.face.embedder import FaceEmbedder
+
+
+def _cosine(a, b):
+    return np.sum(a * b, axis=1) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1))
+
+
+def _embedder(backend, model_dir, quantize=False):
+    # Same seed, same random weights: the exported graphs are compared against this eager model
+    torch.manual_seed(0)
+    return FaceEmbedder(device="cpu", model_name=None, backend=backend, quantize=quantize, model_dir=str(model_dir))
+
+
+@pytest.mark.parametrize("backend,quantize,tolerance", [("torchscript", False, 1e-4), ("onnx", False, 1e-4), ("onnx", True, 2e-2)])
+def test_exported_embedder_matches_eager(tmp_path, backend, quantize, tolerance):
+    if backend == "onnx":
+        pytest.importorskip("onnxruntime")
+    faces = list(np.random.default_rng(1).integers(0, 256, size=(4, 160, 160, 3), dtype=np.uint8))
+    expected = _embedder("eager", tmp_path).embed_batch(faces)
+    exported = _embedder(backend, tmp_path, quantize)
+    assert (tmp_path / f"inception_resnet_v1-None{'-int8' if quantize else ''}.{'onnx' if backend == 'onnx' else 'pt'}").exists()
+    assert _cosine(expected, exported.embed_batch(faces)).min() > 1 - tolerance
+    # A second worker loads the cached export instead of re-exporting
+    assert _cosine(expected, _embedder(backend, tmp_path, quantize).embed_batch(faces)).min() > 1 - tolerance
+
+
+@pytest.mark.parametrize("backend", ["torchscript", "onnx"])
+def test_exported_detector_cascade_matches_eager(tmp_path, backend):
+    if backend == "onnx":
+        pytest.importorskip("onnxruntime")
+    eager = FaceDetector(device="cpu", backend="eager", max_side=0)
+    exported = FaceDetector(device="cpu", backend=backend, max_side=0, model_dir=str(tmp_path))
+    # P-Net runs on every pyramid scale, so the export must accept any input size
+    for shape in [(1, 3, 64, 64), (2, 3, 97, 130)]:
+        batch = torch.rand(shape)
+        with torch.no_grad():
+            for want, got in zip(eager.detector.pnet(batch), exported.detector.pnet(batch)):
+                np.testing.assert_allclose(got.numpy(), want.numpy(), atol=1e-4)
+    crops = torch.rand(5, 3, 48, 48)
+    with torch.no_grad():
+        for want, got in zip(eager.detector.onet(crops), exported.detector.onet(crops)):
+            np.testing.assert_allclose(got.numpy(), want.numpy(), atol=1e-4)
+
+
+def test_model_version_records_backend():
+    assert model_version_for("facenet_v1", "eager") == "facenet_v1"
+    assert model_version_for("facenet_v1", "onnx") == "facenet_v1+onnx"
+    assert model_version_for("facenet_v1", "torchscript", quantize=True) == "facenet_v1+torchscript-int8"
+    with pytest.raises(ValueError):
+        model_version_for("facenet_v1", "tensorrt")
+
+
+def test_runtime_applies_thread_budget_and_reports_topology():
+    import cv2
+
+    from app.config import get_settings
+    from app.services.face.runtime import configure_runtime
+
+    threads, cv_threads = torch.get_num_threads(), cv2.getNumThreads()
+    try:
+        settings = get_settings().model_copy(
+            update={"inference_intra_op_threads": 1, "opencv_threads": 0, "web_concurrency": 3, "inference_executor_workers": 2}
+        )
+        topology = configure_runtime(settings)
+        assert torch.get_num_threads() == 1 and topology["torch_threads"] == 1
+        assert topology["opencv_threads"] == cv2.getNumThreads()
+        assert topology["peak_threads"] == 3 * 2 * 1
+    finally:
+        torch.set_num_threads(threads)
+        cv2.setNumThreads(cv_threads)
@@ -0,0 +1,32 @@
+import asyncio
+import threading
+
+import pytest
+
+from app.core.errors import ServiceOverloaded
+from app.services.face.executor import InferenceExecutor
+
+
+def test_executor_rejects_when_saturated():
+    executor = InferenceExecutor(max_workers=1, max_queue=1, retry_after=7)
+    release = threading.Event()
+
+    async def scenario():
+        running = asyncio.ensure_future(executor.run(release.wait))
+        queued = asyncio.ensure_future(executor.run(lambda: 42))
+        await asyncio.sleep(0)
+        with pytest.raises(ServiceOverloaded) as exc_info:
+            await executor.run(lambda: 0)
+        assert exc_info.value.status_code == 503
+        assert exc_info.value.headers["Retry-After"] == "7"
+
+        release.set()
+        assert await running is True
+        assert await queued == 42
+        # Slots are released once jobs finish
+        assert await executor.run(lambda: "ok") == "ok"
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        executor.shutdown()
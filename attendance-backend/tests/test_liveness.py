@@ -0,0 +1,46 @@
+import numpy as np
+
+from app.services.face.liveness import LivenessService
+
+
+def _reference_lbp_histogram(gray):
+    # Original per-pixel implementation, kept as the regression oracle
+    lbp = np.zeros_like(gray)
+    padded = np.pad(gray, pad_width=1, mode="edge")
+    for i in range(1, padded.shape[0] - 1):
+        for j in range(1, padded.shape[1] - 1):
+            center = padded[i, j]
+            binary = (
+                (padded[i - 1, j - 1] > center) << 7
+                | (padded[i - 1, j] > center) << 6
+                | (padded[i - 1, j + 1] > center) << 5
+                | (padded[i, j + 1] > center) << 4
+                | (padded[i + 1, j + 1] > center) << 3
+                | (padded[i + 1, j] > center) << 2
+                | (padded[i + 1, j - 1] > center) << 1
+                | (padded[i, j - 1] > center)
+            )
+            lbp[i - 1, j - 1] = binary
+    hist, _ = np.histogram(lbp.ravel(), bins=256, range=(0, 256), density=True)
+    return hist
+
+
+def test_vectorized_lbp_matches_reference():
+    rng = np.random.default_rng(3)
+    service = LivenessService(lbp_size=0)
+    for shape in [(1, 1), (7, 13), (64, 48)]:
+        gray = rng.integers(0, 256, size=shape, dtype=np.uint8)
+        np.testing.assert_allclose(service._lbp_histogram(gray), _reference_lbp_histogram(gray), rtol=0, atol=1e-12)
+    flat = np.full((20, 20), 128, dtype=np.uint8)
+    np.testing.assert_allclose(service._lbp_histogram(flat), _reference_lbp_histogram(flat), rtol=0, atol=1e-12)
+
+
+def test_lbp_downscale_uses_fixed_working_size():
+    rng = np.random.default_rng(4)
+    service = LivenessService(lbp_size=32)
+    gray = rng.integers(0, 256, size=(480, 360), dtype=np.uint8)
+    hist = service._lbp_histogram(gray)
+    assert hist.shape == (256,)
+    assert abs(hist.sum() - 1.0) < 1e-9
+    # 32x32 working resolution -> every bin is a multiple of 1/1024
+    assert np.allclose(hist * 1024, np.round(hist * 1024))
@@ -0,0 +1,48 @@
+import threading
+
+from app.services.face.liveness import LivenessResult
+from app.services.face.registry import ModelRegistry
+
+
+class CountingFactory:
+    def __init__(self, instance):
+        self.instance = instance
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.instance
+
+
+class DummyDetector:
+    def detect(self, image):
+        return [image]
+
+
+class DummyEmbedder:
+    def embed(self, face):
+        return [0.0] * 512
+
+
+class DummyLiveness:
+    def evaluate(self, frame):
+        return LivenessResult(score=99, is_live=True, reason="pass")
+
+
+def test_registry_loads_once_across_threads():
+    detector = CountingFactory(DummyDetector())
+    embedder = CountingFactory(DummyEmbedder())
+    liveness = CountingFactory(DummyLiveness())
+    registry = ModelRegistry(detector_factory=detector, embedder_factory=embedder, liveness_factory=liveness)
+    assert registry.status()["loaded"] is False
+
+    threads = [threading.Thread(target=registry.load) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert (detector.calls, embedder.calls, liveness.calls) == (1, 1, 1)
+    status = registry.status()
+    assert status["loaded"] and status["warm"]
+    assert status["load_seconds"] is not None
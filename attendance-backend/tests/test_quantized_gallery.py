@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from app.services.face.gallery import GalleryIndex, QuantizedGalleryIndex
+
+
+def _gallery(seed, count=3000):
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(count, 512)).astype(np.float32)
+    queries = vectors[:200] + rng.normal(scale=0.5, size=(min(count, 200), 512)).astype(np.float32)
+    return np.arange(1, count + 1, dtype=np.int64), vectors, queries
+
+
+@pytest.mark.parametrize("compression", ["int8", "pq"])
+def test_reranked_results_match_exact_search(compression):
+    user_ids, vectors, queries = _gallery(7)
+    exact = GalleryIndex(dim=512)
+    exact.load_arrays(user_ids, vectors)
+    index = QuantizedGalleryIndex(dim=512, compression=compression, rerank=32)
+    index.load_arrays(user_ids, vectors)
+
+    expected = exact.search_batch(queries, k=1)
+    found = index.search_batch(queries, k=1)
+    recall = np.mean([e[0][0] == f[0][0] for e, f in zip(expected, found)])
+    assert recall >= 0.99
+    # Re-ranked scores are exact, not approximations
+    for e, f in zip(expected, found):
+        if e[0][0] == f[0][0]:
+            assert abs(e[0][1] - f[0][1]) < 1e-5
+    assert index.memory_bytes() < vectors.nbytes / 3
+
+
+def test_quantized_upsert_remove_and_growth():
+    user_ids, vectors, _ = _gallery(8, count=20)
+    index = QuantizedGalleryIndex(dim=512, initial_capacity=4, compression="int8")
+    for user_id, vector in zip(user_ids, vectors):
+        index.upsert(int(user_id), vector)
+    assert len(index) == 20
+    assert index.search(vectors[17])[0][0] == 18
+
+    index.remove(18)
+    assert all(user_id != 18 for user_id, _ in index.search(vectors[17], k=20))
+    index.upsert(99, vectors[17])
+    assert index.search(vectors[17])[0][0] == 99
+    ids, rows = index.export_arrays()
+    assert set(ids.tolist()) == index.user_ids()
+    np.testing.assert_allclose(np.linalg.norm(rows, axis=1), 1.0, rtol=1e-5)
+
+
+@pytest.mark.parametrize("compression", ["int8", "pq"])
+def test_enrolling_into_an_empty_index_refits_as_it_grows(compression):
+    user_ids, vectors, queries = _gallery(9, count=600)
+    index = QuantizedGalleryIndex(dim=512, compression=compression, rerank=8)
+    index.load_arrays(user_ids[:0], vectors[:0])
+    for count, (user_id, vector) in enumerate(zip(user_ids, vectors), start=1):
+        index.upsert(int(user_id), vector)
+        if count in (5, 300, 600):
+            # Small galleries are scored exactly until a full codebook exists; later ones through it
+            found = index.search_batch(queries[: min(count, 200)], k=1)
+            assert np.mean([f[0][0] == i for i, f in enumerate(found, start=1)]) >= 0.99, count
+    quantizer = index._buffers[3]
+    assert quantizer.trained and quantizer.fitted_on >= 300
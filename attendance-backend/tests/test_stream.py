@@ -0,0 +1,88 @@
+import io
+
+import numpy as np
+from PIL import Image
+
+from app.config import get_settings
+from app.core.security import hash_password
+from app.db.models import AttendanceLog, User
+from app.services.face.gallery import GalleryIndex
+from app.services.face.liveness import LivenessResult
+from app.services.face.recognition_service import FaceRecognitionService
+from app.services.face.tracker import FaceTracker
+from app.services.stream_service import StreamSession
+
+
+def test_tracker_keeps_ids_across_motion_and_drops_missing_faces():
+    tracker = FaceTracker(max_missed=1)
+    seen, _ = tracker.update([(10, 10, 60, 60), (200, 10, 250, 60)], frame=1)
+    first, second = (t.track_id for t in seen)
+
+    # Both faces drift right; the coasting estimate still associates them
+    seen, _ = tracker.update([(20, 10, 70, 60), (208, 10, 258, 60)], frame=4)
+    assert {t.track_id for t in seen} == {first, second}
+    seen, _ = tracker.update([(30, 10, 80, 60)], frame=7)
+    assert [t.track_id for t in seen] == [first]
+    assert tracker.tracks[first].steady == 3
+
+    _, lost = tracker.update([(30, 10, 80, 60)], frame=10)
+    assert [t.track_id for t in lost] == [second]
+
+
+class BoxDetector:
+    def locate(self, image):
+        return np.array([[20, 20, 140, 140]], dtype=np.float32), np.array([0.99], dtype=np.float32)
+
+
+class CountingEmbedder:
+    def __init__(self, vector):
+        self.vector = vector
+        self.calls = 0
+
+    def embed(self, face):
+        self.calls += 1
+        return self.vector
+
+
+class PassLiveness:
+    def evaluate(self, frame):
+        return LivenessResult(score=95, is_live=True, reason="pass")
+
+
+def _textured_jpeg():
+    rng = np.random.default_rng(3)
+    buf = io.BytesIO()
+    Image.fromarray(rng.integers(0, 255, size=(160, 160, 3), dtype=np.uint8)).save(buf, format="JPEG")
+    return buf.getvalue()
+
+
+def test_stream_embeds_a_steady_track_once(in_memory_db, monkeypatch):
+    settings = get_settings()
+    monkeypatch.setattr(settings, "attendance_window_start", "00:00")
+    monkeypatch.setattr(settings, "attendance_window_end", "23:59")
+    with in_memory_db() as db:
+        user = User(full_name="Kiosk", roll_no="S1", role="STUDENT", external_id="stream1", password_hash=hash_password("p"))
+        db.add(user)
+        db.commit()
+        user_id = user.id
+
+    vector = np.ones(512, dtype=np.float32)
+    gallery = GalleryIndex()
+    gallery.upsert(user_id, vector)
+    embedder = CountingEmbedder(vector)
+    service = FaceRecognitionService(detector=BoxDetector(), embedder=embedder, liveness=PassLiveness())
+    session = StreamSession(service, in_memory_db, lambda db: gallery, kiosk_id=9001)
+
+    frame = _textured_jpeg()
+    events = []
+    for _ in range(15):
+        if session.next_frame():
+            events.extend(session.process_frame(frame))
+
+    # 15 frames, detection on every 3rd: five detector passes, one embedding
+    assert sum(e["type"] == "tracks" for e in events) == 5
+    decisions = [e for e in events if e["type"] == "decision"]
+    assert len(decisions) == 1 and decisions[0]["user_id"] == user_id and decisions[0]["status"] == "CLOCK_IN"
+    assert embedder.calls == 1
+    with in_memory_db() as db:
+        assert db.query(AttendanceLog).filter_by(user_id=user_id).count() == 1
@@ -0,0 +1,61 @@
+import numpy as np
+from sqlalchemy import select
+
+from app.core.security import hash_password
+from app.db.models import AuditLog, User
+from app.repositories.embedding_repository import EmbeddingRepository
+from app.services.face.template_updater import TemplateUpdater
+
+
+def _enrolled_user(session_factory, external_id, vector, model_version):
+    with session_factory() as db:
+        user = User(full_name="Drift", roll_no=external_id, role="STUDENT", external_id=external_id, password_hash=hash_password("p"))
+        db.add(user)
+        db.flush()
+        EmbeddingRepository(db).upsert_embedding(user_id=user.id, model_version=model_version, vector=vector, encrypted_blob=b"x", liveness_score=100)
+        db.commit()
+        return user.id
+
+
+def test_confident_scans_become_templates_with_cooldown(in_memory_db):
+    rng = np.random.default_rng(21)
+    enrolled, scan = rng.normal(size=(2, 512)).astype(np.float32)
+    user_id = _enrolled_user(in_memory_db, "drift1", enrolled, "upd_v1")
+    updater = TemplateUpdater(in_memory_db, min_score=0.8, min_liveness=80, model_version="upd_v1")
+
+    assert not updater.offer(user_id, scan, score=0.7, liveness_score=95)
+    assert not updater.offer(user_id, scan, score=0.9, liveness_score=50)
+    assert updater.offer(user_id, scan * 0.5, score=0.85, liveness_score=90)
+    assert updater.offer(user_id, scan, score=0.95, liveness_score=90)
+    assert updater.flush() == 1
+
+    with in_memory_db() as db:
+        templates = EmbeddingRepository(db).list_templates(user_id, "upd_v1")
+        assert len(templates) == 2
+        # The best-scoring sample of the batch was kept
+        np.testing.assert_allclose(templates[1].vector, scan, rtol=1e-6)
+        audit = db.scalars(select(AuditLog).where(AuditLog.action == "template_update", AuditLog.entity_id == str(user_id))).all()
+        assert len(audit) == 1
+
+    # Rate limited until the cooldown passes
+    assert not updater.offer(user_id, scan, score=0.99, liveness_score=99)
+    assert updater.flush() == 0
+
+
+def test_ema_mode_nudges_closest_template(in_memory_db):
+    rng = np.random.default_rng(22)
+    enrolled = rng.normal(size=512).astype(np.float32)
+    user_id = _enrolled_user(in_memory_db, "drift2", enrolled, "ema_v1")
+    updater = TemplateUpdater(in_memory_db, min_score=0.8, mode="ema", alpha=0.2, model_version="ema_v1")
+
+    drifted = enrolled + rng.normal(scale=0.5, size=512).astype(np.float32)
+    assert updater.offer(user_id, drifted, score=0.9, liveness_score=90)
+    assert updater.flush() == 1
+
+    with in_memory_db() as db:
+        templates = EmbeddingRepository(db).list_templates(user_id, "ema_v1")
+    assert len(templates) == 1
+    stored = np.asarray(templates[0].vector, dtype=np.float32)
+    unit = lambda v: v / np.linalg.norm(v)  # noqa: E731
+    expected = unit(0.8 * unit(enrolled) + 0.2 * unit(drifted))
+    np.testing.assert_allclose(stored, expected, atol=1e-5)
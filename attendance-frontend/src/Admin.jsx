@@ -1,5 +1,5 @@
 import { useState, useEffect } from "react";
-import { apiFetch } from "./apiClient";
+import { apiFetch, API_BASE } from "./apiClient";
 
 function Admin({ auth }) {
   const [view, setView] = useState("add");
@@ -14,18 +14,40 @@ function Admin({ auth }) {
   
   // Attendance state
   const [attendance, setAttendance] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
 
-  const fetchAttendance = async () => {
+  // Without a cursor this reloads the newest page; with one it appends the next older page
+  const fetchAttendance = async (cursor = null) => {
     if (!auth?.token) return;
     try {
-      const data = await apiFetch("/api/v1/attendance/logs?limit=100", {
+      const params = new URLSearchParams({ limit: "100" });
+      if (cursor) params.set("cursor", cursor);
+      const data = await apiFetch(`/api/v1/attendance/logs?${params}`, {
         method: "GET",
         token: auth.token,
       });
-      setAttendance(data);
+      setAttendance((previous) => (cursor ? [...previous, ...data.items] : data.items));
+      setNextCursor(data.next_cursor);
     } catch (err) {
       console.error("Failed to fetch attendance", err);
-      setAttendance([]);
+      if (!cursor) setAttendance([]);
+    }
+  };
+
+  const exportAttendance = async () => {
+    try {
+      const res = await fetch(`${API_BASE}/api/v1/attendance/export?format=csv`, {
+        headers: { Authorization: `Bearer ${auth.token}` },
+      });
+      if (!res.ok) throw new Error(`Export failed with status ${res.status}`);
+      const url = URL.createObjectURL(await res.blob());
+      const link = document.createElement("a");
+      link.href = url;
+      link.download = "attendance.csv";
+      link.click();
+      URL.revokeObjectURL(url);
+    } catch (err) {
+      console.error("Failed to export attendance", err);
     }
   };
 
@@ -169,7 +191,8 @@ function Admin({ auth }) {
       {view === "records" && (
         <div>
           <h4>Attendance Records</h4>
-          <button onClick={fetchAttendance}>Refresh</button>
+          <button onClick={() => fetchAttendance()}>Refresh</button>
+          <button onClick={exportAttendance}>Export CSV</button>
           <br /><br />
           
           {attendance.length === 0 ? (
@@ -206,6 +229,9 @@ function Admin({ auth }) {
               </tbody>
             </table>
           )}
+          {nextCursor && (
+            <button onClick={() => fetchAttendance(nextCursor)}>Load more</button>
+          )}
         </div>
       )}
     </div>